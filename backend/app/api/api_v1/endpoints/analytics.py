@@ -1,13 +1,55 @@
-from typing import Any, Dict, List, Optional
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
 
 from app import crud, models, schemas
 from app.api import deps
+from app.models.campaign import Campaign
+from app.models.email import EmailTemplate
+from app.models.prospect import ProspectSegment
+from app.services.ab_testing_service import ab_test_engine
+from app.services.analytics_service import analytics_service
+from app.services.sketch_service import sketch_service
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 router = APIRouter()
 
 
+def _parse_date(value: Optional[str], name: str) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail=f"{name} must be a date in YYYY-MM-DD format"
+        )
+
+
+def _names(db: Session, model: Any, ids: Iterable[int]) -> Dict[int, str]:
+    ids = list(ids)
+    if not ids:
+        return {}
+    return dict(db.execute(select(model.id, model.name).where(model.id.in_(ids))).all())
+
+
+def _breakdown(
+    db: Session, model: Any, key: str, rows: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Label rollup breakdown rows with names and rates."""
+    names = _names(db, model, [row[key] for row in rows])
+    return [
+        {
+            key: row[key],
+            "name": names.get(row[key]),
+            "emails_sent": row["sent"],
+            **analytics_service.rates(row),
+        }
+        for row in rows
+    ]
+
+
 @router.get("/overall", response_model=Dict[str, Any])
 def get_overall_analytics(
     db: Session = Depends(deps.get_db),
@@ -17,74 +59,39 @@ def get_overall_analytics(
     """
     Get overall analytics for all campaigns.
     """
-    # In a real implementation, this would query the database for analytics data
-    # For now, return mock data
+    start = _parse_date(start_date, "start_date")
+    end = _parse_date(end_date, "end_date")
+
+    totals = analytics_service.totals(db, start, end)
+    trends = analytics_service.timeline(db, start, end, interval="month")
+    trend_rates = [analytics_service.rates(row) for row in trends]
+    by_template = _breakdown(
+        db,
+        EmailTemplate,
+        "template_id",
+        analytics_service.breakdown(db, "template_id", start, end),
+    )
+    by_segment = _breakdown(
+        db,
+        ProspectSegment,
+        "segment_id",
+        analytics_service.breakdown(db, "segment_id", start, end),
+    )
+
     return {
         "summary": {
-            "total_prospects": 1250,
-            "total_emails_sent": 3750,
-            "open_rate": 42.8,
-            "click_rate": 28.5,
-            "response_rate": 18.2,
-            "meeting_rate": 5.4,
-            "bounce_rate": 2.1,
+            "total_prospects": totals["contacted"],
+            "total_emails_sent": totals["sent"],
+            **analytics_service.rates(totals),
         },
         "trends": {
-            "dates": [
-                "2023-01-01",
-                "2023-02-01",
-                "2023-03-01",
-                "2023-04-01",
-                "2023-05-01",
-                "2023-06-01",
-            ],
-            "emails_sent": [450, 520, 610, 580, 720, 870],
-            "open_rates": [38.5, 40.2, 41.8, 42.5, 43.1, 42.8],
-            "response_rates": [15.2, 16.5, 17.1, 17.8, 18.0, 18.2],
+            "dates": [row["date"] for row in trends],
+            "emails_sent": [row["sent"] for row in trends],
+            "open_rates": [rates["open_rate"] for rates in trend_rates],
+            "response_rates": [rates["response_rate"] for rates in trend_rates],
         },
-        "by_template": [
-            {
-                "template_id": 1,
-                "name": "Initial Outreach",
-                "open_rate": 42.5,
-                "click_rate": 28.2,
-                "response_rate": 18.5,
-            },
-            {
-                "template_id": 2,
-                "name": "Follow-up #1",
-                "open_rate": 38.2,
-                "click_rate": 24.5,
-                "response_rate": 15.8,
-            },
-            {
-                "template_id": 3,
-                "name": "Product Demo Request",
-                "open_rate": 45.1,
-                "click_rate": 32.8,
-                "response_rate": 22.3,
-            },
-        ],
-        "by_segment": [
-            {
-                "segment_id": 1,
-                "name": "Enterprise Decision Makers",
-                "open_rate": 48.2,
-                "response_rate": 22.5,
-            },
-            {
-                "segment_id": 2,
-                "name": "Mid-Market Technical",
-                "open_rate": 42.8,
-                "response_rate": 18.2,
-            },
-            {
-                "segment_id": 3,
-                "name": "SMB Owners",
-                "open_rate": 38.5,
-                "response_rate": 15.8,
-            },
-        ],
+        "by_template": by_template,
+        "by_segment": by_segment,
     }
 
 
@@ -92,6 +99,8 @@ def get_overall_analytics(
 def get_campaign_analytics(
     campaign_id: int,
     db: Session = Depends(deps.get_db),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
 ) -> Any:
     """
     Get analytics for a specific campaign.
@@ -101,73 +110,49 @@ def get_campaign_analytics(
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
 
-    # In a real implementation, this would query the database for campaign analytics
-    # For now, return mock data
+    start = _parse_date(start_date, "start_date")
+    end = _parse_date(end_date, "end_date")
+
+    totals = analytics_service.totals(db, start, end, campaign_id=campaign_id)
+    unique = sketch_service.unique_counts(db, "campaign", campaign_id, start, end)
+    timeline = analytics_service.timeline(db, start, end, campaign_id=campaign_id)
+    by_template = _breakdown(
+        db,
+        EmailTemplate,
+        "template_id",
+        analytics_service.breakdown(
+            db, "template_id", start, end, campaign_id=campaign_id
+        ),
+    )
+
     return {
         "campaign_id": campaign_id,
         "name": campaign.name,
         "summary": {
-            "total_prospects": 250,
-            "emails_sent": 750,
-            "emails_opened": 320,
-            "emails_clicked": 210,
-            "responses": 135,
-            "meetings_booked": 42,
-            "bounces": 15,
+            "total_prospects": totals["contacted"],
+            "emails_sent": totals["sent"],
+            "emails_opened": totals["opened"],
+            "emails_clicked": totals["clicked"],
+            "responses": totals["replied"],
+            "bounces": totals["bounced"],
         },
-        "rates": {
-            "open_rate": 42.7,
-            "click_rate": 28.0,
-            "response_rate": 18.0,
-            "meeting_rate": 5.6,
-            "bounce_rate": 2.0,
+        # Distinct prospects, estimated from HyperLogLog sketches
+        "unique": {
+            "prospects": unique["sent"],
+            "opens": unique["opened"],
+            "clicks": unique["clicked"],
+            "standard_error": sketch_service.standard_error,
         },
+        "rates": analytics_service.rates(totals),
         "timeline": {
-            "dates": [
-                "2023-05-01",
-                "2023-05-02",
-                "2023-05-03",
-                "2023-05-04",
-                "2023-05-05",
-            ],
-            "emails_sent": [150, 150, 150, 150, 150],
-            "opens": [68, 65, 62, 64, 61],
-            "clicks": [42, 40, 45, 43, 40],
-            "responses": [28, 25, 27, 30, 25],
-        },
-        "by_template": [
-            {
-                "template_id": 1,
-                "name": "Initial Outreach",
-                "emails_sent": 250,
-                "open_rate": 43.2,
-                "click_rate": 28.8,
-                "response_rate": 18.4,
-            },
-            {
-                "template_id": 2,
-                "name": "Follow-up #1",
-                "emails_sent": 250,
-                "open_rate": 38.8,
-                "click_rate": 24.8,
-                "response_rate": 16.0,
-            },
-            {
-                "template_id": 3,
-                "name": "Follow-up #2",
-                "emails_sent": 250,
-                "open_rate": 36.0,
-                "click_rate": 22.4,
-                "response_rate": 14.8,
-            },
-        ],
-        "response_time": {
-            "same_day": 35,
-            "1_day": 42,
-            "2_3_days": 30,
-            "4_7_days": 20,
-            "more_than_7_days": 8,
+            "dates": [row["date"] for row in timeline],
+            "emails_sent": [row["sent"] for row in timeline],
+            "opens": [row["opened"] for row in timeline],
+            "clicks": [row["clicked"] for row in timeline],
+            "responses": [row["replied"] for row in timeline],
         },
+        "by_template": by_template,
+        "response_time": analytics_service.response_times(db, campaign_id),
     }
 
 
@@ -175,6 +160,8 @@ def get_campaign_analytics(
 def get_template_analytics(
     template_id: int,
     db: Session = Depends(deps.get_db),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
 ) -> Any:
     """
     Get analytics for a specific email template.
@@ -184,69 +171,55 @@ def get_template_analytics(
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
 
-    # In a real implementation, this would query the database for template analytics
-    # For now, return mock data
+    start = _parse_date(start_date, "start_date")
+    end = _parse_date(end_date, "end_date")
+
+    totals = analytics_service.totals(db, start, end, template_id=template_id)
+    by_campaign = _breakdown(
+        db,
+        Campaign,
+        "campaign_id",
+        analytics_service.breakdown(
+            db, "campaign_id", start, end, template_id=template_id
+        ),
+    )
+    by_segment = _breakdown(
+        db,
+        ProspectSegment,
+        "segment_id",
+        analytics_service.breakdown(
+            db, "segment_id", start, end, template_id=template_id
+        ),
+    )
+    rates = analytics_service.rates(totals)
+    performance = ab_test_engine.summarize(db, [template_id]).get(template_id)
+
     return {
         "template_id": template_id,
         "name": template.name,
         "summary": {
-            "total_sent": 1250,
-            "total_opened": 525,
-            "total_clicked": 350,
-            "total_responded": 225,
+            "total_sent": totals["sent"],
+            "total_opened": totals["opened"],
+            "total_clicked": totals["clicked"],
+            "total_responded": totals["replied"],
+        },
+        "rates": {
+            "open_rate": rates["open_rate"],
+            "click_rate": rates["click_rate"],
+            "response_rate": rates["response_rate"],
         },
-        "rates": {"open_rate": 42.0, "click_rate": 28.0, "response_rate": 18.0},
-        "by_campaign": [
-            {
-                "campaign_id": 1,
-                "name": "Q2 Outreach",
-                "emails_sent": 500,
-                "open_rate": 43.2,
-                "response_rate": 18.6,
-            },
-            {
-                "campaign_id": 2,
-                "name": "Product Launch",
-                "emails_sent": 750,
-                "open_rate": 41.3,
-                "response_rate": 17.6,
-            },
-        ],
-        "by_segment": [
-            {
-                "segment_id": 1,
-                "name": "Enterprise Decision Makers",
-                "open_rate": 48.5,
-                "response_rate": 22.8,
-            },
-            {
-                "segment_id": 2,
-                "name": "Mid-Market Technical",
-                "open_rate": 43.2,
-                "response_rate": 18.5,
-            },
-            {
-                "segment_id": 3,
-                "name": "SMB Owners",
-                "open_rate": 38.8,
-                "response_rate": 16.2,
-            },
-        ],
+        "by_campaign": by_campaign,
+        "by_segment": by_segment,
         "a_b_testing": {
             "variations": [
-                {"id": 1, "name": "Original", "open_rate": 42.0, "response_rate": 18.0},
-                {
-                    "id": 2,
-                    "name": "Variation A",
-                    "open_rate": 44.5,
-                    "response_rate": 19.2,
-                },
                 {
-                    "id": 3,
-                    "name": "Variation B",
-                    "open_rate": 40.8,
-                    "response_rate": 17.5,
-                },
-            ]
+                    "id": variation["variation"],
+                    "name": ab_test_engine.variation_name(variation["variation"]),
+                    **variation,
+                }
+                for variation in (performance or {}).get("variations", [])
+            ],
+            "comparisons": (performance or {}).get("comparisons", []),
+            "winner": (performance or {}).get("winner"),
         },
     }
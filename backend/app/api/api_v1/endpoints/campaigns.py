@@ -2,7 +2,8 @@ from typing import Any, List, Optional
 
 from app import crud, models, schemas
 from app.api import deps
-from fastapi import APIRouter, Depends, HTTPException, Query
+from app.services.campaign_dispatcher import campaign_dispatcher
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
 router = APIRouter()
@@ -10,15 +11,17 @@ router = APIRouter()
 
 @router.get("/", response_model=List[schemas.Campaign])
 def get_campaigns(
+    response: Response,
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    page: deps.PageParams = Depends(),
     status: Optional[str] = None,
 ) -> Any:
     """
     Retrieve campaigns with optional filtering.
+
+    Pass the `X-Next-Cursor` response header as `cursor` for the next page.
     """
-    return crud.campaign.get_multi(db, skip=skip, limit=limit, status=status)
+    return deps.paginate(response, crud.campaign, db, page, status=status)
 
 
 @router.post("/", response_model=schemas.Campaign)
@@ -87,6 +90,7 @@ def start_campaign(
     *,
     db: Session = Depends(deps.get_db),
     campaign_id: int,
+    background_tasks: BackgroundTasks,
 ) -> Any:
     """
     Start a campaign.
@@ -99,7 +103,8 @@ def start_campaign(
     campaign_update = schemas.CampaignUpdate(status="active")
     campaign = crud.campaign.update(db=db, db_obj=campaign, obj_in=campaign_update)
 
-    # In a real implementation, this would trigger the campaign execution
+    # Send the campaign's pending emails once the response has gone out
+    background_tasks.add_task(campaign_dispatcher.dispatch, campaign.id)
 
     return campaign
 
@@ -1,9 +1,15 @@
-from typing import Any, List, Optional
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
 
 from app import crud, models, schemas
 from app.api import deps
+from app.models.email import EmailEventTypeEnum
+from app.services.analytics_service import analytics_service
 from app.services.email_service import email_service
-from fastapi import APIRouter, Depends, HTTPException, Query
+from app.services.outbox_service import SENDABLE_STATUSES, outbox_service
+from app.services.scheduler_service import send_scheduler
+from app.services.tracking_service import tracking_service
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
 router = APIRouter()
@@ -11,20 +17,23 @@ router = APIRouter()
 
 @router.get("/", response_model=List[schemas.Email])
 def get_emails(
+    response: Response,
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    page: deps.PageParams = Depends(),
     campaign_id: Optional[int] = None,
     prospect_id: Optional[int] = None,
     status: Optional[str] = None,
 ) -> Any:
     """
     Retrieve emails with optional filtering.
+
+    Pass the `X-Next-Cursor` response header as `cursor` for the next page.
     """
-    return crud.email.get_multi(
+    return deps.paginate(
+        response,
+        crud.email,
         db,
-        skip=skip,
-        limit=limit,
+        page,
         campaign_id=campaign_id,
         prospect_id=prospect_id,
         status=status,
@@ -44,6 +53,22 @@ def create_email(
     return email
 
 
+@router.get("/smtp-pool", response_model=Dict[str, Any])
+def get_smtp_pool_stats() -> Any:
+    """
+    Get SMTP connection pool metrics.
+    """
+    return email_service.get_pool_stats()
+
+
+@router.get("/tracking-buffer", response_model=Dict[str, Any])
+def get_tracking_buffer_stats() -> Any:
+    """
+    Get tracking event buffer metrics.
+    """
+    return tracking_service.stats()
+
+
 @router.get("/{email_id}", response_model=schemas.Email)
 def get_email(
     *,
@@ -99,33 +124,21 @@ def send_email(
     email_id: int,
 ) -> Any:
     """
-    Send an email.
+    Queue an email for sending by the outbox workers.
     """
     email = crud.email.get(db=db, id=email_id)
     if not email:
         raise HTTPException(status_code=404, detail="Email not found")
-
-    # Get prospect
-    prospect = crud.prospect.get(db=db, id=email.prospect_id)
-    if not prospect:
-        raise HTTPException(status_code=404, detail="Prospect not found")
-
-    # Send email
-    try:
-        email_service.send_email(
-            to_email=prospect.email,
-            to_name=f"{prospect.first_name} {prospect.last_name}",
-            subject=email.subject,
-            body=email.body,
+    if email.status not in SENDABLE_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Email is {email.status.value} and cannot be sent",
         )
 
-        # Update email status
-        email_update = schemas.EmailUpdate(status="sent")
-        crud.email.update(db=db, db_obj=email, obj_in=email_update)
+    if not outbox_service.enqueue(db, [email.id]):
+        return {"msg": "Email is already queued"}
 
-        return {"msg": "Email sent successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to send email: {str(e)}")
+    return {"msg": "Email queued for sending"}
 
 
 @router.post("/send-test", response_model=schemas.Msg)
@@ -154,38 +167,88 @@ def send_test_email(
 @router.post("/track/open/{email_id}", response_model=schemas.Msg)
 def track_email_open(
     *,
-    db: Session = Depends(deps.get_db),
     email_id: int,
+    request: Request,
 ) -> Any:
     """
     Track email open event.
     """
+    tracking_service.record(
+        email_id,
+        EmailEventTypeEnum.OPEN,
+        user_agent=request.headers.get("user-agent"),
+        ip_address=request.client.host if request.client else None,
+    )
+
+    return {"msg": "Email open tracked"}
+
+
+@router.post("/track/click/{email_id}", response_model=schemas.Msg)
+def track_email_click(
+    *,
+    email_id: int,
+    request: Request,
+    url: Optional[str] = None,
+) -> Any:
+    """
+    Track email click event.
+    """
+    tracking_service.record(
+        email_id,
+        EmailEventTypeEnum.CLICK,
+        url=url,
+        user_agent=request.headers.get("user-agent"),
+        ip_address=request.client.host if request.client else None,
+    )
+
+    return {"msg": "Email click tracked"}
+
+
+@router.post("/track/reply/{email_id}", response_model=schemas.Msg)
+def track_email_reply(
+    *,
+    db: Session = Depends(deps.get_db),
+    email_id: int,
+) -> Any:
+    """
+    Track email reply event and stop the prospect's follow-up sequence.
+    """
     email = crud.email.get(db=db, id=email_id)
     if not email:
         raise HTTPException(status_code=404, detail="Email not found")
 
+    first_reply = email.replied_at is None
+
     # Update email status
-    email_update = schemas.EmailUpdate(status="opened")
+    email_update = {"status": "replied", "replied_at": datetime.now(timezone.utc)}
     crud.email.update(db=db, db_obj=email, obj_in=email_update)
+    if first_reply:
+        analytics_service.record(db, [email_id], "replied")
+        db.commit()
 
-    return {"msg": "Email open tracked"}
+    send_scheduler.cancel_follow_ups(
+        db, prospect_id=email.prospect_id, campaign_id=email.campaign_id
+    )
 
+    return {"msg": "Email reply tracked"}
 
-@router.post("/track/click/{email_id}", response_model=schemas.Msg)
-def track_email_click(
+
+@router.post("/track/bounce/{email_id}", response_model=schemas.Msg)
+def track_email_bounce(
     *,
     db: Session = Depends(deps.get_db),
     email_id: int,
 ) -> Any:
     """
-    Track email click event.
+    Track email bounce event.
     """
     email = crud.email.get(db=db, id=email_id)
     if not email:
         raise HTTPException(status_code=404, detail="Email not found")
 
-    # Update email status
-    email_update = schemas.EmailUpdate(status="clicked")
-    crud.email.update(db=db, db_obj=email, obj_in=email_update)
+    if email.status != "bounced":
+        crud.email.update(db=db, db_obj=email, obj_in={"status": "bounced"})
+        analytics_service.record(db, [email_id], "bounced")
+        db.commit()
 
-    return {"msg": "Email click tracked"}
+    return {"msg": "Email bounce tracked"}
@@ -2,8 +2,10 @@ from typing import Any, List, Optional
 
 from app import crud, models, schemas
 from app.api import deps
-from app.services.segmentation_service import segmentation_service
-from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from app.services.prospect_import_service import prospect_importer
+from app.services.search_service import prospect_search
+from app.services.segmentation_job_service import segmentation_jobs
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
 from sqlalchemy.orm import Session
 
 router = APIRouter()
@@ -11,9 +13,9 @@ router = APIRouter()
 
 @router.get("/", response_model=List[schemas.Prospect])
 def get_prospects(
+    response: Response,
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    page: deps.PageParams = Depends(),
     search: Optional[str] = None,
     company: Optional[str] = None,
     industry: Optional[str] = None,
@@ -21,11 +23,15 @@ def get_prospects(
 ) -> Any:
     """
     Retrieve prospects with optional filtering.
+
+    Pass the `X-Next-Cursor` response header as `cursor` for the next page.
     """
-    return crud.prospect.get_multi(
+    return deps.paginate(
+        response,
+        crud.prospect,
         db,
-        skip=skip,
-        limit=limit,
+        page,
+        options=crud.prospect.with_company,
         search=search,
         company=company,
         industry=industry,
@@ -46,6 +52,22 @@ def create_prospect(
     return prospect
 
 
+@router.get("/search", response_model=List[schemas.Prospect])
+def search_prospects(
+    *,
+    db: Session = Depends(deps.get_db),
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+) -> Any:
+    """
+    Search prospects by name, email, job title, company and location.
+
+    Words match as prefixes and small typos are tolerated; results are
+    ranked best first.
+    """
+    return [prospect for prospect, _ in prospect_search.search(db, q, limit=limit)]
+
+
 @router.get("/{prospect_id}", response_model=schemas.Prospect)
 def get_prospect(
     *,
@@ -55,7 +77,9 @@ def get_prospect(
     """
     Get prospect by ID.
     """
-    prospect = crud.prospect.get(db=db, id=prospect_id)
+    prospect = crud.prospect.get(
+        db=db, id=prospect_id, options=crud.prospect.with_company
+    )
     if not prospect:
         raise HTTPException(status_code=404, detail="Prospect not found")
     return prospect
@@ -71,7 +95,9 @@ def update_prospect(
     """
     Update a prospect.
     """
-    prospect = crud.prospect.get(db=db, id=prospect_id)
+    prospect = crud.prospect.get(
+        db=db, id=prospect_id, options=crud.prospect.with_company
+    )
     if not prospect:
         raise HTTPException(status_code=404, detail="Prospect not found")
     prospect = crud.prospect.update(db=db, db_obj=prospect, obj_in=prospect_in)
@@ -87,7 +113,9 @@ def delete_prospect(
     """
     Delete a prospect.
     """
-    prospect = crud.prospect.get(db=db, id=prospect_id)
+    prospect = crud.prospect.get(
+        db=db, id=prospect_id, options=crud.prospect.with_company
+    )
     if not prospect:
         raise HTTPException(status_code=404, detail="Prospect not found")
     prospect = crud.prospect.remove(db=db, id=prospect_id)
@@ -102,49 +130,75 @@ def upload_prospects_csv(
 ) -> Any:
     """
     Import prospects from CSV file.
+
+    The file is streamed in chunks; rows that fail validation or whose email
+    already exists are skipped and reported in `error_details`.
     """
-    # Implementation would parse CSV and create prospects
-    # For now, return a placeholder response
-    return {
-        "total_rows": 100,
-        "imported": 95,
-        "errors": 5,
-        "error_details": ["Row 12: Missing email", "Row 45: Invalid email format"],
-    }
+    try:
+        return prospect_importer.import_csv(db, file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.post("/segment", response_model=schemas.SegmentationResult)
+@router.post(
+    "/segment", response_model=schemas.SegmentationJob, status_code=202
+)
 def segment_prospects(
     *,
     db: Session = Depends(deps.get_db),
     segmentation_params: schemas.SegmentationParams,
 ) -> Any:
     """
-    Segment prospects using machine learning.
-    """
-    # Get prospect data from database
-    prospects = crud.prospect.get_multi(db=db, limit=1000)
-
-    # Convert to format expected by segmentation service
-    prospect_data = [
-        {
-            "id": p.id,
-            "company_size": p.company.size if p.company else None,
-            "industry": p.company.industry if p.company else None,
-            "job_title": p.job_title,
-            "seniority": p.seniority,
-            "location": p.location,
-            # Add other relevant features
-        }
-        for p in prospects
-    ]
-
-    # Perform segmentation
-    result = segmentation_service.segment_prospects(
-        prospect_data=prospect_data,
-        algorithm=segmentation_params.algorithm,
-        n_clusters=segmentation_params.n_clusters,
-        params=segmentation_params.params,
-    )
+    Start segmenting prospects using machine learning; poll the returned
+    job for progress and the result.
+
+    K-means streams over all prospects with MiniBatchKMeans; DBSCAN and
+    hierarchical clustering run in memory on the first
+    `SEGMENTATION_IN_MEMORY_LIMIT` prospects. Both read features from the
+    feature store, refreshing only prospects changed since the last run.
+    The result becomes the active segmentation: segment membership is
+    written to the prospects, and new prospects join the nearest segment.
+    While the prospects are unchanged, repeating a request returns the
+    finished job instead of segmenting again.
+    """
+    try:
+        return segmentation_jobs.submit(
+            db,
+            algorithm=segmentation_params.algorithm,
+            n_clusters=segmentation_params.n_clusters,
+            params=segmentation_params.params,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/segment/jobs/{job_id}", response_model=schemas.SegmentationJob)
+def get_segmentation_job(
+    *,
+    db: Session = Depends(deps.get_db),
+    job_id: int,
+) -> Any:
+    """
+    Get the status, progress and, once it succeeded, the result of a
+    segmentation job.
+    """
+    job = segmentation_jobs.get(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Segmentation job not found")
+    return job
 
-    return result
+
+@router.delete("/segment/jobs/{job_id}", response_model=schemas.SegmentationJob)
+def cancel_segmentation_job(
+    *,
+    db: Session = Depends(deps.get_db),
+    job_id: int,
+) -> Any:
+    """
+    Cancel a segmentation job. A running job stops at its next progress
+    report; poll it until its status is "cancelled".
+    """
+    job = segmentation_jobs.get(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Segmentation job not found")
+    return segmentation_jobs.cancel(db, job)
@@ -3,7 +3,7 @@ from typing import Any, List, Optional
 from app import crud, models, schemas
 from app.api import deps
 from app.services.llm_service import llm_service
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
 router = APIRouter()
@@ -11,15 +11,17 @@ router = APIRouter()
 
 @router.get("/", response_model=List[schemas.EmailTemplate])
 def get_templates(
+    response: Response,
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    page: deps.PageParams = Depends(),
     tag: Optional[str] = None,
 ) -> Any:
     """
     Retrieve email templates with optional filtering.
+
+    Pass the `X-Next-Cursor` response header as `cursor` for the next page.
     """
-    return crud.template.get_multi(db, skip=skip, limit=limit, tag=tag)
+    return deps.paginate(response, crud.template, db, page, tag=tag)
 
 
 @router.post("/", response_model=schemas.EmailTemplate)
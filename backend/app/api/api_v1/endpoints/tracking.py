@@ -0,0 +1,58 @@
+import base64
+from typing import Any
+
+from app.core.security import verify_tracking_token
+from app.models.email import EmailEventTypeEnum
+from app.services.tracking_service import tracking_service
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import RedirectResponse
+
+router = APIRouter()
+
+# 1x1 transparent GIF
+PIXEL_GIF = base64.b64decode(
+    "R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7"
+)
+
+NO_CACHE_HEADERS = {
+    "Cache-Control": "no-store, no-cache, must-revalidate, private, max-age=0",
+    "Pragma": "no-cache",
+    "Expires": "0",
+}
+
+
+@router.get("/o/{token}.gif", include_in_schema=False)
+def track_open_pixel(token: str, request: Request) -> Any:
+    """
+    Serve the open-tracking pixel and record the open.
+    """
+    decoded = verify_tracking_token(token)
+    if decoded is not None:
+        tracking_service.record(
+            decoded[0],
+            EmailEventTypeEnum.OPEN,
+            user_agent=request.headers.get("user-agent"),
+            ip_address=request.client.host if request.client else None,
+        )
+    # Always answer with the pixel so broken tokens don't show as broken images
+    return Response(content=PIXEL_GIF, media_type="image/gif", headers=NO_CACHE_HEADERS)
+
+
+@router.get("/c/{token}", include_in_schema=False)
+def track_click_redirect(token: str, request: Request) -> Any:
+    """
+    Record a click and redirect to the link's original target.
+    """
+    decoded = verify_tracking_token(token)
+    if decoded is None or not decoded[1]:
+        raise HTTPException(status_code=404, detail="Link not found")
+
+    email_id, url = decoded
+    tracking_service.record(
+        email_id,
+        EmailEventTypeEnum.CLICK,
+        url=url,
+        user_agent=request.headers.get("user-agent"),
+        ip_address=request.client.host if request.client else None,
+    )
+    return RedirectResponse(url, status_code=302, headers=NO_CACHE_HEADERS)
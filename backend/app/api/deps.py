@@ -1,10 +1,12 @@
-from typing import Generator
+from typing import Any, Generator, List, Optional
 
-from app import crud, models, schemas
+from app import crud, schemas
 from app.core import security
 from app.core.config import settings
+from app.crud.base import CRUDBase
 from app.db.session import SessionLocal
-from fastapi import Depends, HTTPException, status
+from app.models.user import User
+from fastapi import Depends, HTTPException, Query, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from pydantic import ValidationError
@@ -23,7 +25,7 @@ def get_db() -> Generator:
 
 def get_current_user(
     db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> models.User:
+) -> User:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
         token_data = schemas.TokenPayload(**payload)
@@ -39,18 +41,66 @@ def get_current_user(
 
 
 def get_current_active_user(
-    current_user: models.User = Depends(get_current_user),
-) -> models.User:
+    current_user: User = Depends(get_current_user),
+) -> User:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 
 def get_current_active_superuser(
-    current_user: models.User = Depends(get_current_user),
-) -> models.User:
+    current_user: User = Depends(get_current_user),
+) -> User:
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
     return current_user
+
+
+class PageParams:
+    """
+    Paging parameters of the list endpoints. Pass the `X-Next-Cursor`
+    response header back as `cursor` for the next page; `skip` is kept for
+    older clients and gets slower the deeper it pages.
+    """
+
+    def __init__(
+        self,
+        skip: int = Query(0, ge=0),
+        limit: int = Query(100, ge=1, le=1000),
+        cursor: Optional[str] = None,
+        total: Optional[str] = Query(None, regex="^(exact|approximate)$"),
+    ):
+        self.skip = skip
+        self.limit = limit
+        self.cursor = cursor
+        self.total = total
+
+
+def paginate(
+    response: Response,
+    crud_obj: CRUDBase,
+    db: Session,
+    page: PageParams,
+    **filters: Any,
+) -> List[Any]:
+    """Fetch one page and report the next cursor and total as headers."""
+    try:
+        result = crud_obj.get_page(
+            db,
+            skip=page.skip,
+            limit=page.limit,
+            cursor=page.cursor,
+            total=page.total,
+            **filters,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result.next_cursor is not None:
+        response.headers["X-Next-Cursor"] = result.next_cursor
+    if result.total is not None:
+        response.headers["X-Total-Count"] = str(result.total)
+        if result.total_estimated:
+            response.headers["X-Total-Count-Estimated"] = "true"
+    return result.items
@@ -60,6 +60,114 @@ class Settings(BaseSettings):
     EMAILS_FROM_EMAIL: Optional[str] = ""
     EMAILS_FROM_NAME: Optional[str] = ""
 
+    # SMTP connection pool
+    SMTP_POOL_SIZE: int = 10
+    SMTP_POOL_MAX_MESSAGES: int = 100  # recycle a connection after N messages
+    SMTP_POOL_MAX_AGE: float = 300.0  # recycle a connection after T seconds
+    SMTP_POOL_NOOP_INTERVAL: float = 30.0  # NOOP-check connections idle this long
+    SMTP_POOL_TIMEOUT: float = 30.0
+
+    # Bulk campaign dispatch
+    DISPATCH_MAX_IN_FLIGHT: int = 20  # concurrent SMTP sessions per worker
+    DISPATCH_CHUNK_SIZE: int = 500
+    DISPATCH_WRITE_BATCH_SIZE: int = 200
+    DISPATCH_MAX_ATTEMPTS: int = 3  # tries per message on transient SMTP errors
+    DISPATCH_RETRY_DELAY: float = 1.0  # seconds before a retry; doubles each time
+    DISPATCH_LEASE_SECONDS: int = 600  # reclaim emails left "sending" this long
+    # Rate-limited emails get another pass when the first can go this soon;
+    # otherwise they stay pending for the next dispatch
+    DISPATCH_THROTTLE_WAIT_SECONDS: float = 60.0
+
+    # Email outbox workers
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_LEASE_SECONDS: int = 300
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_BACKOFF_BASE_SECONDS: float = 30.0
+    OUTBOX_BACKOFF_MAX_SECONDS: float = 3600.0
+
+    # Send throttling (token buckets shared through the database)
+    SEND_RATE_ACCOUNT_PER_MINUTE: float = 600.0
+    SEND_RATE_DOMAIN_PER_MINUTE: float = 120.0
+    SEND_RATE_DOMAIN_LIMITS: Dict[str, float] = {
+        "gmail.com": 30.0,
+        "googlemail.com": 30.0,
+        "outlook.com": 30.0,
+        "hotmail.com": 30.0,
+        "yahoo.com": 20.0,
+    }
+    SEND_RATE_BURST_SECONDS: float = 10.0  # bucket capacity in seconds of refill
+
+    # Scheduled sends and follow-up sequences
+    SCHEDULER_TICK_SECONDS: float = 1.0
+    SCHEDULER_LOOKAHEAD_SECONDS: int = 600
+    SCHEDULER_RESCAN_SECONDS: int = 60  # catches emails scheduled inside the window
+    SCHEDULER_RELEASE_BATCH_SIZE: int = 500
+
+    # Template personalization
+    PERSONALIZATION_CACHE_SIZE: int = 1024  # compiled templates kept in memory
+
+    # Tracking event ingestion. At most TRACKING_FLUSH_INTERVAL seconds of
+    # events (and never more than TRACKING_MAX_BUFFER) are lost on a crash.
+    TRACKING_FLUSH_INTERVAL: float = 1.0
+    TRACKING_FLUSH_SIZE: int = 1000
+    TRACKING_MAX_BUFFER: int = 100000
+    # Public base URL of this API, used for pixel and click-redirect links
+    TRACKING_BASE_URL: str = "http://localhost:8000"
+    # Signs pixel and click-redirect tokens. Required, and the same in the
+    # API and every worker: links stay valid across processes and restarts
+    TRACKING_SECRET: Optional[str] = None
+    # HyperLogLog precision for unique-engagement sketches: 2**p one-byte
+    # registers per sketch, standard error 1.04 / sqrt(2**p) (1.6% at 12)
+    HLL_PRECISION: int = 12
+
+    # CSV prospect import: rows validated and written per transaction, and
+    # the most per-row errors returned in one response
+    PROSPECT_IMPORT_CHUNK_SIZE: int = 5000
+    PROSPECT_IMPORT_MAX_ERROR_DETAILS: int = 1000
+
+    # Streaming segmentation: rows per chunk, and the random sample that
+    # seeds the centers and is plotted
+    SEGMENTATION_CHUNK_SIZE: int = 20000
+    SEGMENTATION_SAMPLE_SIZE: int = 20000
+    # Hashed columns per categorical prospect attribute; changing it changes
+    # the feature space
+    SEGMENTATION_HASH_FEATURES: int = 256
+    # DBSCAN and hierarchical clustering run in memory on at most this many
+    SEGMENTATION_IN_MEMORY_LIMIT: int = 10000
+    # Encoded prospect features kept between runs. Each refresh re-encodes
+    # rows changed since the previous one, minus this overlap for
+    # transactions that were still open
+    FEATURE_STORE_DIR: str = "data/feature_store"
+    FEATURE_STORE_OVERLAP_SECONDS: int = 300
+    # Background segmentation: worker processes, and the most often a job
+    # writes its progress (and checks for cancellation)
+    SEGMENTATION_JOB_WORKERS: int = 2
+    SEGMENTATION_JOB_PROGRESS_INTERVAL: float = 1.0
+    # Each API process stamps its queued and running jobs this often; a job
+    # not stamped for the stale interval lost its process and is failed
+    SEGMENTATION_JOB_HEARTBEAT_SECONDS: float = 30.0
+    SEGMENTATION_JOB_STALE_SECONDS: float = 300.0
+
+    # Rows fetched per round trip when streaming reply times for histograms
+    RESPONSE_TIME_CHUNK_SIZE: int = 10000
+
+    # Dashboard stats are recomputed at most once per interval per process
+    DASHBOARD_STATS_INTERVAL: float = 5.0
+    DASHBOARD_STATS_WINDOW_DAYS: int = 30
+    DASHBOARD_SSE_KEEPALIVE: float = 15.0
+
+    # A/B testing of template variations
+    AB_TEST_CONFIDENCE: float = 0.95
+    AB_TEST_MIN_SENDS: int = 100  # per variation before declaring a winner
+    AB_TEST_REFRESH_SECONDS: int = 60
+
+    # Thompson-sampling allocation of template variations
+    BANDIT_REWARD: str = "replied"  # or "opened"
+    BANDIT_PRIOR_ALPHA: float = 1.0
+    BANDIT_PRIOR_BETA: float = 1.0
+    BANDIT_POSTERIOR_TTL: float = 30.0  # seconds posteriors are cached per process
+
     class Config:
         case_sensitive = True
         env_file = ".env"
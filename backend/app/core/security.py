@@ -1,5 +1,8 @@
+import base64
+import hashlib
+import hmac
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Optional, Tuple, Union
 
 from app.core.config import settings
 from jose import jwt
@@ -28,3 +31,63 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def tracking_key() -> bytes:
+    """
+    Key for tracking tokens.
+
+    Raises:
+        RuntimeError: If TRACKING_SECRET is not configured
+    """
+    if not settings.TRACKING_SECRET:
+        raise RuntimeError(
+            "TRACKING_SECRET is not set; tracking links need a key shared by "
+            "the API and the workers"
+        )
+    return settings.TRACKING_SECRET.encode("utf-8")
+
+
+def _tracking_signature(payload: bytes) -> bytes:
+    return hmac.new(tracking_key(), payload, hashlib.sha256).digest()[:16]
+
+
+def create_tracking_token(email_id: int, url: Optional[str] = None) -> str:
+    """
+    Create a signed, URL-safe token for an open pixel (no `url`) or a
+    click redirect, so tracking requests can be validated without a lookup.
+    """
+    payload = str(email_id) if url is None else f"{email_id}|{url}"
+    payload_bytes = payload.encode("utf-8")
+    signature = _tracking_signature(payload_bytes)
+    return f"{_b64encode(payload_bytes)}.{_b64encode(signature)}"
+
+
+def verify_tracking_token(token: str) -> Optional[Tuple[int, Optional[str]]]:
+    """
+    Verify a tracking token.
+
+    Returns:
+        Tuple of (email id, url or None), or None if the token is invalid
+    """
+    try:
+        payload_part, signature_part = token.split(".", 1)
+        payload = _b64decode(payload_part)
+        signature = _b64decode(signature_part)
+    except (ValueError, TypeError):
+        return None
+    if not hmac.compare_digest(signature, _tracking_signature(payload)):
+        return None
+    email_id, _, url = payload.decode("utf-8").partition("|")
+    try:
+        return int(email_id), url or None
+    except ValueError:
+        return None
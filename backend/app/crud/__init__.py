@@ -1 +1,7 @@
+from .campaign import campaign
+from .company import company
+from .email import email, template
+from .prospect import prospect
 from .user import user
+
+__all__ = ["campaign", "company", "email", "prospect", "template", "user"]
@@ -1,15 +1,74 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import base64
+import json
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+    Union,
+)
 
 from app.db.base_class import Base
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import func, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
+class Page(NamedTuple):
+    items: List[Any]
+    # Opaque cursor of the next page; None on the last page
+    next_cursor: Optional[str]
+    # Only computed when requested; an estimate if `total_estimated`
+    total: Optional[int] = None
+    total_estimated: bool = False
+
+
+def encode_cursor(last_id: int) -> str:
+    payload = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Raises:
+        ValueError: If the cursor was not produced by `encode_cursor`
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))["id"]
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(last_id, int):
+        raise ValueError("Invalid cursor")
+    return last_id
+
+
+class _Explain(Executable, ClauseElement):
+    """`EXPLAIN (FORMAT JSON)` of a statement, with its parameters bound."""
+
+    inherit_cache = False
+
+    def __init__(self, statement: Any):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element: _Explain, compiler: Any, **kw: Any) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]):
         """
@@ -22,13 +81,108 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         self.model = model
 
-    def get(self, db: Session, id: Any) -> Optional[ModelType]:
-        return db.query(self.model).filter(self.model.id == id).first()
+    def get(
+        self, db: Session, id: Any, *, options: Sequence[Any] = ()
+    ) -> Optional[ModelType]:
+        return (
+            db.query(self.model).options(*options).filter(self.model.id == id).first()
+        )
+
+    def filter_query(self, query: Query, **filters: Any) -> Query:
+        """Apply list filters; subclasses add their own filter arguments."""
+        return query
 
     def get_multi(
-        self, db: Session, *, skip: int = 0, limit: int = 100
+        self,
+        db: Session,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        options: Sequence[Any] = (),
+        **filters: Any,
     ) -> List[ModelType]:
-        return db.query(self.model).offset(skip).limit(limit).all()
+        return self.get_page(
+            db, skip=skip, limit=limit, cursor=cursor, options=options, **filters
+        ).items
+
+    def get_page(
+        self,
+        db: Session,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        total: Optional[str] = None,
+        options: Sequence[Any] = (),
+        **filters: Any,
+    ) -> Page:
+        """
+        One page of rows in id order.
+
+        With a `cursor` the page starts right after the row the cursor
+        points to (keyset pagination), so it costs the same at any depth;
+        `skip` is only honoured without a cursor, for older clients.
+
+        Args:
+            cursor: `next_cursor` of the previous page
+            total: "exact" for a COUNT(*), "approximate" for a planner
+                estimate, None to skip counting
+            options: Loader options for the page query, e.g. eager loads
+                of the relationships the caller serializes
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        query = self.filter_query(db.query(self.model), **filters)
+        page_query = query.options(*options).order_by(self.model.id)
+        if cursor is not None:
+            page_query = page_query.filter(self.model.id > decode_cursor(cursor))
+        elif skip:
+            page_query = page_query.offset(skip)
+        # One extra row tells whether another page exists
+        items = page_query.limit(limit + 1).all()
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1].id)
+
+        count = None
+        estimated = False
+        if total == "approximate":
+            count = self.estimate_count(db, query)
+            estimated = count is not None
+        if total is not None and count is None:
+            count = self.count(db, query)
+        return Page(items, next_cursor, count, estimated)
+
+    def count(self, db: Session, query: Optional[Query] = None) -> int:
+        query = query if query is not None else db.query(self.model)
+        return query.order_by(None).with_entities(func.count(self.model.id)).scalar()
+
+    def estimate_count(
+        self, db: Session, query: Optional[Query] = None
+    ) -> Optional[int]:
+        """
+        Row count estimate from planner statistics, without scanning.
+
+        Unfiltered tables use `pg_class.reltuples`; filtered queries use the
+        row estimate of their plan. Returns None if the table has never been
+        analyzed.
+        """
+        query = query if query is not None else db.query(self.model)
+        if query.whereclause is None:
+            estimate = db.execute(
+                text(
+                    "SELECT reltuples::bigint FROM pg_class "
+                    "WHERE oid = CAST(:table AS regclass)"
+                ),
+                {"table": self.model.__tablename__},
+            ).scalar()
+            # -1 (or 0 before PostgreSQL 14) until the first ANALYZE
+            return int(estimate) if estimate and estimate > 0 else None
+        plan = db.execute(_Explain(query.order_by(None).statement)).scalar()
+        return int(plan[0]["Plan"]["Plan Rows"])
 
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in)
@@ -0,0 +1,18 @@
+from typing import Any, Optional
+
+from app.crud.base import CRUDBase
+from app.models.campaign import Campaign
+from app.schemas.campaign import CampaignCreate, CampaignUpdate
+from sqlalchemy.orm import Query
+
+
+class CRUDCampaign(CRUDBase[Campaign, CampaignCreate, CampaignUpdate]):
+    def filter_query(
+        self, query: Query, *, status: Optional[str] = None, **filters: Any
+    ) -> Query:
+        if status:
+            query = query.filter(Campaign.status == status)
+        return query
+
+
+campaign = CRUDCampaign(Campaign)
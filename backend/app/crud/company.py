@@ -0,0 +1,46 @@
+from typing import Any, Dict, Union
+
+import pandas as pd
+from app.crud.base import CRUDBase
+from app.models.prospect import Company
+from app.schemas.prospect import CompanyCreate, CompanyUpdate
+from app.services.company_service import normalize_domain, normalize_name
+from app.services.search_service import prospect_search
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+
+class CRUDCompany(CRUDBase[Company, CompanyCreate, CompanyUpdate]):
+    def update(
+        self,
+        db: Session,
+        *,
+        db_obj: Company,
+        obj_in: Union[CompanyUpdate, Dict[str, Any]],
+    ) -> Company:
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = jsonable_encoder(obj_in.dict(exclude_unset=True))
+        renamed = "name" in update_data and update_data["name"] != db_obj.name
+        for field, value in update_data.items():
+            if hasattr(Company, field):
+                setattr(db_obj, field, value)
+        # Keep the company resolver's matching keys in step
+        if "name" in update_data:
+            db_obj.normalized_name = normalize_name(pd.Series([db_obj.name]))[0]
+        if "website" in update_data:
+            db_obj.normalized_domain = normalize_domain(
+                pd.Series([db_obj.website])
+            )[0]
+        db.add(db_obj)
+        db.flush()
+        if renamed:
+            # The company name is part of each of its prospects' search data
+            prospect_search.refresh_companies(db, [db_obj.id])
+        db.commit()
+        db.refresh(db_obj)
+        return db_obj
+
+
+company = CRUDCompany(Company)
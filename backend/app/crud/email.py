@@ -0,0 +1,45 @@
+from typing import Any, Optional
+
+from app.crud.base import CRUDBase
+from app.models.email import Email, EmailTemplate
+from app.schemas.email import (
+    EmailCreate,
+    EmailTemplateCreate,
+    EmailTemplateUpdate,
+    EmailUpdate,
+)
+from sqlalchemy import cast
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Query
+
+
+class CRUDEmail(CRUDBase[Email, EmailCreate, EmailUpdate]):
+    def filter_query(
+        self,
+        query: Query,
+        *,
+        campaign_id: Optional[int] = None,
+        prospect_id: Optional[int] = None,
+        status: Optional[str] = None,
+        **filters: Any,
+    ) -> Query:
+        if campaign_id is not None:
+            query = query.filter(Email.campaign_id == campaign_id)
+        if prospect_id is not None:
+            query = query.filter(Email.prospect_id == prospect_id)
+        if status:
+            query = query.filter(Email.status == status)
+        return query
+
+
+class CRUDTemplate(CRUDBase[EmailTemplate, EmailTemplateCreate, EmailTemplateUpdate]):
+    def filter_query(
+        self, query: Query, *, tag: Optional[str] = None, **filters: Any
+    ) -> Query:
+        if tag:
+            query = query.filter(cast(EmailTemplate.tags, JSONB).contains([tag]))
+        return query
+
+
+email = CRUDEmail(Email)
+template = CRUDTemplate(EmailTemplate)
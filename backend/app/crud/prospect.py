@@ -0,0 +1,71 @@
+from typing import Any, Dict, Optional, Union
+
+from app.crud.base import CRUDBase
+from app.models.prospect import Company, Prospect
+from app.schemas.prospect import ProspectCreate, ProspectUpdate
+from app.services.company_service import company_resolver
+from app.services.search_service import prospect_search
+from app.services.segment_model_service import segment_model_registry
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Query, Session, joinedload
+
+
+class CRUDProspect(CRUDBase[Prospect, ProspectCreate, ProspectUpdate]):
+    # Loader options for callers that read `company` of every row, such as
+    # responses serialized with the nested `schemas.Prospect.company`
+    with_company = (joinedload(Prospect.company),)
+
+    def filter_query(
+        self,
+        query: Query,
+        *,
+        search: Optional[str] = None,
+        company: Optional[str] = None,
+        industry: Optional[str] = None,
+        segment_id: Optional[int] = None,
+        **filters: Any,
+    ) -> Query:
+        if search:
+            # Index-backed match; pages stay in id order for the cursor
+            criterion = prospect_search.match(query.session, search)
+            if criterion is not None:
+                query = query.filter(criterion)
+        if company or industry:
+            query = query.join(Company, Company.id == Prospect.company_id)
+            if company:
+                query = query.filter(Company.name.ilike(f"%{company}%"))
+            if industry:
+                query = query.filter(Company.industry == industry)
+        if segment_id is not None:
+            query = query.filter(Prospect.segment_id == segment_id)
+        return query
+
+    def create(self, db: Session, *, obj_in: ProspectCreate) -> Prospect:
+        obj_in_data = jsonable_encoder(obj_in, exclude={"company"})
+        if obj_in.company is not None and obj_in_data.get("company_id") is None:
+            obj_in_data["company_id"] = company_resolver.resolve_one(
+                db, jsonable_encoder(obj_in.company)
+            )
+        db_obj = Prospect(**obj_in_data)
+        db.add(db_obj)
+        db.flush()
+        prospect_search.refresh(db, [db_obj.id])
+        segment_model_registry.assign(db, [db_obj.id])
+        db.commit()
+        db.refresh(db_obj)
+        return db_obj
+
+    def update(
+        self,
+        db: Session,
+        *,
+        db_obj: Prospect,
+        obj_in: Union[ProspectUpdate, Dict[str, Any]],
+    ) -> Prospect:
+        db_obj = super().update(db, db_obj=db_obj, obj_in=obj_in)
+        prospect_search.refresh(db, [db_obj.id])
+        db.commit()
+        return db_obj
+
+
+prospect = CRUDProspect(Prospect)
@@ -4,4 +4,9 @@ from app.db.base_class import Base  # noqa
 from app.models.user import User  # noqa
 from app.models.prospect import Prospect, Company, ProspectSegment  # noqa
 from app.models.campaign import Campaign  # noqa
-from app.models.email import Email, EmailTemplate  # noqa
+from app.models.email import Email, EmailEvent, EmailTemplate  # noqa
+from app.models.outbox import EmailOutbox  # noqa
+from app.models.rate_limit import RateLimitBucket  # noqa
+from app.models.analytics import EmailDailyRollup, EngagementSketch  # noqa
+from app.models.bandit import VariationPosterior  # noqa
+from app.models.segmentation import SegmentationJob, SegmentationModel  # noqa
@@ -3,13 +3,15 @@ import logging
 from app import crud, schemas
 from app.core.config import settings
 from app.db import base  # noqa: F401
+from app.db.session import SessionLocal
+from app.services.search_service import prospect_search
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
 # Make sure all SQL Alchemy models are imported before initializing DB
 # otherwise, SQL Alchemy might fail to initialize relationships properly
-from app.models import user, prospect, campaign, email  # noqa
+from app.models import user, prospect, campaign, email, outbox, rate_limit, analytics, bandit, segmentation  # noqa
 
 
 def init_db(db: Session) -> None:
@@ -27,3 +29,23 @@ def init_db(db: Session) -> None:
         logger.info(f"Superuser {settings.FIRST_SUPERUSER_EMAIL} created")
     else:
         logger.info(f"Superuser {settings.FIRST_SUPERUSER_EMAIL} already exists")
+
+    # Prospects written before search was indexed have no search data
+    indexed = prospect_search.backfill(db)
+    db.commit()
+    if indexed:
+        logger.info(f"Indexed {indexed} prospects for search")
+
+
+def main() -> None:
+    """Initial data and backfills: `python -m app.db.init_db`."""
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        init_db(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
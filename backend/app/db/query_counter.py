@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional
+
+from app.db.session import engine as default_engine
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    """
+    Records the SQL statements an engine executes while the counter is
+    active. An executemany counts as one statement.
+
+        with QueryCounter() as queries:
+            client.get("/api/v1/prospects/")
+        assert queries.count == 1
+    """
+
+    def __init__(self, engine: Optional[Engine] = None):
+        self.engine = engine or default_engine
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+        self.statements.append(statement)
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+
+@contextmanager
+def assert_max_queries(
+    limit: int, engine: Optional[Engine] = None
+) -> Iterator[QueryCounter]:
+    """
+    Fail if the block executes more than `limit` statements, listing them;
+    use around a test client request to catch N+1 loading regressions.
+    """
+    with QueryCounter(engine) as queries:
+        yield queries
+    if queries.count > limit:
+        raise AssertionError(
+            f"Expected at most {limit} queries, got {queries.count}:\n"
+            + "\n".join(f"{n}. {sql}" for n, sql in enumerate(queries.statements, 1))
+        )
@@ -1,6 +1,16 @@
+import asyncio
+import json
+
+from app.api.api_v1.endpoints import tracking
 from app.core.config import settings
-from fastapi import FastAPI
+from app.core.security import tracking_key
+from app.services.dashboard_service import dashboard_stats
+from app.services.email_service import email_service
+from app.services.segmentation_job_service import segmentation_jobs
+from app.services.tracking_service import tracking_service
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -24,6 +34,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paging headers of the list endpoints
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Total-Count-Estimated"],
 )
 
 
@@ -38,22 +50,91 @@ async def root():
 # app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+# Tracking pixel and click redirects are embedded in emails, so they live
+# outside the versioned API under a short prefix
+app.include_router(tracking.router, prefix="/t", tags=["tracking"])
+
+
+@app.on_event("startup")
+def start_tracking_service():
+    # Fail at startup rather than on the first tracked email
+    tracking_key()
+    tracking_service.start()
+
+
+@app.on_event("startup")
+def start_segmentation_jobs():
+    # Also fails the jobs a previous run left queued or running
+    segmentation_jobs.start()
+
+
+@app.on_event("shutdown")
+def shutdown_tracking_service():
+    tracking_service.stop()
+
+
+@app.on_event("shutdown")
+def shutdown_email_service():
+    email_service.close()
+
+
+@app.on_event("shutdown")
+def shutdown_segmentation_jobs():
+    segmentation_jobs.shutdown()
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
 
-# (Optional) Example endpoint to serve dashboard data
 @app.get("/api/v1/dashboard-stats")
-async def get_dashboard_stats():
-    # Return your real-time dashboard data here
-    return {
-        "activeCampaigns": 12,
-        "activeCampaignChange": 23.36,
-        "emailsSent": 2543,
-        "emailsSentChange": 12.05,
-        "openRate": 42.3,
-        "openRateChange": 9.05,
-        "meetingsBooked": 28,
-        "meetingsBookedChange": 18.87,
+async def get_dashboard_stats(request: Request):
+    """
+    Dashboard stats, served from a shared cache. Polling clients can send
+    If-None-Match to get a 304 while the stats are unchanged.
+    """
+    stats, etag = await dashboard_stats.get()
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={int(dashboard_stats.interval)}",
     }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(stats, headers=headers)
+
+
+@app.get("/api/v1/dashboard-stats/stream")
+async def stream_dashboard_stats(request: Request):
+    """
+    Server-sent events stream of dashboard stats: one `stats` event now and
+    one whenever they change.
+    """
+
+    async def events():
+        queue = dashboard_stats.subscribe()
+        try:
+            stats, etag = await dashboard_stats.get()
+            while not await request.is_disconnected():
+                if stats is not None:
+                    yield f"id: {etag}\nevent: stats\ndata: {json.dumps(stats)}\n\n"
+                last_etag = etag
+                try:
+                    stats, etag = await asyncio.wait_for(
+                        queue.get(), timeout=settings.DASHBOARD_SSE_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    # Keep proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    stats = None
+                    continue
+                if etag == last_etag:
+                    stats = None
+        finally:
+            dashboard_stats.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
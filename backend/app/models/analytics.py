@@ -0,0 +1,50 @@
+from app.db.base_class import Base
+from sqlalchemy import Column, Date, DateTime, Index, Integer, LargeBinary, String
+from sqlalchemy.sql import func
+
+
+class EmailDailyRollup(Base):
+    __tablename__ = "email_daily_rollups"
+
+    # Emails are counted on the day they were sent, so every counter in a row
+    # refers to the same cohort and rates are simple ratios. Missing campaign,
+    # template or segment is stored as 0 to keep the key NOT NULL and unique.
+    day = Column(Date, primary_key=True)
+    campaign_id = Column(Integer, primary_key=True, default=0)
+    template_id = Column(Integer, primary_key=True, default=0)
+    segment_id = Column(Integer, primary_key=True, default=0)
+    variation = Column(Integer, primary_key=True, default=0)
+    sent = Column(Integer, default=0, nullable=False)
+    contacted = Column(Integer, default=0, nullable=False)  # first-touch sends
+    opened = Column(Integer, default=0, nullable=False)
+    clicked = Column(Integer, default=0, nullable=False)
+    replied = Column(Integer, default=0, nullable=False)
+    bounced = Column(Integer, default=0, nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    __table_args__ = (
+        Index("ix_email_daily_rollups_campaign_day", "campaign_id", "day"),
+        Index("ix_email_daily_rollups_template_day", "template_id", "day"),
+    )
+
+
+class EngagementSketch(Base):
+    __tablename__ = "engagement_sketches"
+
+    # HyperLogLog registers of the prospects seen for one metric on one day,
+    # scoped to a campaign or a template. Sketches merge across days and
+    # scopes by taking the register-wise maximum.
+    day = Column(Date, primary_key=True)
+    scope = Column(String, primary_key=True)  # "campaign" or "template"
+    scope_id = Column(Integer, primary_key=True)
+    metric = Column(String, primary_key=True)  # "sent", "opened" or "clicked"
+    registers = Column(LargeBinary, nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    __table_args__ = (
+        Index("ix_engagement_sketches_scope_day", "scope", "scope_id", "metric", "day"),
+    )
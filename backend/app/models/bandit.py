@@ -0,0 +1,16 @@
+from app.db.base_class import Base
+from sqlalchemy import Column, DateTime, ForeignKey, Integer
+from sqlalchemy.sql import func
+
+
+class VariationPosterior(Base):
+    __tablename__ = "variation_posteriors"
+
+    # Beta(prior + successes, prior + trials - successes) per variation
+    template_id = Column(Integer, ForeignKey("email_templates.id"), primary_key=True)
+    variation = Column(Integer, primary_key=True)
+    trials = Column(Integer, default=0, nullable=False)
+    successes = Column(Integer, default=0, nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
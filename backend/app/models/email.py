@@ -1,7 +1,17 @@
 import enum
 
 from app.db.base_class import Base
-from sqlalchemy import JSON, Column, DateTime, Enum, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    JSON,
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -9,12 +19,15 @@ from sqlalchemy.sql import func
 class EmailStatusEnum(str, enum.Enum):
     DRAFT = "draft"
     SCHEDULED = "scheduled"
+    # Claimed by a campaign dispatch that is sending it
+    SENDING = "sending"
     SENT = "sent"
     OPENED = "opened"
     CLICKED = "clicked"
     REPLIED = "replied"
     BOUNCED = "bounced"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 
 class Email(Base):
@@ -23,14 +36,20 @@ class Email(Base):
     id = Column(Integer, primary_key=True, index=True)
     prospect_id = Column(Integer, ForeignKey("prospects.id"), nullable=False)
     campaign_id = Column(Integer, ForeignKey("campaigns.id"), nullable=True)
+    template_id = Column(Integer, ForeignKey("email_templates.id"), nullable=True)
+    # Index of the template variation sent; 0 is the template itself
+    variation = Column(Integer, default=0, nullable=False)
+    # Follow-ups point at the first email of their sequence
+    parent_email_id = Column(Integer, ForeignKey("emails.id"), nullable=True)
+    sequence_step = Column(Integer, default=0, nullable=False)
     subject = Column(String, nullable=False)
     body = Column(Text, nullable=False)
     status = Column(Enum(EmailStatusEnum), default=EmailStatusEnum.DRAFT)
-    scheduled_time = Column(DateTime(timezone=True))
+    scheduled_time = Column(DateTime(timezone=True), index=True)
     sent_at = Column(DateTime(timezone=True))
     opened_at = Column(DateTime(timezone=True))
     clicked_at = Column(DateTime(timezone=True))
-    replied_at = Column(DateTime(timezone=True))
+    replied_at = Column(DateTime(timezone=True), index=True)
     metadata = Column(JSON)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -38,6 +57,32 @@ class Email(Base):
     # Relationships
     prospect = relationship("Prospect", back_populates="emails")
     campaign = relationship("Campaign", back_populates="emails")
+    parent_email = relationship("Email", remote_side=[id])
+
+    __table_args__ = (
+        # Serves per-campaign reply scans such as the response-time histogram
+        Index("ix_emails_campaign_id_replied_at", "campaign_id", "replied_at"),
+    )
+
+
+class EmailEventTypeEnum(str, enum.Enum):
+    OPEN = "open"
+    CLICK = "click"
+
+
+class EmailEvent(Base):
+    __tablename__ = "email_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    email_id = Column(Integer, ForeignKey("emails.id"), index=True, nullable=False)
+    event_type = Column(Enum(EmailEventTypeEnum), nullable=False)
+    url = Column(Text)
+    user_agent = Column(String)
+    ip_address = Column(String)
+    occurred_at = Column(DateTime(timezone=True), nullable=False)
+
+    # Relationships
+    email = relationship("Email")
 
 
 class EmailTemplate(Base):
@@ -48,6 +93,8 @@ class EmailTemplate(Base):
     description = Column(Text)
     subject = Column(String, nullable=False)
     body = Column(Text, nullable=False)
+    # Alternative {"subject", "body"} pairs; variation n is variations[n - 1]
+    variations = Column(JSON)
     tags = Column(JSON)
     performance = Column(JSON)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,50 @@
+import enum
+
+from app.db.base_class import Base
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+)
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+
+class OutboxStatusEnum(str, enum.Enum):
+    PENDING = "pending"
+    IN_FLIGHT = "in_flight"
+    SENT = "sent"
+    DEAD = "dead"
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    email_id = Column(Integer, ForeignKey("emails.id"), unique=True, nullable=False)
+    status = Column(
+        Enum(OutboxStatusEnum), default=OutboxStatusEnum.PENDING, nullable=False
+    )
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=5, nullable=False)
+    available_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    locked_by = Column(String)
+    locked_until = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Relationships
+    email = relationship("Email")
+
+    __table_args__ = (
+        # Serves the claim query: ready rows ordered by availability
+        Index("ix_email_outbox_status_available_at", "status", "available_at"),
+    )
@@ -1,8 +1,26 @@
 from app.db.base_class import Base
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    DDL,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    event,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
+# Trigram indexes below need the pg_trgm operator classes
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
 
 class Company(Base):
     __tablename__ = "companies"
@@ -13,12 +31,26 @@ class Company(Base):
     industry = Column(String, index=True)
     size = Column(String)
     description = Column(Text)
+    # Matching keys maintained by the company resolver: the bare website
+    # host identifies a company; the name is only used without a website
+    normalized_domain = Column(String, unique=True, index=True)
+    normalized_name = Column(String, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     prospects = relationship("Prospect", back_populates="company")
 
+    __table_args__ = (
+        # Substring (ILIKE '%...%') filters on company name
+        Index(
+            "ix_companies_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
+
 
 class Prospect(Base):
     __tablename__ = "prospects"
@@ -36,6 +68,11 @@ class Prospect(Base):
     notes = Column(Text)
     company_id = Column(Integer, ForeignKey("companies.id"))
     segment_id = Column(Integer, ForeignKey("prospect_segments.id"), nullable=True)
+    # Maintained by the prospect search service from the prospect's and its
+    # company's fields: weighted full-text document and lower-cased text for
+    # trigram matching
+    search_document = Column(TSVECTOR().with_variant(Text(), "sqlite"))
+    search_text = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -44,6 +81,20 @@ class Prospect(Base):
     segment = relationship("ProspectSegment", back_populates="prospects")
     emails = relationship("Email", back_populates="prospect")
 
+    __table_args__ = (
+        Index(
+            "ix_prospects_search_document",
+            "search_document",
+            postgresql_using="gin",
+        ),
+        Index(
+            "ix_prospects_search_text_trgm",
+            "search_text",
+            postgresql_using="gin",
+            postgresql_ops={"search_text": "gin_trgm_ops"},
+        ),
+    )
+
 
 class ProspectSegment(Base):
     __tablename__ = "prospect_segments"
@@ -51,6 +102,10 @@ class ProspectSegment(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     description = Column(Text)
+    # The segmentation that produced the segment, and its center's row there
+    model_id = Column(Integer, ForeignKey("segmentation_models.id"), index=True)
+    cluster = Column(Integer)
+    size = Column(Integer)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -0,0 +1,14 @@
+from app.db.base_class import Base
+from sqlalchemy import Column, DateTime, Float, String
+from sqlalchemy.sql import func
+
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+
+    # e.g. "campaign:12", "account:noreply@example.com", "domain:gmail.com"
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    capacity = Column(Float, nullable=False)
+    refill_rate = Column(Float, nullable=False)  # tokens per second
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,76 @@
+from app.db.base_class import Base
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    text,
+)
+from sqlalchemy.sql import func
+
+
+class SegmentationModel(Base):
+    __tablename__ = "segmentation_models"
+
+    # One fitted segmentation; the id is its version. New prospects are
+    # assigned to the nearest center of the active model, after the same
+    # encoding and scaling. Arrays are raw float64 bytes: the per-feature
+    # max-abs scale and the (n_segments, n_features) centers in the order
+    # of `ProspectSegment.cluster`.
+    id = Column(Integer, primary_key=True, index=True)
+    algorithm = Column(String, nullable=False)
+    n_clusters = Column(Integer, nullable=False)
+    params = Column(JSON)
+    encoder_version = Column(Integer, nullable=False)
+    n_features = Column(Integer, nullable=False)
+    scale = Column(LargeBinary, nullable=False)
+    centers = Column(LargeBinary, nullable=False)
+    is_active = Column(Boolean, default=False, nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+LIVE_JOB = "status IN ('queued', 'running') AND NOT cancel_requested"
+
+
+class SegmentationJob(Base):
+    __tablename__ = "segmentation_jobs"
+
+    # A segmentation run in a worker process. status goes queued -> running
+    # -> succeeded | failed | cancelled; cancellation is requested through
+    # the flag and honoured at the job's next progress report. cache_key
+    # identifies the data version and parameters, so a finished job's
+    # result is reused until the prospects change. heartbeat_at is stamped
+    # by the API process that owns a queued or running job.
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String, nullable=False, default="queued", index=True)
+    algorithm = Column(String, nullable=False)
+    n_clusters = Column(Integer, nullable=False)
+    params = Column(JSON)
+    cache_key = Column(String, nullable=False, index=True)
+    progress = Column(Float, nullable=False, default=0.0)
+    stage = Column(String)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    result = Column(JSON)
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        # One live job per cache key across API processes; a job being
+        # cancelled no longer holds it
+        Index(
+            "uq_segmentation_jobs_live_cache_key",
+            "cache_key",
+            unique=True,
+            postgresql_where=text(LIVE_JOB),
+            sqlite_where=text(LIVE_JOB),
+        ),
+    )
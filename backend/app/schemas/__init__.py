@@ -1,2 +1,35 @@
+from .prospect import (
+    Company,
+    CompanyCreate,
+    CompanyUpdate,
+    Prospect,
+    ProspectCreate,
+    ProspectImportResponse,
+    ProspectSegment,
+    ProspectUpdate,
+    SegmentationJob,
+    SegmentationParams,
+    SegmentationResult,
+)
 from .token import Token, TokenPayload
 from .user import User, UserCreate, UserInDB, UserUpdate
+
+__all__ = [
+    "Company",
+    "CompanyCreate",
+    "CompanyUpdate",
+    "Prospect",
+    "ProspectCreate",
+    "ProspectImportResponse",
+    "ProspectSegment",
+    "ProspectUpdate",
+    "SegmentationJob",
+    "SegmentationParams",
+    "SegmentationResult",
+    "Token",
+    "TokenPayload",
+    "User",
+    "UserCreate",
+    "UserInDB",
+    "UserUpdate",
+]
@@ -14,11 +14,14 @@ class EmailStatus(str, Enum):
     REPLIED = "replied"
     BOUNCED = "bounced"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 
 class EmailBase(BaseModel):
     prospect_id: int
     campaign_id: Optional[int] = None
+    template_id: Optional[int] = None
+    variation: int = 0
     subject: str
     body: str
     status: EmailStatus = EmailStatus.DRAFT
@@ -39,6 +42,8 @@ class EmailUpdate(EmailBase):
 
 class Email(EmailBase):
     id: int
+    parent_email_id: Optional[int] = None
+    sequence_step: int = 0
     created_at: datetime
     updated_at: datetime
     sent_at: Optional[datetime] = None
@@ -89,6 +94,7 @@ class EmailTemplateBase(BaseModel):
     description: Optional[str] = None
     subject: str
     body: str
+    variations: Optional[List[Dict[str, str]]] = None
     tags: Optional[List[str]] = None
 
 
@@ -1,4 +1,5 @@
 import re
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, EmailStr, HttpUrl, validator
@@ -72,7 +73,8 @@ class ProspectSegment(BaseModel):
     name: str
     description: Optional[str] = None
     size: int
-    prospects: Optional[List[Prospect]] = None
+    # Member prospect ids, for in-memory algorithms
+    prospects: Optional[List[int]] = None
 
 
 class SegmentationParams(BaseModel):
@@ -86,6 +88,8 @@ class SegmentationResult(BaseModel):
     visualization_data: Optional[Dict[str, Any]] = None
     n_clusters: int
     algorithm: str
+    model_version: Optional[int] = None
+    stats: Optional[Dict[str, Any]] = None
 
 
 class ProspectImportResponse(BaseModel):
@@ -93,3 +97,22 @@ class ProspectImportResponse(BaseModel):
     imported: int
     errors: int
     error_details: Optional[List[str]] = None
+    rows_per_second: Optional[float] = None
+
+
+class SegmentationJob(BaseModel):
+    id: int
+    status: str
+    algorithm: str
+    n_clusters: int
+    params: Optional[Dict[str, Any]] = None
+    progress: float
+    stage: Optional[str] = None
+    result: Optional[SegmentationResult] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,336 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+import numpy as np
+from app.core.config import settings
+from app.models.analytics import EmailDailyRollup
+from app.models.email import EmailTemplate
+from scipy.special import erfc, ndtri
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Rates tested between variations, as (name, counter) pairs
+TESTED_RATES = (("open_rate", "opened"), ("reply_rate", "replied"))
+
+
+class VariationCounts(NamedTuple):
+    """Per-(template, variation) counters, sorted by template then variation."""
+
+    template_id: np.ndarray
+    variation: np.ndarray
+    sent: np.ndarray
+    opened: np.ndarray
+    replied: np.ndarray
+
+
+class ABTestEngine:
+    """
+    A/B statistics for template variations, computed from the daily rollups.
+
+    Counters for every (template, variation) are loaded with one query into
+    NumPy arrays. Rates, Wilson score intervals and two-proportion z-tests
+    between every pair of variations of the same template are then computed
+    for all templates at once, without a Python loop over templates or
+    pairs. Pairwise tests are Bonferroni-corrected within each template.
+
+    `refresh` writes the summaries to `EmailTemplate.performance`, but only
+    for templates whose rollups changed since the previous refresh.
+    """
+
+    def __init__(
+        self, confidence: Optional[float] = None, min_sends: Optional[int] = None
+    ):
+        self.confidence = confidence or settings.AB_TEST_CONFIDENCE
+        self.min_sends = min_sends or settings.AB_TEST_MIN_SENDS
+        self._z = float(ndtri(1 - (1 - self.confidence) / 2))
+        self._watermark: Optional[datetime] = None
+
+    def load_counts(
+        self, db: Session, template_ids: Optional[Iterable[int]] = None
+    ) -> VariationCounts:
+        """Load all-time counters per (template, variation) from the rollups."""
+        query = (
+            select(
+                EmailDailyRollup.template_id,
+                EmailDailyRollup.variation,
+                func.sum(EmailDailyRollup.sent),
+                func.sum(EmailDailyRollup.opened),
+                func.sum(EmailDailyRollup.replied),
+            )
+            .where(EmailDailyRollup.template_id != 0)
+            .group_by(EmailDailyRollup.template_id, EmailDailyRollup.variation)
+            .order_by(EmailDailyRollup.template_id, EmailDailyRollup.variation)
+        )
+        if template_ids is not None:
+            query = query.where(EmailDailyRollup.template_id.in_(list(template_ids)))
+        rows = db.execute(query).all()
+        if not rows:
+            empty = np.empty(0, dtype=np.int64)
+            return VariationCounts(empty, empty, empty, empty, empty)
+        columns = np.array(rows, dtype=np.int64).T
+        return VariationCounts(*columns)
+
+    def wilson_interval(self, successes: np.ndarray, trials: np.ndarray) -> np.ndarray:
+        """
+        Wilson score intervals for many proportions.
+
+        Returns:
+            Array of shape (n, 2) with the lower and upper bounds
+        """
+        z2 = self._z**2
+        n = np.maximum(trials, 1).astype(np.float64)
+        p = successes / n
+        denominator = 1 + z2 / n
+        center = (p + z2 / (2 * n)) / denominator
+        half = self._z * np.sqrt(p * (1 - p) / n + z2 / (4 * n * n)) / denominator
+        bounds = np.stack([center - half, center + half], axis=1)
+        bounds[trials == 0] = 0.0
+        return np.clip(bounds, 0.0, 1.0)
+
+    @staticmethod
+    def pairs(template_id: np.ndarray) -> np.ndarray:
+        """
+        Index pairs (i, j), i < j, of rows that belong to the same template.
+
+        Groups are handled per distinct group size, so the number of Python
+        iterations is the number of distinct variation counts, not templates.
+
+        Returns:
+            Array of shape (pairs, 2)
+        """
+        if len(template_id) == 0:
+            return np.empty((0, 2), dtype=np.int64)
+        starts = np.flatnonzero(np.r_[True, template_id[1:] != template_id[:-1]])
+        sizes = np.diff(np.r_[starts, len(template_id)])
+        chunks = []
+        for size in np.unique(sizes):
+            if size < 2:
+                continue
+            a, b = np.triu_indices(size, k=1)
+            group_starts = starts[sizes == size][:, None]
+            chunks.append(
+                np.stack(
+                    [(group_starts + a).ravel(), (group_starts + b).ravel()], axis=1
+                )
+            )
+        if not chunks:
+            return np.empty((0, 2), dtype=np.int64)
+        return np.concatenate(chunks)
+
+    def compare(
+        self, successes: np.ndarray, trials: np.ndarray, pairs: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """
+        Two-sided two-proportion z-tests for the given index pairs.
+
+        Returns:
+            Dictionary of arrays, one entry per pair: "difference" (rate of i
+            minus rate of j), "z" and "p_value"
+        """
+        i, j = pairs[:, 0], pairs[:, 1]
+        n1 = trials[i].astype(np.float64)
+        n2 = trials[j].astype(np.float64)
+        x1 = successes[i]
+        x2 = successes[j]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p1 = np.where(n1 > 0, x1 / n1, 0.0)
+            p2 = np.where(n2 > 0, x2 / n2, 0.0)
+            pooled = (x1 + x2) / np.maximum(n1 + n2, 1)
+            se = np.sqrt(pooled * (1 - pooled) * (1 / n1 + 1 / n2))
+            z = np.where(se > 0, (p1 - p2) / se, 0.0)
+        return {
+            "difference": p1 - p2,
+            "z": z,
+            "p_value": erfc(np.abs(z) / np.sqrt(2)),
+        }
+
+    def analyze(self, counts: VariationCounts) -> Dict[int, Dict[str, Any]]:
+        """
+        Compute the performance summary of every template in `counts`.
+
+        Returns:
+            Dictionary of template id -> summary, the format stored in
+            `EmailTemplate.performance`
+        """
+        if len(counts.template_id) == 0:
+            return {}
+        pairs = self.pairs(counts.template_id)
+        i, j = pairs[:, 0], pairs[:, 1]
+
+        # Bonferroni correction for the number of comparisons per template
+        templates, group_index = np.unique(counts.template_id, return_inverse=True)
+        comparisons = np.bincount(group_index[i], minlength=len(templates))
+        alpha = (1 - self.confidence) / np.maximum(comparisons[group_index[i]], 1)
+        variations_per_template = np.bincount(group_index)[group_index]
+        enough = (counts.sent[i] >= self.min_sends) & (counts.sent[j] >= self.min_sends)
+
+        variation_rates = {}
+        tests = {}
+        winners = {}
+        for rate, counter in TESTED_RATES:
+            successes = getattr(counts, counter)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                variation_rates[rate] = np.where(
+                    counts.sent > 0, successes / np.maximum(counts.sent, 1), 0.0
+                )
+            variation_rates[f"{rate}_ci"] = self.wilson_interval(successes, counts.sent)
+
+            test = self.compare(successes, counts.sent, pairs)
+            test["significant"] = enough & (test["p_value"] < alpha)
+            tests[rate] = test
+
+            # A winner is significantly better than every other variation
+            better = np.where(test["difference"] > 0, i, j)[test["significant"]]
+            wins = np.bincount(better, minlength=len(counts.template_id))
+            is_winner = (variations_per_template > 1) & (
+                wins == variations_per_template - 1
+            )
+            winners[rate] = {
+                int(counts.template_id[k]): int(counts.variation[k])
+                for k in np.flatnonzero(is_winner)
+            }
+
+        return self._summaries(counts, pairs, variation_rates, tests, winners)
+
+    def _summaries(
+        self,
+        counts: VariationCounts,
+        pairs: np.ndarray,
+        variation_rates: Dict[str, np.ndarray],
+        tests: Dict[str, Dict[str, np.ndarray]],
+        winners: Dict[str, Dict[int, int]],
+    ) -> Dict[int, Dict[str, Any]]:
+        updated_at = datetime.now(timezone.utc).isoformat()
+        # Convert and round whole arrays once; per-element numpy access is slow
+        template_ids = counts.template_id.tolist()
+        rows = {
+            "variation": counts.variation.tolist(),
+            "sent": counts.sent.tolist(),
+            "opened": counts.opened.tolist(),
+            "replied": counts.replied.tolist(),
+        }
+        for rate, _ in TESTED_RATES:
+            rows[rate] = np.round(100 * variation_rates[rate], 2).tolist()
+            rows[f"{rate}_ci"] = np.round(
+                100 * variation_rates[f"{rate}_ci"], 2
+            ).tolist()
+
+        summaries: Dict[int, Dict[str, Any]] = {}
+        for k, template_id in enumerate(template_ids):
+            summary = summaries.get(template_id)
+            if summary is None:
+                summary = summaries[template_id] = {
+                    "sent": 0,
+                    "opened": 0,
+                    "replied": 0,
+                    "variations": [],
+                    "comparisons": [],
+                    "winner": {
+                        rate: winners[rate].get(template_id) for rate, _ in TESTED_RATES
+                    },
+                    "updated_at": updated_at,
+                }
+            variation = {key: values[k] for key, values in rows.items()}
+            summary["variations"].append(variation)
+            summary["sent"] += variation["sent"]
+            summary["opened"] += variation["opened"]
+            summary["replied"] += variation["replied"]
+
+        pair_template = counts.template_id[pairs[:, 0]].tolist()
+        variation_a = counts.variation[pairs[:, 0]].tolist()
+        variation_b = counts.variation[pairs[:, 1]].tolist()
+        for rate, _ in TESTED_RATES:
+            test = tests[rate]
+            columns = zip(
+                pair_template,
+                variation_a,
+                variation_b,
+                np.round(100 * test["difference"], 2).tolist(),
+                np.round(test["z"], 3).tolist(),
+                test["p_value"].tolist(),
+                test["significant"].tolist(),
+            )
+            for template_id, a, b, difference, z, p_value, significant in columns:
+                summaries[template_id]["comparisons"].append(
+                    {
+                        "metric": rate,
+                        "variation_a": a,
+                        "variation_b": b,
+                        "difference": difference,
+                        "z": z,
+                        "p_value": p_value,
+                        "significant": significant,
+                    }
+                )
+
+        for summary in summaries.values():
+            sent = summary["sent"] or 1
+            summary["open_rate"] = round(100 * summary["opened"] / sent, 2)
+            summary["reply_rate"] = round(100 * summary["replied"] / sent, 2)
+        return summaries
+
+    def summarize(
+        self, db: Session, template_ids: Optional[Iterable[int]] = None
+    ) -> Dict[int, Dict[str, Any]]:
+        """Load counters and compute summaries for the given (or all) templates."""
+        return self.analyze(self.load_counts(db, template_ids))
+
+    def refresh(self, db: Session) -> int:
+        """
+        Recompute and store `performance` for templates whose rollups changed
+        since the last refresh; every template on the first call.
+
+        Returns:
+            Number of templates updated
+        """
+        started = db.execute(select(func.now())).scalar()
+        template_ids = None
+        if self._watermark is not None:
+            # Overlap the previous window so rows committed late are not missed
+            since = self._watermark - timedelta(
+                seconds=settings.AB_TEST_REFRESH_SECONDS
+            )
+            template_ids = db.execute(
+                select(EmailDailyRollup.template_id)
+                .where(
+                    EmailDailyRollup.updated_at > since,
+                    EmailDailyRollup.template_id != 0,
+                )
+                .distinct()
+            ).scalars().all()
+            if not template_ids:
+                self._watermark = started
+                return 0
+
+        summaries = self.summarize(db, template_ids)
+        if summaries:
+            templates = EmailTemplate.__table__
+            db.execute(
+                update(templates)
+                .where(templates.c.id == bindparam("_id"))
+                .values(
+                    performance=bindparam("_performance"),
+                    # Statistics are not an edit; keep the compiled-template
+                    # cache keyed on updated_at valid
+                    updated_at=templates.c.updated_at,
+                ),
+                [
+                    {"_id": template_id, "_performance": summary}
+                    for template_id, summary in summaries.items()
+                ],
+            )
+            db.commit()
+        self._watermark = started
+        return len(summaries)
+
+    @staticmethod
+    def variation_name(variation: int) -> str:
+        if variation == 0:
+            return "Original"
+        return f"Variation {chr(ord('A') + variation - 1)}"
+
+
+ab_test_engine = ABTestEngine()
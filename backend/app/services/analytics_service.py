@@ -0,0 +1,315 @@
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from app.core.config import settings
+from app.models.analytics import EmailDailyRollup
+from app.models.campaign import Campaign
+from app.models.email import Email, EmailStatusEnum
+from app.services.bandit_service import variation_bandit
+from app.services.sketch_service import sketch_service
+from sqlalchemy import Date, case, cast, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+METRICS = ("sent", "contacted", "opened", "clicked", "replied", "bounced")
+
+KEY_COLUMNS = ("day", "campaign_id", "template_id", "segment_id", "variation")
+
+# Reply delay buckets as (name, lower bound in days); each runs to the next bound
+RESPONSE_TIME_BUCKETS = (
+    ("same_day", 0),
+    ("1_day", 1),
+    ("2_3_days", 2),
+    ("4_7_days", 4),
+    ("more_than_7_days", 8),
+)
+
+
+class AnalyticsService:
+    """
+    Campaign analytics served from `email_daily_rollups`.
+
+    The send, tracking, reply and bounce paths call `record` with the
+    emails that just reached a state, in the same transaction as the state
+    change, so each email is added to its (day, campaign, template,
+    segment, variation) row exactly once. Reads aggregate rollup rows only,
+    so their cost depends on the date range and number of campaigns, not
+    on the number of emails. `rebuild` recomputes a date range from
+    `emails` for backfills and repairs.
+    """
+
+    def __init__(self, chunk_size: Optional[int] = None):
+        self.chunk_size = chunk_size or settings.RESPONSE_TIME_CHUNK_SIZE
+        # campaign id -> ((replies counted, latest replied_at), histogram)
+        self._response_times: Dict[
+            int, Tuple[Tuple[int, Optional[datetime]], Dict[str, int]]
+        ] = {}
+        self._lock = threading.Lock()
+
+    def _key_columns(self) -> List[Any]:
+        return [
+            cast(func.timezone("UTC", Email.sent_at), Date).label("day"),
+            func.coalesce(Email.campaign_id, 0).label("campaign_id"),
+            func.coalesce(Email.template_id, Campaign.template_id, 0).label(
+                "template_id"
+            ),
+            func.coalesce(Campaign.segment_id, 0).label("segment_id"),
+            Email.variation.label("variation"),
+        ]
+
+    def _upsert(self, query, metrics: List[str]):
+        rollup = EmailDailyRollup.__table__
+        stmt = insert(rollup).from_select(list(KEY_COLUMNS) + metrics, query)
+        return stmt.on_conflict_do_update(
+            index_elements=list(KEY_COLUMNS),
+            set_={
+                **{
+                    metric: rollup.c[metric] + stmt.excluded[metric]
+                    for metric in metrics
+                },
+                "updated_at": func.now(),
+            },
+        )
+
+    def record(self, db: Session, email_ids: Iterable[int], metric: str) -> None:
+        """
+        Add emails that just reached `metric` to their rollup rows.
+
+        Does not commit; call it inside the transaction that changes the
+        emails' state.
+
+        Args:
+            email_ids: Emails that transitioned, each listed once
+            metric: One of "sent", "opened", "clicked", "replied", "bounced"
+        """
+        if metric not in METRICS or metric == "contacted":
+            raise ValueError(f"Unknown metric: {metric}")
+        email_ids = list(email_ids)
+        if not email_ids:
+            return
+
+        keys = self._key_columns()
+        counts = [func.count().label(metric)]
+        metrics = [metric]
+        if metric == "sent":
+            counts.append(
+                func.count(case((Email.sequence_step == 0, 1))).label("contacted")
+            )
+            metrics.append("contacted")
+        query = (
+            select(*keys, *counts)
+            .select_from(Email)
+            .outerjoin(Campaign, Campaign.id == Email.campaign_id)
+            .where(Email.id.in_(email_ids), Email.sent_at.isnot(None))
+            .group_by(*keys)
+        )
+        db.execute(self._upsert(query, metrics))
+        variation_bandit.observe(db, email_ids, metric)
+        if metric == "sent":
+            sketch_service.record_sends(db, email_ids)
+
+    def rebuild(self, db: Session, start: date, end: date) -> None:
+        """Recompute the rollups for emails sent between `start` and `end` inclusive."""
+        db.execute(
+            delete(EmailDailyRollup).where(
+                EmailDailyRollup.day >= start, EmailDailyRollup.day <= end
+            )
+        )
+        keys = self._key_columns()
+        query = (
+            select(
+                *keys,
+                func.count().label("sent"),
+                func.count(case((Email.sequence_step == 0, 1))).label("contacted"),
+                func.count(Email.opened_at).label("opened"),
+                func.count(Email.clicked_at).label("clicked"),
+                func.count(Email.replied_at).label("replied"),
+                func.count(case((Email.status == EmailStatusEnum.BOUNCED, 1))).label(
+                    "bounced"
+                ),
+            )
+            .select_from(Email)
+            .outerjoin(Campaign, Campaign.id == Email.campaign_id)
+            .where(
+                func.timezone("UTC", Email.sent_at) >= start,
+                func.timezone("UTC", Email.sent_at) < end + timedelta(days=1),
+            )
+            .group_by(*keys)
+        )
+        db.execute(self._upsert(query, list(METRICS)))
+        db.commit()
+
+    def _filters(
+        self,
+        start: Optional[date],
+        end: Optional[date],
+        campaign_id: Optional[int],
+        template_id: Optional[int],
+    ) -> List[Any]:
+        criteria = []
+        if start is not None:
+            criteria.append(EmailDailyRollup.day >= start)
+        if end is not None:
+            criteria.append(EmailDailyRollup.day <= end)
+        if campaign_id is not None:
+            criteria.append(EmailDailyRollup.campaign_id == campaign_id)
+        if template_id is not None:
+            criteria.append(EmailDailyRollup.template_id == template_id)
+        return criteria
+
+    def _sums(self) -> List[Any]:
+        return [
+            func.coalesce(func.sum(getattr(EmailDailyRollup, metric)), 0).label(metric)
+            for metric in METRICS
+        ]
+
+    def totals(
+        self,
+        db: Session,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        campaign_id: Optional[int] = None,
+        template_id: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Summed counters over a date range."""
+        row = db.execute(
+            select(*self._sums()).where(
+                *self._filters(start, end, campaign_id, template_id)
+            )
+        ).one()
+        return {metric: int(row._mapping[metric]) for metric in METRICS}
+
+    def timeline(
+        self,
+        db: Session,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        campaign_id: Optional[int] = None,
+        template_id: Optional[int] = None,
+        interval: str = "day",
+    ) -> List[Dict[str, Any]]:
+        """
+        Counters per day, week or month.
+
+        Returns:
+            List of dictionaries with "date" and one key per metric, oldest first
+        """
+        if interval not in ("day", "week", "month"):
+            raise ValueError(f"Unknown interval: {interval}")
+        bucket = cast(func.date_trunc(interval, EmailDailyRollup.day), Date).label(
+            "bucket"
+        )
+        rows = db.execute(
+            select(bucket, *self._sums())
+            .where(*self._filters(start, end, campaign_id, template_id))
+            .group_by(bucket)
+            .order_by(bucket)
+        ).all()
+        return [
+            {"date": row.bucket.isoformat(), **self._counts(row)} for row in rows
+        ]
+
+    def breakdown(
+        self,
+        db: Session,
+        dimension: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        campaign_id: Optional[int] = None,
+        template_id: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Counters grouped by "campaign_id", "template_id", "segment_id" or
+        "variation". Rows without a campaign, template or segment are left
+        out of the breakdown by that dimension.
+        """
+        if dimension not in KEY_COLUMNS[1:]:
+            raise ValueError(f"Unknown dimension: {dimension}")
+        column = getattr(EmailDailyRollup, dimension)
+        criteria = self._filters(start, end, campaign_id, template_id)
+        if dimension != "variation":
+            criteria.append(column != 0)
+        rows = db.execute(
+            select(column, *self._sums())
+            .where(*criteria)
+            .group_by(column)
+            .order_by(column)
+        ).all()
+        return [{dimension: row[0], **self._counts(row)} for row in rows]
+
+    def response_times(self, db: Session, campaign_id: int) -> Dict[str, int]:
+        """
+        Histogram of reply delays (`replied_at - sent_at`) for a campaign.
+
+        Delays are streamed from a server-side cursor in chunks of
+        `chunk_size` and bucketed with NumPy, so memory does not grow with
+        the campaign. Replies stamped before their send (clock skew between
+        hosts) are left out rather than counted as same-day. The result is
+        cached until the campaign's reply count in the rollups or its latest
+        `replied_at` changes; a repeat reply moves only the latter.
+        """
+        version = (
+            self.totals(db, campaign_id=campaign_id)["replied"],
+            db.scalar(
+                select(func.max(Email.replied_at)).where(
+                    Email.campaign_id == campaign_id
+                )
+            ),
+        )
+        with self._lock:
+            cached = self._response_times.get(campaign_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        edges = np.array(
+            [days * 86400.0 for _, days in RESPONSE_TIME_BUCKETS[1:]], dtype=np.float64
+        )
+        counts = np.zeros(len(RESPONSE_TIME_BUCKETS), dtype=np.int64)
+        result = db.execute(
+            select(func.extract("epoch", Email.replied_at - Email.sent_at))
+            .where(
+                Email.campaign_id == campaign_id,
+                Email.replied_at.isnot(None),
+                Email.sent_at.isnot(None),
+                Email.replied_at >= Email.sent_at,
+            )
+            .execution_options(yield_per=self.chunk_size)
+        )
+        for partition in result.partitions():
+            delays = np.fromiter(
+                (row[0] for row in partition), dtype=np.float64, count=len(partition)
+            )
+            counts += np.bincount(
+                np.searchsorted(edges, delays, side="right"),
+                minlength=len(RESPONSE_TIME_BUCKETS),
+            )
+        histogram = {
+            name: int(count) for (name, _), count in zip(RESPONSE_TIME_BUCKETS, counts)
+        }
+        with self._lock:
+            self._response_times[campaign_id] = (version, histogram)
+        return histogram
+
+    @staticmethod
+    def _counts(row: Any) -> Dict[str, int]:
+        return {metric: int(row._mapping[metric]) for metric in METRICS}
+
+    @staticmethod
+    def rates(counts: Dict[str, int]) -> Dict[str, float]:
+        """Open, click, response and bounce rates as percentages of emails sent."""
+        sent = counts.get("sent") or 0
+
+        def rate(metric: str) -> float:
+            return round(100.0 * counts.get(metric, 0) / sent, 1) if sent else 0.0
+
+        return {
+            "open_rate": rate("opened"),
+            "click_rate": rate("clicked"),
+            "response_rate": rate("replied"),
+            "bounce_rate": rate("bounced"),
+        }
+
+
+analytics_service = AnalyticsService()
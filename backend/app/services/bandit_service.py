@@ -0,0 +1,168 @@
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from app.core.config import settings
+from app.models.bandit import VariationPosterior
+from app.models.email import Email
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+
+class VariationBandit:
+    """
+    Thompson-sampling allocation of template variations.
+
+    Every variation of a template keeps a Beta posterior over its reward
+    rate (replies by default), persisted as trial/success counts in
+    `variation_posteriors` so all sender processes share it. `observe` is
+    fed by the analytics path as emails are sent and rewarded. `choose`
+    draws one sample per variation and recipient for a whole batch in a
+    single NumPy call and picks the argmax per recipient.
+
+    Posteriors are cached per process for `posterior_ttl` seconds; opens
+    and replies arrive minutes to days after a send, so a short delay
+    costs nothing.
+    """
+
+    def __init__(
+        self,
+        reward: Optional[str] = None,
+        prior: Optional[Tuple[float, float]] = None,
+        posterior_ttl: Optional[float] = None,
+        seed: Optional[int] = None,
+    ):
+        self.reward = reward or settings.BANDIT_REWARD
+        if self.reward not in ("opened", "replied"):
+            raise ValueError(f"Unsupported bandit reward: {self.reward}")
+        self.prior_alpha, self.prior_beta = prior or (
+            settings.BANDIT_PRIOR_ALPHA,
+            settings.BANDIT_PRIOR_BETA,
+        )
+        self.posterior_ttl = posterior_ttl or settings.BANDIT_POSTERIOR_TTL
+        self._rng = np.random.default_rng(seed)
+        # template id -> (loaded at, alpha, beta)
+        self._cache: Dict[int, Tuple[float, np.ndarray, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def arms(template: Any) -> List[Any]:
+        """
+        The variations of a template as render-able templates: index 0 is
+        the template itself, index n its n-th entry in `variations`.
+        """
+        arms = [template]
+        for n, variation in enumerate(getattr(template, "variations", None) or [], 1):
+            arms.append(
+                SimpleNamespace(
+                    # Distinct cache key per variation for the personalization engine
+                    id=(template.id, n),
+                    updated_at=getattr(template, "updated_at", None),
+                    subject=variation.get("subject") or template.subject,
+                    body=variation.get("body") or template.body,
+                )
+            )
+        return arms
+
+    def posteriors(
+        self, db: Session, template_id: int, arms: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Beta (alpha, beta) parameters for each of a template's `arms` variations."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(template_id)
+        if (
+            cached is not None
+            and now - cached[0] < self.posterior_ttl
+            and len(cached[1]) == arms
+        ):
+            return cached[1], cached[2]
+
+        trials = np.zeros(arms)
+        successes = np.zeros(arms)
+        rows = db.execute(
+            select(
+                VariationPosterior.variation,
+                VariationPosterior.trials,
+                VariationPosterior.successes,
+            ).where(
+                VariationPosterior.template_id == template_id,
+                VariationPosterior.variation < arms,
+            )
+        ).all()
+        for variation, variation_trials, variation_successes in rows:
+            trials[variation] = variation_trials
+            successes[variation] = variation_successes
+        alpha = self.prior_alpha + successes
+        # Rewards can be recorded for sends that predate tracking of trials
+        beta = self.prior_beta + np.maximum(trials - successes, 0)
+        with self._lock:
+            self._cache[template_id] = (now, alpha, beta)
+        return alpha, beta
+
+    def choose(
+        self, db: Session, template_id: int, arms: int, count: int
+    ) -> np.ndarray:
+        """
+        Pick a variation for each of `count` recipients.
+
+        Returns:
+            Integer array of variation indexes, one per recipient
+        """
+        if arms <= 1 or count == 0:
+            return np.zeros(count, dtype=np.int64)
+        alpha, beta = self.posteriors(db, template_id, arms)
+        with self._lock:
+            samples = self._rng.beta(alpha[:, None], beta[:, None], size=(arms, count))
+        return samples.argmax(axis=0)
+
+    def observe(self, db: Session, email_ids: Iterable[int], metric: str) -> None:
+        """
+        Update posteriors for emails that were just sent (a trial) or reached
+        the reward state (a success). Other metrics are ignored.
+
+        Does not commit; called inside the transaction of the state change.
+        """
+        if metric not in ("sent", self.reward):
+            return
+        email_ids = list(email_ids)
+        if not email_ids:
+            return
+        column = "trials" if metric == "sent" else "successes"
+        query = (
+            select(
+                Email.template_id,
+                Email.variation,
+                func.count().label(column),
+            )
+            .where(
+                Email.id.in_(email_ids),
+                Email.template_id.isnot(None),
+                # Follow-ups reuse the first email's content; count the first touch
+                Email.parent_email_id.is_(None),
+            )
+            .group_by(Email.template_id, Email.variation)
+        )
+        posteriors = VariationPosterior.__table__
+        stmt = insert(posteriors).from_select(
+            ["template_id", "variation", column], query
+        )
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["template_id", "variation"],
+                set_={
+                    column: posteriors.c[column] + stmt.excluded[column],
+                    "updated_at": func.now(),
+                },
+            )
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+variation_bandit = VariationBandit()
@@ -0,0 +1,509 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiosmtplib
+import numpy as np
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.campaign import Campaign, CampaignStatusEnum
+from app.models.email import Email, EmailStatusEnum, EmailTemplate
+from app.models.prospect import Company, Prospect
+from app.services.analytics_service import analytics_service
+from app.services.bandit_service import variation_bandit
+from app.services.message_builder import MessageSkeleton
+from app.services.personalization_service import personalization_engine
+from app.services.rate_limiter import rate_limiter
+from app.services.scheduler_service import send_scheduler
+from app.services.tracking_service import tracking_service
+from sqlalchemy import exists, insert, or_, select, update
+
+logger = logging.getLogger(__name__)
+
+# Sentinel that tells a sender coroutine to shut down
+_STOP = object()
+
+# Counter in the dispatch stats for each status a send ends in
+_OUTCOMES = {
+    EmailStatusEnum.SENT: "sent",
+    EmailStatusEnum.FAILED: "failed",
+    EmailStatusEnum.DRAFT: "requeued",
+}
+
+
+def _is_transient(error: Exception) -> bool:
+    """Whether a send may succeed if retried: network errors and 4xx replies."""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(400 <= refused.code < 500 for refused in error.recipients)
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return 400 <= error.code < 500
+    return isinstance(error, (aiosmtplib.SMTPException, OSError, asyncio.TimeoutError))
+
+
+class CampaignDispatcher:
+    """
+    Bulk sender for campaign emails.
+
+    Campaigns with a template and a segment get an email rendered for every
+    segment prospect that doesn't have one yet, one chunk ahead of sending.
+    Pending `Email` rows are claimed from the database in id-ordered chunks,
+    by moving them to the sending status with `FOR UPDATE SKIP LOCKED`, so
+    concurrent dispatches of a campaign never send the same email. Claimed
+    emails are fed to a fixed number of sender coroutines, each of which
+    owns one persistent SMTP session, so the number of in-flight messages
+    is bounded by `max_in_flight`. Results are written back in batched
+    UPDATEs.
+
+    Each chunk takes its tokens from `rate_limiter`. Throttled emails go
+    back to pending; once a pass is through, the dispatch waits for them
+    and makes another pass if they can go within
+    `DISPATCH_THROTTLE_WAIT_SECONDS`, and otherwise leaves them to a later
+    dispatch.
+
+    Transient failures (network errors and 4xx replies) are retried with
+    backoff; a message that still fails goes back to pending for the next
+    dispatch, and if the server cannot be reached at all the dispatch
+    stops and releases the rest of its claim. Emails a crashed dispatch
+    left claimed become claimable again after `DISPATCH_LEASE_SECONDS`.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        write_batch_size: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        retry_delay: Optional[float] = None,
+    ):
+        self.max_in_flight = max_in_flight or settings.DISPATCH_MAX_IN_FLIGHT
+        self.chunk_size = chunk_size or settings.DISPATCH_CHUNK_SIZE
+        self.write_batch_size = write_batch_size or settings.DISPATCH_WRITE_BATCH_SIZE
+        self.max_attempts = max_attempts or settings.DISPATCH_MAX_ATTEMPTS
+        self.retry_delay = (
+            settings.DISPATCH_RETRY_DELAY if retry_delay is None else retry_delay
+        )
+
+    async def dispatch(self, campaign_id: int) -> Dict[str, Any]:
+        """
+        Send all pending emails of a campaign.
+
+        Args:
+            campaign_id: Campaign to dispatch
+
+        Returns:
+            Dictionary with sent/failed/requeued/throttled counts and
+            throughput
+        """
+        started = time.monotonic()
+
+        # Headers shared by every message of the campaign are encoded once
+        skeleton = MessageSkeleton(
+            settings.EMAILS_FROM_EMAIL, from_name=settings.EMAILS_FROM_NAME
+        )
+        tracking = await asyncio.to_thread(self._tracking_options, campaign_id)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.chunk_size)
+        results: List[Dict[str, Any]] = []
+        stats = dict.fromkeys(_OUTCOMES.values(), 0)
+        # Emails the rate limits held back in the current pass, and the
+        # seconds until the first of them may go
+        throttled: List[float] = []
+        # Set by a sender that cannot reach the SMTP server
+        unreachable = asyncio.Event()
+
+        senders = [
+            asyncio.create_task(self._sender(queue, results, stats, unreachable))
+            for _ in range(self.max_in_flight)
+        ]
+        try:
+            last_id = 0
+            last_prospect_id = 0
+            created = 0
+            while not unreachable.is_set():
+                if not await asyncio.to_thread(self._is_active, campaign_id):
+                    logger.info(f"Campaign {campaign_id} is no longer active, stopping")
+                    break
+                # Render emails one chunk ahead of sending, so variation
+                # choices use posteriors updated by earlier sends
+                materialized, last_prospect_id = await asyncio.to_thread(
+                    self._materialize, campaign_id, last_prospect_id, self.chunk_size
+                )
+                created += materialized
+                chunk, deferred, last_claimed = await asyncio.to_thread(
+                    self._load_chunk, campaign_id, last_id, skeleton, tracking
+                )
+                throttled += deferred
+                if last_claimed is None:
+                    wait = min(throttled, default=None)
+                    if wait is None or wait > settings.DISPATCH_THROTTLE_WAIT_SECONDS:
+                        break
+                    # Another pass over what the rate limits held back
+                    await asyncio.sleep(wait)
+                    last_id = 0
+                    throttled = []
+                    continue
+                last_id = last_claimed
+                for item in chunk:
+                    await queue.put(item)
+                    if len(results) >= self.write_batch_size:
+                        await self._flush(results)
+        finally:
+            for _ in senders:
+                await queue.put(_STOP)
+            await asyncio.gather(*senders, return_exceptions=True)
+            await self._flush(results)
+
+        if created:
+            logger.info(f"Campaign {campaign_id}: rendered {created} emails")
+        if unreachable.is_set():
+            logger.warning(f"Campaign {campaign_id}: SMTP server unreachable, stopped")
+        elapsed = time.monotonic() - started
+        total = stats["sent"] + stats["failed"]
+        logger.info(
+            f"Campaign {campaign_id} dispatched: {stats['sent']} sent, "
+            f"{stats['failed']} failed, {stats['requeued']} requeued, "
+            f"{len(throttled)} held back by rate limits in {elapsed:.1f}s"
+        )
+        return {
+            "campaign_id": campaign_id,
+            **stats,
+            "throttled": len(throttled),
+            "elapsed_seconds": elapsed,
+            "messages_per_minute": total / elapsed * 60 if elapsed else 0.0,
+        }
+
+    async def _sender(
+        self,
+        queue: asyncio.Queue,
+        results: List[Dict[str, Any]],
+        stats: Dict[str, int],
+        unreachable: asyncio.Event,
+    ) -> None:
+        """Send queued messages over a single persistent SMTP session."""
+        smtp: Optional[aiosmtplib.SMTP] = None
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STOP:
+                    break
+                status, smtp = await self._send(smtp, item, unreachable)
+                result = {"id": item["id"], "status": status}
+                if status == EmailStatusEnum.SENT:
+                    result["sent_at"] = datetime.now(timezone.utc)
+                results.append(result)
+                stats[_OUTCOMES[status]] += 1
+        finally:
+            if smtp is not None:
+                await self._reset(smtp)
+
+    async def _send(
+        self,
+        smtp: Optional[aiosmtplib.SMTP],
+        item: Dict[str, Any],
+        unreachable: asyncio.Event,
+    ) -> Tuple[EmailStatusEnum, Optional[aiosmtplib.SMTP]]:
+        """
+        Send one message, retrying transient failures with backoff.
+
+        Returns:
+            Tuple of (status to record for the email, session to reuse)
+        """
+        error: Optional[Exception] = None
+        for attempt in range(self.max_attempts):
+            if attempt:
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+            if unreachable.is_set():
+                break
+            if smtp is None or not smtp.is_connected:
+                try:
+                    smtp = await self._connect()
+                except Exception as e:
+                    error, smtp = e, None
+                    continue
+            try:
+                await smtp.sendmail(
+                    item["from_email"], item["recipients"], item["message"]
+                )
+                return EmailStatusEnum.SENT, smtp
+            except Exception as e:
+                error = e
+                if not isinstance(
+                    e,
+                    (
+                        aiosmtplib.SMTPResponseException,
+                        aiosmtplib.SMTPRecipientsRefused,
+                    ),
+                ):
+                    # Only server replies leave the session in a known state
+                    smtp = await self._reset(smtp)
+                if not _is_transient(e):
+                    logger.warning(f"Failed to send email {item['id']}: {e}")
+                    return EmailStatusEnum.FAILED, smtp
+
+        if error is not None:
+            logger.warning(f"Requeueing email {item['id']}: {error}")
+        if smtp is None:
+            # Every attempt failed to connect; stop claiming more emails
+            unreachable.set()
+        return EmailStatusEnum.DRAFT, smtp
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            start_tls=False,
+            timeout=settings.SMTP_POOL_TIMEOUT,
+        )
+        await smtp.connect()
+        try:
+            if settings.SMTP_TLS:
+                await smtp.starttls()
+            if settings.SMTP_USER and settings.SMTP_PASSWORD:
+                await smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        except Exception:
+            smtp.close()
+            raise
+        return smtp
+
+    async def _reset(self, smtp: Optional[aiosmtplib.SMTP]) -> None:
+        """Drop an SMTP session, ignoring errors from a server that already hung up."""
+        if smtp is None:
+            return None
+        try:
+            await smtp.quit()
+        except Exception:
+            smtp.close()
+        return None
+
+    async def _flush(self, results: List[Dict[str, Any]]) -> None:
+        if not results:
+            return
+        batch = results[:]
+        del results[:]
+        await asyncio.to_thread(self._write_results, batch)
+
+    def _is_active(self, campaign_id: int) -> bool:
+        db = SessionLocal()
+        try:
+            status = db.execute(
+                select(Campaign.status).where(Campaign.id == campaign_id)
+            ).scalar()
+            return status == CampaignStatusEnum.ACTIVE
+        finally:
+            db.close()
+
+    def _materialize(
+        self, campaign_id: int, after_prospect_id: int = 0, limit: Optional[int] = None
+    ) -> Tuple[int, int]:
+        """
+        Create emails for segment prospects that don't have one in this
+        campaign yet, rendering the campaign template in batches. Each
+        recipient gets the template variation picked by `variation_bandit`.
+
+        Args:
+            campaign_id: Campaign to create emails for
+            after_prospect_id: Resume after this prospect id
+            limit: Stop after roughly this many emails; all when None
+
+        Returns:
+            Tuple of (emails created, last prospect id looked at)
+        """
+        db = SessionLocal()
+        try:
+            campaign = db.get(Campaign, campaign_id)
+            if not campaign or not campaign.template_id or not campaign.segment_id:
+                return 0, after_prospect_id
+            template = db.get(EmailTemplate, campaign.template_id)
+            if not template:
+                return 0, after_prospect_id
+            arms = variation_bandit.arms(template)
+
+            created = 0
+            last_id = after_prospect_id
+            while limit is None or created < limit:
+                rows = db.execute(
+                    select(Prospect, Company)
+                    .outerjoin(Company, Company.id == Prospect.company_id)
+                    .where(
+                        Prospect.segment_id == campaign.segment_id,
+                        Prospect.id > last_id,
+                        ~exists().where(
+                            Email.prospect_id == Prospect.id,
+                            Email.campaign_id == campaign_id,
+                        ),
+                    )
+                    .order_by(Prospect.id)
+                    .limit(self.chunk_size)
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1][0].id
+
+                contexts = [
+                    personalization_engine.build_context(prospect, company)
+                    for prospect, company in rows
+                ]
+                choices = variation_bandit.choose(db, template.id, len(arms), len(rows))
+                emails = [None] * len(rows)
+                for variation in np.unique(choices).tolist():
+                    indexes = np.flatnonzero(choices == variation).tolist()
+                    rendered = personalization_engine.render_batch(
+                        arms[variation], [contexts[i] for i in indexes]
+                    )
+                    for i, (subject, body) in zip(indexes, rendered):
+                        emails[i] = {
+                            "prospect_id": rows[i][0].id,
+                            "campaign_id": campaign_id,
+                            "template_id": template.id,
+                            "variation": variation,
+                            "subject": subject,
+                            "body": body,
+                            "status": EmailStatusEnum.DRAFT,
+                        }
+                db.execute(insert(Email), emails)
+                db.commit()
+                db.expunge_all()
+                created += len(rows)
+            return created, last_id
+        finally:
+            db.close()
+
+    def _tracking_options(self, campaign_id: int) -> Dict[str, bool]:
+        db = SessionLocal()
+        try:
+            campaign_settings = db.execute(
+                select(Campaign.settings).where(Campaign.id == campaign_id)
+            ).scalar()
+        finally:
+            db.close()
+        campaign_settings = campaign_settings or {}
+        return {
+            "track_opens": campaign_settings.get("track_opens", True),
+            "track_clicks": campaign_settings.get("track_clicks", True),
+        }
+
+    def _load_chunk(
+        self,
+        campaign_id: int,
+        after_id: int,
+        skeleton: MessageSkeleton,
+        tracking: Dict[str, bool],
+    ) -> Tuple[List[Dict[str, Any]], List[float], Optional[int]]:
+        """
+        Claim the next chunk of pending emails, keyed on email id, take
+        their rate limit tokens and render the ones allowed to go.
+
+        The chunk is moved to the sending status before it is read, with
+        `SKIP LOCKED` so a concurrent dispatch claims the following rows
+        instead of waiting for these. Throttled emails go back to pending.
+
+        Returns:
+            Tuple of (rendered emails, seconds until each throttled email
+            may go, last id claimed or None if there was nothing to claim)
+        """
+        now = datetime.now(timezone.utc)
+        stale = now - timedelta(seconds=settings.DISPATCH_LEASE_SECONDS)
+        db = SessionLocal()
+        try:
+            ready = (
+                select(Email.id)
+                .where(
+                    Email.campaign_id == campaign_id,
+                    Email.id > after_id,
+                    # Scheduled emails, follow-ups included, are released
+                    # to the outbox by the scheduler, never sent from here
+                    or_(
+                        Email.status == EmailStatusEnum.DRAFT,
+                        # Claimed by a dispatch that died before finishing
+                        (Email.status == EmailStatusEnum.SENDING)
+                        & (Email.updated_at < stale),
+                    ),
+                )
+                .order_by(Email.id)
+                .limit(self.chunk_size)
+                .with_for_update(skip_locked=True)
+            )
+            claimed = db.execute(
+                update(Email)
+                .where(Email.id.in_(ready.scalar_subquery()))
+                .values(status=EmailStatusEnum.SENDING)
+                .returning(Email.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            db.commit()
+            if not claimed:
+                return [], [], None
+            rows = db.execute(
+                select(
+                    Email.id,
+                    Email.subject,
+                    Email.body,
+                    Prospect.email,
+                    Prospect.first_name,
+                    Prospect.last_name,
+                )
+                .join(Prospect, Prospect.id == Email.prospect_id)
+                .where(Email.id.in_(claimed))
+                .order_by(Email.id)
+            ).all()
+
+            allowed, deferred = rate_limiter.acquire(
+                db,
+                [
+                    {
+                        "id": row.id,
+                        "campaign_id": campaign_id,
+                        "from_email": skeleton.from_email,
+                        "to_email": row.email,
+                    }
+                    for row in rows
+                ],
+            )
+            if deferred:
+                db.execute(
+                    update(Email)
+                    .where(Email.id.in_([item["id"] for item, _ in deferred]))
+                    .values(status=EmailStatusEnum.DRAFT)
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+        finally:
+            db.close()
+
+        allowed_ids = {item["id"] for item in allowed}
+        rows = [row for row in rows if row.id in allowed_ids]
+
+        chunk = []
+        for row in rows:
+            chunk.append(
+                {
+                    "id": row.id,
+                    "from_email": skeleton.from_email,
+                    "recipients": [row.email],
+                    "message": skeleton.build(
+                        to_email=row.email,
+                        to_name=f"{row.first_name} {row.last_name}",
+                        subject=row.subject,
+                        body=tracking_service.instrument_html(
+                            row.body, row.id, **tracking
+                        ),
+                    ),
+                }
+            )
+        return chunk, [retry_after for _, retry_after in deferred], max(claimed)
+
+    def _write_results(self, results: List[Dict[str, Any]]) -> None:
+        """Write back send results as a single executemany UPDATE keyed by id."""
+        db = SessionLocal()
+        try:
+            sent_ids = [r["id"] for r in results if r["status"] == EmailStatusEnum.SENT]
+            db.execute(update(Email), results)
+            analytics_service.record(db, sent_ids, "sent")
+            db.commit()
+            send_scheduler.create_follow_ups(db, sent_ids)
+        finally:
+            db.close()
+
+
+campaign_dispatcher = CampaignDispatcher()
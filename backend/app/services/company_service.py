@@ -0,0 +1,247 @@
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+from app.models.prospect import Company
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+# Legal-form words dropped from the end of company names before matching
+LEGAL_SUFFIXES = (
+    "inc",
+    "incorporated",
+    "llc",
+    "llp",
+    "ltd",
+    "limited",
+    "corp",
+    "corporation",
+    "co",
+    "company",
+    "plc",
+    "gmbh",
+    "ag",
+    "sa",
+    "sas",
+    "srl",
+    "bv",
+    "nv",
+    "oy",
+    "ab",
+    "pty",
+)
+LEGAL_SUFFIX_PATTERN = r"(?:\s(?:%s))+$" % "|".join(LEGAL_SUFFIXES)
+
+
+def normalize_domain(websites: pd.Series) -> pd.Series:
+    """
+    Bare lower-case host of each website: scheme, "www.", port, path and
+    query removed. Missing or empty websites give None.
+    """
+    domains = (
+        websites.astype(object)
+        .where(websites.notna(), "")
+        .astype(str)
+        .str.strip()
+        .str.lower()
+        .str.replace(r"^[a-z][a-z0-9+.-]*://", "", regex=True)
+        .str.replace(r"^[^/@]*@", "", regex=True)
+        .str.replace(r"[/?#:].*$", "", regex=True)
+        .str.replace(r"^www\d*\.", "", regex=True)
+        .str.strip(".")
+    )
+    return domains.astype(object).where(domains != "", None)
+
+
+def normalize_name(names: pd.Series) -> pd.Series:
+    """
+    Matching key for company names: lower case, "&" as "and", punctuation
+    as spaces, trailing legal forms ("Inc.", "GmbH", ...) removed.
+    """
+    keys = (
+        names.astype(object)
+        .where(names.notna(), "")
+        .astype(str)
+        .str.lower()
+        .str.replace("&", " and ", regex=False)
+        .str.replace(r"[^\w]+", " ", regex=True)
+        .str.strip()
+        .str.replace(LEGAL_SUFFIX_PATTERN, "", regex=True)
+        .str.strip()
+    )
+    return keys.astype(object).where(keys != "", None)
+
+
+class CompanyIndex:
+    """In-memory company ids by normalized domain and by normalized name."""
+
+    def __init__(self):
+        self.by_domain: Dict[str, int] = {}
+        self.by_name: Dict[str, int] = {}
+
+    def add(
+        self,
+        ids: Iterable[int],
+        domains: Iterable[Optional[str]],
+        names: Iterable[Optional[str]],
+    ) -> None:
+        # setdefault keeps the first (oldest) company for a key
+        for company_id, domain, name in zip(ids, domains, names):
+            if domain is not None:
+                self.by_domain.setdefault(domain, company_id)
+            if name is not None:
+                self.by_name.setdefault(name, company_id)
+
+
+class CompanyResolver:
+    """
+    Resolve company rows from imports to `companies` ids without duplicates.
+
+    A company is identified by its normalized website domain, which is
+    unique in the table; companies without a website are matched by
+    normalized name. `load` reads every company once into a `CompanyIndex`
+    for the duration of an import, so `resolve` only touches the database
+    to create the companies of a batch that are not known yet, with a
+    single multi-row upsert on the domain.
+    """
+
+    def load(
+        self, db: Session, companies: Optional[pd.DataFrame] = None
+    ) -> CompanyIndex:
+        """
+        Build the lookup index of all existing companies in one query, or
+        only of those that can match `companies` when given.
+        """
+        query = select(
+            Company.id,
+            Company.name,
+            Company.website,
+            Company.normalized_name,
+            Company.normalized_domain,
+        ).order_by(Company.id)
+        if companies is not None:
+            domains, names = self._keys(companies)
+            query = query.where(
+                or_(
+                    Company.normalized_domain.in_(domains.dropna().tolist()),
+                    Company.normalized_name.in_(names.dropna().tolist()),
+                )
+            )
+        rows = db.execute(query).all()
+        index = CompanyIndex()
+        if not rows:
+            return index
+        frame = pd.DataFrame(
+            rows,
+            columns=["id", "name", "website", "normalized_name", "normalized_domain"],
+        )
+        # Rows created outside the resolver may not carry the keys yet
+        domains = frame["normalized_domain"].fillna(normalize_domain(frame["website"]))
+        names = frame["normalized_name"].fillna(normalize_name(frame["name"]))
+        index.add(
+            frame["id"].tolist(),
+            domains.astype(object).where(domains.notna(), None).tolist(),
+            names.astype(object).where(names.notna(), None).tolist(),
+        )
+        return index
+
+    def resolve(
+        self, db: Session, index: CompanyIndex, companies: pd.DataFrame
+    ) -> pd.Series:
+        """
+        Company ids for a batch of company rows, creating missing companies.
+
+        Does not commit. Known companies are not modified; a company that
+        another import created concurrently only gets its empty fields
+        filled in from the batch.
+
+        Args:
+            index: Index from `load`; updated with the created companies
+            companies: Rows with a "name" and optionally "website",
+                "industry" and "size" column
+
+        Returns:
+            Nullable integer ids aligned with `companies`; rows without a
+            name get no company
+        """
+        domains, names = self._keys(companies)
+        ids = self._lookup(index, domains, names)
+
+        missing = ids.isna() & names.notna()
+        if missing.any():
+            new = companies[missing].assign(
+                normalized_domain=domains[missing], normalized_name=names[missing]
+            )
+            # One row per company: by domain when known, otherwise by name
+            key = new["normalized_domain"].fillna("\0" + new["normalized_name"])
+            new = new[~key.duplicated(keep="first")]
+            # A name without a website joins a company created with one
+            has_domain = new["normalized_domain"].notna()
+            named = new.loc[has_domain, "normalized_name"]
+            new = new[has_domain | ~new["normalized_name"].isin(named)]
+            columns = [
+                column
+                for column in ("name", "website", "industry", "size")
+                if column in new
+            ]
+            new = new[columns + ["normalized_domain", "normalized_name"]].assign(
+                name=new["name"].str.strip()
+            )
+            records = new.astype(object).where(new.notna(), None).to_dict("records")
+
+            table = Company.__table__
+            stmt = insert(Company).values(records)
+            filled = [
+                and_(table.c[column].is_(None), stmt.excluded[column].isnot(None))
+                for column in columns
+                if column != "name"
+            ]
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["normalized_domain"],
+                # Created concurrently by another import: fill gaps, keep the rest
+                set_={
+                    **{
+                        column: func.coalesce(table.c[column], stmt.excluded[column])
+                        for column in columns
+                        if column != "name"
+                    },
+                    # onupdate does not apply here; change tracking needs it
+                    "updated_at": case(
+                        (or_(*filled), func.now()), else_=table.c.updated_at
+                    )
+                    if filled
+                    else table.c.updated_at,
+                },
+            ).returning(Company.id, Company.normalized_domain, Company.normalized_name)
+            created = db.execute(stmt).all()
+            index.add(*zip(*created))
+            ids = self._lookup(index, domains, names)
+        return ids
+
+    def resolve_one(self, db: Session, company: Dict[str, Any]) -> Optional[int]:
+        """Resolve a single company, such as one embedded in a new prospect."""
+        companies = pd.DataFrame([company])
+        index = self.load(db, companies)
+        company_id = self.resolve(db, index, companies).iloc[0]
+        return None if pd.isna(company_id) else int(company_id)
+
+    @staticmethod
+    def _keys(companies: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
+        domains = (
+            normalize_domain(companies["website"])
+            if "website" in companies
+            else pd.Series(None, index=companies.index, dtype=object)
+        )
+        return domains, normalize_name(companies["name"])
+
+    @staticmethod
+    def _lookup(
+        index: CompanyIndex, domains: pd.Series, names: pd.Series
+    ) -> pd.Series:
+        by_domain = domains.map(index.by_domain)
+        by_name = names.map(index.by_name)
+        # A known domain is authoritative; the name only decides without one
+        return by_domain.where(domains.notna(), by_name).astype("Int64")
+
+
+company_resolver = CompanyResolver()
@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.analytics import EmailDailyRollup
+from app.models.campaign import Campaign, CampaignStatusEnum
+from app.services.analytics_service import analytics_service
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+def _change(current: float, previous: float) -> float:
+    """Percentage change from `previous` to `current`."""
+    if not previous:
+        return 0.0
+    return round(100.0 * (current - previous) / previous, 2)
+
+
+class DashboardStatsCache:
+    """
+    Shared dashboard stats for every connected client.
+
+    `get` recomputes the stats at most once per `interval`: concurrent
+    callers during a recompute wait for it instead of querying themselves.
+    Each result carries an ETag so polling clients can revalidate with
+    `If-None-Match`. Streaming clients `subscribe` instead; while anyone is
+    subscribed a single refresher task recomputes every interval and fans
+    changed results out to all subscriber queues.
+    """
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval or settings.DASHBOARD_STATS_INTERVAL
+        self._stats: Optional[Dict[str, Any]] = None
+        self._etag: Optional[str] = None
+        self._computed_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._refresher: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.computations = 0
+
+    def _fresh(self) -> bool:
+        return (
+            self._stats is not None
+            and time.monotonic() - self._computed_at < self.interval
+        )
+
+    async def get(self) -> Tuple[Dict[str, Any], str]:
+        """
+        Return the current stats and their ETag, recomputing them if they
+        are older than `interval`.
+        """
+        if self._fresh():
+            return self._stats, self._etag
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another caller may have refreshed while we were waiting
+            if self._fresh():
+                return self._stats, self._etag
+            stats = await asyncio.to_thread(self._compute)
+            payload = json.dumps(stats, sort_keys=True, default=str)
+            etag = f'"{hashlib.sha1(payload.encode()).hexdigest()}"'
+            changed = etag != self._etag
+            self._stats, self._etag = stats, etag
+            self._computed_at = time.monotonic()
+            self.computations += 1
+        if changed:
+            self._publish(self._stats, self._etag)
+        return self._stats, self._etag
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Register a subscriber. The returned queue receives (stats, etag)
+        whenever the stats change; it holds only the latest result, so a
+        slow subscriber skips intermediate updates instead of piling them up.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def _publish(self, stats: Dict[str, Any], etag: str) -> None:
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait((stats, etag))
+
+    async def _refresh(self) -> None:
+        while self._subscribers:
+            try:
+                await self.get()
+            except Exception:
+                logger.exception("Failed to refresh dashboard stats")
+            await asyncio.sleep(self.interval)
+
+    def _compute(self) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            return self.compute(db)
+        finally:
+            db.close()
+
+    def compute(self, db: Session, today: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Compute the dashboard stats from the daily rollups, comparing the
+        last `DASHBOARD_STATS_WINDOW_DAYS` days with the window before.
+        """
+        today = today or date.today()
+        window = timedelta(days=settings.DASHBOARD_STATS_WINDOW_DAYS)
+        start = today - window + timedelta(days=1)
+        previous_start = start - window
+        previous_end = start - timedelta(days=1)
+
+        current = analytics_service.totals(db, start, today)
+        previous = analytics_service.totals(db, previous_start, previous_end)
+        open_rate = analytics_service.rates(current)["open_rate"]
+        previous_open_rate = analytics_service.rates(previous)["open_rate"]
+
+        active_campaigns = db.execute(
+            select(func.count())
+            .select_from(Campaign)
+            .where(Campaign.status == CampaignStatusEnum.ACTIVE)
+        ).scalar()
+        sending = {
+            period: db.execute(
+                select(func.count(func.distinct(EmailDailyRollup.campaign_id))).where(
+                    EmailDailyRollup.campaign_id != 0,
+                    EmailDailyRollup.sent > 0,
+                    EmailDailyRollup.day >= period_start,
+                    EmailDailyRollup.day <= period_end,
+                )
+            ).scalar()
+            for period, period_start, period_end in (
+                ("current", start, today),
+                ("previous", previous_start, previous_end),
+            )
+        }
+
+        return {
+            "activeCampaigns": active_campaigns,
+            "activeCampaignChange": _change(sending["current"], sending["previous"]),
+            "emailsSent": current["sent"],
+            "emailsSentChange": _change(current["sent"], previous["sent"]),
+            "openRate": open_rate,
+            "openRateChange": _change(open_rate, previous_open_rate),
+            "repliesReceived": current["replied"],
+            "repliesReceivedChange": _change(current["replied"], previous["replied"]),
+        }
+
+
+dashboard_stats = DashboardStatsCache()
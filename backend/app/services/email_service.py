@@ -1,14 +1,70 @@
-import smtplib
+import threading
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from app.core.config import settings
+from app.services.smtp_pool import SMTPConnectionPool
 
 
 class EmailService:
     """Service for sending emails."""
 
+    def __init__(self):
+        self._pool: Optional[SMTPConnectionPool] = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def pool(self) -> SMTPConnectionPool:
+        """SMTP connection pool shared by all sends, created on first use."""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = SMTPConnectionPool()
+        return self._pool
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Return SMTP connection pool metrics."""
+        if self._pool is None:
+            return {}
+        return self._pool.stats()
+
+    def close(self) -> None:
+        """Close all pooled SMTP connections."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def build_message(
+        self,
+        to_email: str,
+        to_name: str,
+        subject: str,
+        body: str,
+        from_email: str,
+        from_name: Optional[str] = None,
+        cc: Optional[List[str]] = None,
+        reply_to: Optional[str] = None,
+        html: bool = True,
+    ) -> MIMEMultipart:
+        """Build the MIME message for a single recipient."""
+        msg = MIMEMultipart()
+        msg["From"] = f"{from_name} <{from_email}>" if from_name else from_email
+        msg["To"] = f"{to_name} <{to_email}>" if to_name else to_email
+        msg["Subject"] = subject
+
+        if cc:
+            msg["Cc"] = ", ".join(cc)
+        if reply_to:
+            msg["Reply-To"] = reply_to
+
+        # Add body
+        if html:
+            msg.attach(MIMEText(body, "html"))
+        else:
+            msg.attach(MIMEText(body, "plain"))
+        return msg
+
     def send_email(
         self,
         to_email: str,
@@ -47,60 +103,31 @@ class EmailService:
         if not from_email or not to_email:
             raise ValueError("Sender and recipient email addresses are required")
 
-        # Create message
-        msg = MIMEMultipart()
-        msg["From"] = f"{from_name} <{from_email}>" if from_name else from_email
-        msg["To"] = f"{to_name} <{to_email}>" if to_name else to_email
-        msg["Subject"] = subject
-
+        msg = self.build_message(
+            to_email=to_email,
+            to_name=to_name,
+            subject=subject,
+            body=body,
+            from_email=from_email,
+            from_name=from_name,
+            cc=cc,
+            reply_to=reply_to,
+            html=html,
+        )
+
+        # Send email
+        recipients = [to_email]
         if cc:
-            msg["Cc"] = ", ".join(cc)
-        if reply_to:
-            msg["Reply-To"] = reply_to
-
-        # Add body
-        if html:
-            msg.attach(MIMEText(body, "html"))
-        else:
-            msg.attach(MIMEText(body, "plain"))
+            recipients.extend(cc)
+        if bcc:
+            recipients.extend(bcc)
 
         try:
-            # Connect to SMTP server
-            server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT)
-            if settings.SMTP_TLS:
-                server.starttls()
-
-            # Login if credentials are provided
-            if settings.SMTP_USER and settings.SMTP_PASSWORD:
-                server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-
-            # Send email
-            recipients = [to_email]
-            if cc:
-                recipients.extend(cc)
-            if bcc:
-                recipients.extend(bcc)
-
-            server.sendmail(from_email, recipients, msg.as_string())
-            server.quit()
-
+            self.pool.sendmail(from_email, recipients, msg.as_string())
             return True
         except Exception as e:
             print(f"Error sending email: {str(e)}")
             return False
 
-    def send_campaign_email(
-        self, campaign_id: int, prospect_id: int, email_id: int
-    ) -> bool:
-        """
-        Send an email as part of a campaign.
-
-        In a real implementation, this would handle tracking, personalization, etc.
-        """
-        # This is a placeholder implementation
-        # In a real system, this would fetch the email and prospect from the database,
-        # personalize the content, add tracking pixels and links, etc.
-        return True
-
 
 email_service = EmailService()
@@ -0,0 +1,339 @@
+import fcntl
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from app.core.config import settings
+from app.models.prospect import Company, Prospect
+from app.services.prospect_features import (
+    FEATURE_COLUMNS,
+    ProspectFeatureEncoder,
+    prospect_feature_encoder,
+)
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+ARRAYS = ("ids", "data", "indices", "indptr")
+# Lock files: refreshes hold the first exclusively. Readers share the
+# second while they open a generation, and a refresh takes it exclusively
+# to remove the generations it superseded
+REFRESH_LOCK = "refresh.lock"
+GENERATIONS_LOCK = "generations.lock"
+
+
+def feature_query():
+    """Prospect id and the raw attributes the feature encoder reads."""
+    return (
+        select(
+            Prospect.id,
+            Company.size,
+            Company.industry,
+            Prospect.job_title,
+            Prospect.seniority,
+            Prospect.location,
+        )
+        .select_from(Prospect)
+        .outerjoin(Company, Company.id == Prospect.company_id)
+    )
+
+
+def _contains(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Which of `ids` are in the sorted array `sorted_ids`."""
+    if not len(sorted_ids):
+        return np.zeros(len(ids), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return sorted_ids[positions] == ids
+
+
+class StoredFeatures(NamedTuple):
+    """
+    Encoded features of every prospect: row i of `matrix` belongs to
+    prospect `ids[i]`, and ids are sorted. Arrays are memory-mapped.
+    """
+
+    ids: np.ndarray
+    matrix: sp.csr_matrix
+    feature_names: List[str]
+
+    def rows(self, prospect_ids: Iterable[int]) -> Tuple[np.ndarray, sp.csr_matrix]:
+        """
+        Look up prospects by id.
+
+        Returns:
+            The ids found, in the order given, and their feature rows
+        """
+        wanted = np.asarray(list(prospect_ids), dtype=np.int64)
+        found = _contains(self.ids, wanted)
+        wanted = wanted[found]
+        return wanted, self.matrix[np.searchsorted(self.ids, wanted)]
+
+
+class ProspectFeatureStore:
+    """
+    Encoded prospect features kept on disk between segmentation runs.
+
+    The matrix is stored as the arrays of a CSR matrix plus the sorted
+    prospect ids that index its rows, as `.npy` files that readers
+    memory-map. `refresh` re-encodes only prospects created or changed
+    since the previous refresh, or whose company changed, judged by
+    `updated_at` (or `created_at` if never updated), and drops deleted
+    ones; it then writes a new generation of the files and switches the
+    CURRENT pointer atomically, so readers never see a partial update.
+    The store is rebuilt from scratch when the encoder changes.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        encoder: Optional[ProspectFeatureEncoder] = None,
+        chunk_size: Optional[int] = None,
+    ):
+        self.path = Path(path or settings.FEATURE_STORE_DIR)
+        self.encoder = encoder or prospect_feature_encoder
+        self.chunk_size = chunk_size or settings.SEGMENTATION_CHUNK_SIZE
+        self._loaded: Optional[Tuple[int, StoredFeatures]] = None
+
+    def features(self, db: Session) -> StoredFeatures:
+        """Refresh the store and return its features."""
+        self.refresh(db)
+        return self.load()
+
+    def data_version(self, db: Session) -> str:
+        """
+        Token that changes whenever prospects or companies are created,
+        changed or deleted, or the encoding changes; cheap to compute,
+        unlike a refresh.
+        """
+        prospects = db.execute(
+            select(
+                func.count(Prospect.id),
+                func.max(Prospect.id),
+                func.max(func.coalesce(Prospect.updated_at, Prospect.created_at)),
+            )
+        ).one()
+        companies = db.scalar(
+            select(func.max(func.coalesce(Company.updated_at, Company.created_at)))
+        )
+        return json.dumps(
+            [self._encoder_key(), *map(str, prospects), str(companies)],
+            sort_keys=True,
+        )
+
+    def load(self) -> StoredFeatures:
+        """
+        Features as of the last refresh, without touching the database.
+
+        Raises:
+            LookupError: If the store has never been built
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        # Open maps keep their files readable, so the generation CURRENT
+        # names only has to outlive the opening, not the use
+        with self._lock(GENERATIONS_LOCK, fcntl.LOCK_SH):
+            meta = self._read_meta()
+            if meta is None:
+                raise LookupError("The feature store has not been built")
+            if self._loaded is not None and self._loaded[0] == meta["generation"]:
+                return self._loaded[1]
+            generation = self.path / self._generation_dir(meta["generation"])
+            arrays = {
+                name: np.load(generation / f"{name}.npy", mmap_mode="r")
+                for name in ARRAYS
+            }
+        matrix = sp.csr_matrix(
+            (arrays["data"], arrays["indices"], arrays["indptr"]),
+            shape=(len(arrays["ids"]), meta["n_features"]),
+            copy=False,
+        )
+        features = StoredFeatures(arrays["ids"], matrix, meta["feature_names"])
+        self._loaded = (meta["generation"], features)
+        return features
+
+    def refresh(self, db: Session) -> Dict[str, Any]:
+        """
+        Bring the store up to date with the prospects table.
+
+        Returns:
+            Counts of re-encoded and removed rows, and seconds taken
+        """
+        started = time.perf_counter()
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._lock():
+            meta = self._read_meta()
+            # Numbering carries on across rebuilds, so a generation directory
+            # is never rewritten while readers may have it open or cached
+            generation = meta["generation"] + 1 if meta is not None else 1
+            if meta is not None and meta["encoder"] != self._encoder_key():
+                meta = None
+            synced_at = db.scalar(select(func.now()))
+            # Core rows: the ORM result machinery triples the cost of this scan
+            all_ids = np.fromiter(
+                db.connection()
+                .execute(select(Prospect.id).order_by(Prospect.id))
+                .scalars(),
+                dtype=np.int64,
+            )
+
+            if meta is None:
+                old = None
+                old_ids = np.empty(0, dtype=np.int64)
+                feature_names = self.encoder.feature_names(pd.DataFrame())
+                query = feature_query()
+            else:
+                old = self.load()
+                old_ids = np.asarray(old.ids)
+                feature_names = list(old.feature_names)
+                # Overlap covers transactions that committed after the last
+                # refresh with earlier timestamps; re-encoding is idempotent
+                since = datetime.fromisoformat(meta["synced_at"]) - timedelta(
+                    seconds=settings.FEATURE_STORE_OVERLAP_SECONDS
+                )
+                query = feature_query().where(
+                    or_(
+                        func.coalesce(Prospect.updated_at, Prospect.created_at)
+                        > since,
+                        func.coalesce(Company.updated_at, Company.created_at) > since,
+                    )
+                )
+
+            encoded_ids, blocks = [], []
+            for chunk in self._chunks(db, query):
+                encoded_ids.append(chunk["id"].to_numpy(dtype=np.int64))
+                blocks.append(self._encode(chunk, feature_names))
+            # Rows the timestamps missed, such as ones imported with a
+            # clock behind the database's
+            encoded = np.sort(np.concatenate(encoded_ids or [old_ids[:0]]))
+            unseen = all_ids[
+                ~_contains(old_ids, all_ids) & ~_contains(encoded, all_ids)
+            ]
+            for start in range(0, len(unseen), self.chunk_size):
+                batch = unseen[start : start + self.chunk_size].tolist()
+                for chunk in self._chunks(
+                    db, feature_query().where(Prospect.id.in_(batch))
+                ):
+                    encoded_ids.append(chunk["id"].to_numpy(dtype=np.int64))
+                    blocks.append(self._encode(chunk, feature_names))
+
+            new_ids = np.concatenate(encoded_ids or [old_ids[:0]])
+            exists = _contains(all_ids, old_ids)
+            removed = old_ids[~exists]
+            if meta is not None and not len(new_ids) and not len(removed):
+                self._write_meta({**meta, "synced_at": synced_at.isoformat()})
+            else:
+                keep = exists & ~_contains(np.sort(new_ids), old_ids)
+                parts = [old.matrix[keep]] if old is not None else []
+                parts += blocks
+                ids = np.concatenate([old_ids[keep], new_ids])
+                matrix = (
+                    sp.vstack(parts, format="csr")
+                    if parts
+                    else sp.csr_matrix((0, self.encoder.n_features))
+                )
+                order = np.argsort(ids, kind="stable")
+                self._write_generation(
+                    generation,
+                    synced_at,
+                    ids[order],
+                    matrix[order],
+                    feature_names,
+                )
+
+        return {
+            "encoded": int(len(new_ids)),
+            "removed": int(len(removed)),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def _encode(self, chunk: pd.DataFrame, feature_names: List[str]) -> sp.csr_matrix:
+        # Name hash buckets after the first words seen in them
+        for i, name in enumerate(self.encoder.feature_names(chunk)):
+            if "_#" in feature_names[i] and "_#" not in name:
+                feature_names[i] = name
+        return self.encoder.transform(chunk)
+
+    def _chunks(self, db: Session, query) -> Iterator[pd.DataFrame]:
+        result = db.execute(query.execution_options(yield_per=self.chunk_size))
+        for rows in result.partitions():
+            yield pd.DataFrame(rows, columns=["id"] + FEATURE_COLUMNS)
+
+    def _encoder_key(self) -> Dict[str, int]:
+        return {
+            "version": self.encoder.version,
+            "n_features": self.encoder.n_features,
+        }
+
+    @staticmethod
+    def _generation_dir(generation: int) -> str:
+        return f"generation-{generation:06d}"
+
+    def _write_generation(
+        self,
+        generation: int,
+        synced_at: datetime,
+        ids: np.ndarray,
+        matrix: sp.csr_matrix,
+        feature_names: List[str],
+    ) -> None:
+        directory = self.path / self._generation_dir(generation)
+        if directory.exists():
+            shutil.rmtree(directory)
+        directory.mkdir()
+        np.save(directory / "ids.npy", ids.astype(np.int64))
+        np.save(directory / "data.npy", matrix.data)
+        np.save(directory / "indices.npy", matrix.indices)
+        np.save(directory / "indptr.npy", matrix.indptr)
+        self._write_meta(
+            {
+                "generation": generation,
+                "encoder": self._encoder_key(),
+                "n_features": matrix.shape[1],
+                "rows": len(ids),
+                "synced_at": synced_at.isoformat(),
+                "feature_names": feature_names,
+            }
+        )
+        # Waits for readers that read the previous CURRENT but have not
+        # opened its files yet; open memory maps stay readable until closed
+        with self._lock(GENERATIONS_LOCK, fcntl.LOCK_EX):
+            for old in self.path.glob("generation-*"):
+                if old.name != directory.name:
+                    shutil.rmtree(old, ignore_errors=True)
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path / "CURRENT") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta: Dict[str, Any]) -> None:
+        temporary = self.path / "CURRENT.tmp"
+        with open(temporary, "w") as f:
+            json.dump(meta, f)
+        os.replace(temporary, self.path / "CURRENT")
+
+    @contextmanager
+    def _lock(
+        self, name: str = REFRESH_LOCK, operation: int = fcntl.LOCK_EX
+    ) -> Iterator[None]:
+        """
+        Hold a lock file across processes: by default, the exclusive lock
+        that serializes refreshes.
+        """
+        with open(self.path / name, "w") as f:
+            fcntl.flock(f, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+prospect_feature_store = ProspectFeatureStore()
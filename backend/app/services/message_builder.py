@@ -0,0 +1,161 @@
+import binascii
+import time
+import uuid
+from email.header import Header
+from email.utils import formataddr, formatdate
+from typing import List, Optional, Sequence, Tuple
+
+CRLF = b"\r\n"
+
+# RFC 5322 recommends folding header lines longer than this
+_MAX_HEADER_LEN = 78
+
+
+def _encode_header_value(value: str) -> bytes:
+    """Encode a header value, falling back to folding and RFC 2047 only when needed."""
+    value = value.replace("\r", " ").replace("\n", " ")
+    if value.isascii():
+        if len(value) <= _MAX_HEADER_LEN:
+            return value.encode("ascii")
+        return Header(value, "us-ascii").encode(linesep="\r\n").encode("ascii")
+    return Header(value, "utf-8").encode(linesep="\r\n").encode("ascii")
+
+
+def _encode_address(name: Optional[str], address: str) -> bytes:
+    if not name:
+        return address.encode("utf-8")
+    # Names come from imports and the API; a line break would start a header
+    name = name.replace("\r", " ").replace("\n", " ")
+    return formataddr((name, address)).encode("utf-8")
+
+
+def _encode_body(body: str) -> Tuple[bytes, bytes]:
+    """
+    Pick a transfer encoding for a text part and encode it.
+
+    Returns:
+        Tuple of (charset and Content-Transfer-Encoding header lines, encoded body)
+    """
+    body = body.replace("\r\n", "\n")
+    if body.isascii() and max(map(len, body.split("\n"))) <= 998:
+        headers = b'charset="us-ascii"' + CRLF + b"Content-Transfer-Encoding: 7bit"
+        encoded = body.encode("ascii")
+    else:
+        headers = b'charset="utf-8"' + CRLF + b"Content-Transfer-Encoding: quoted-printable"
+        encoded = binascii.b2a_qp(body.encode("utf-8"), istext=True)
+    return headers, encoded.replace(b"\n", CRLF)
+
+
+class MessageSkeleton:
+    """
+    Pre-encoded multipart message for sending the same campaign to many
+    recipients.
+
+    Everything that is identical for every recipient (From, Reply-To, MIME
+    headers, the boundary and any static parts) is encoded to bytes once.
+    `build` only encodes To, Subject, Date, Message-ID and the body, and
+    joins the pieces straight into the bytes handed to SMTP, skipping the
+    `email.message` object tree and generator.
+    """
+
+    def __init__(
+        self,
+        from_email: str,
+        from_name: Optional[str] = None,
+        reply_to: Optional[str] = None,
+        html: bool = True,
+        static_parts: Optional[Sequence[Tuple[str, str]]] = None,
+        extra_headers: Optional[Sequence[Tuple[str, str]]] = None,
+    ):
+        """
+        Args:
+            from_email: Sender email address
+            from_name: Sender name
+            reply_to: Reply-to email address
+            html: Whether recipient bodies are HTML
+            static_parts: (subtype, content) text parts appended after the body
+            extra_headers: Additional headers shared by every message
+        """
+        self.from_email = from_email
+        self._domain = from_email.rsplit("@", 1)[-1]
+        boundary = f"==============={uuid.uuid4().hex}=="
+        self._boundary = boundary.encode("ascii")
+
+        head: List[bytes] = [b"From: " + _encode_address(from_name, from_email)]
+        if reply_to:
+            head.append(b"Reply-To: " + reply_to.encode("ascii"))
+        for name, value in extra_headers or ():
+            head.append(name.encode("ascii") + b": " + _encode_header_value(value))
+        head.append(b"MIME-Version: 1.0")
+        head.append(b'Content-Type: multipart/mixed; boundary="' + self._boundary + b'"')
+        self._head = CRLF.join(head) + CRLF
+
+        subtype = b"html" if html else b"plain"
+        self._part_prefix = (
+            b"--" + self._boundary + CRLF + b"Content-Type: text/" + subtype + b"; "
+        )
+
+        tail = []
+        for part_subtype, content in static_parts or ():
+            part_headers, encoded = _encode_body(content)
+            tail.append(
+                b"--"
+                + self._boundary
+                + CRLF
+                + b"Content-Type: text/"
+                + part_subtype.encode("ascii")
+                + b"; "
+                + part_headers
+                + CRLF
+                + CRLF
+                + encoded
+                + CRLF
+            )
+        tail.append(b"--" + self._boundary + b"--" + CRLF)
+        self._tail = b"".join(tail)
+
+        # (second, encoded Date value), replaced as a whole so threads
+        # sharing the skeleton never see a date from a half-done update
+        self._date: Tuple[int, bytes] = (-1, b"")
+
+    def build(
+        self,
+        to_email: str,
+        to_name: Optional[str],
+        subject: str,
+        body: str,
+        message_id: Optional[str] = None,
+    ) -> bytes:
+        """Encode the message for one recipient."""
+        now = int(time.time())
+        second, date = self._date
+        if second != now:
+            date = formatdate(now, usegmt=True).encode("ascii")
+            self._date = (now, date)
+        message_id = message_id or f"<{uuid.uuid4().hex}@{self._domain}>"
+        part_headers, encoded = _encode_body(body)
+        return b"".join(
+            (
+                self._head,
+                b"To: ",
+                _encode_address(to_name, to_email),
+                CRLF,
+                b"Subject: ",
+                _encode_header_value(subject),
+                CRLF,
+                b"Date: ",
+                date,
+                CRLF,
+                b"Message-ID: ",
+                message_id.encode("ascii"),
+                CRLF,
+                CRLF,
+                self._part_prefix,
+                part_headers,
+                CRLF,
+                CRLF,
+                encoded,
+                CRLF,
+                self._tail,
+            )
+        )
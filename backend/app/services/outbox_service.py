@@ -0,0 +1,341 @@
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.models.campaign import Campaign
+from app.models.email import Email, EmailStatusEnum
+from app.models.outbox import EmailOutbox, OutboxStatusEnum
+from app.models.prospect import Prospect
+from app.services.analytics_service import analytics_service
+from sqlalchemy import and_, bindparam, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+# Emails that have not been sent, cancelled or handed to a campaign dispatch
+SENDABLE_STATUSES = (EmailStatusEnum.DRAFT, EmailStatusEnum.SCHEDULED)
+
+
+class OutboxService:
+    """
+    Durable send queue backed by the `email_outbox` table.
+
+    API requests enqueue email ids; any number of worker processes claim
+    batches with `FOR UPDATE SKIP LOCKED`, so a row is only ever leased to
+    one worker at a time. A lease that is not completed before
+    `locked_until` (e.g. because the worker crashed) becomes claimable
+    again. Failed sends are retried with exponential backoff until
+    `max_attempts`, after which the row is dead-lettered.
+    """
+
+    def enqueue(
+        self,
+        db: Session,
+        email_ids: Iterable[int],
+        available_at: Optional[datetime] = None,
+    ) -> int:
+        """
+        Queue emails for sending. Emails that are already queued, or that are
+        not in a sendable status, are skipped.
+
+        Returns:
+            Number of newly queued emails
+        """
+        email_ids = list(email_ids)
+        if email_ids:
+            email_ids = db.execute(
+                select(Email.id).where(
+                    Email.id.in_(email_ids), Email.status.in_(SENDABLE_STATUSES)
+                )
+            ).scalars().all()
+        if not email_ids:
+            return 0
+        values = [
+            {
+                "email_id": email_id,
+                "status": OutboxStatusEnum.PENDING,
+                "attempts": 0,
+                "max_attempts": settings.OUTBOX_MAX_ATTEMPTS,
+                "available_at": available_at or datetime.now(timezone.utc),
+            }
+            for email_id in email_ids
+        ]
+        result = db.execute(
+            insert(EmailOutbox)
+            .values(values)
+            .on_conflict_do_nothing(index_elements=["email_id"])
+        )
+        db.execute(
+            update(Email)
+            .where(Email.id.in_(email_ids), Email.status == EmailStatusEnum.DRAFT)
+            .values(status=EmailStatusEnum.SCHEDULED)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount
+
+    def claim_batch(
+        self,
+        db: Session,
+        worker_id: str,
+        batch_size: Optional[int] = None,
+        lease_seconds: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Lease up to `batch_size` ready rows to `worker_id`.
+
+        Returns:
+            List of dictionaries with the outbox row and the data needed to send it
+        """
+        batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        lease = timedelta(seconds=lease_seconds or settings.OUTBOX_LEASE_SECONDS)
+        now = datetime.now(timezone.utc)
+
+        # Expired leases that have used up their attempts go to the dead-letter state
+        db.execute(
+            update(EmailOutbox)
+            .where(
+                EmailOutbox.status == OutboxStatusEnum.IN_FLIGHT,
+                EmailOutbox.locked_until < now,
+                EmailOutbox.attempts >= EmailOutbox.max_attempts,
+            )
+            .values(
+                status=OutboxStatusEnum.DEAD,
+                locked_by=None,
+                locked_until=None,
+                last_error="Lease expired after final attempt",
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        # Emails sent, cancelled or dispatched elsewhere since they were queued
+        # must not go out again
+        sendable = select(Email.id).where(Email.status.in_(SENDABLE_STATUSES))
+        db.execute(
+            update(EmailOutbox)
+            .where(
+                or_(
+                    EmailOutbox.status == OutboxStatusEnum.PENDING,
+                    and_(
+                        EmailOutbox.status == OutboxStatusEnum.IN_FLIGHT,
+                        EmailOutbox.locked_until < now,
+                    ),
+                ),
+                EmailOutbox.email_id.notin_(sendable),
+            )
+            .values(
+                status=OutboxStatusEnum.DEAD,
+                locked_by=None,
+                locked_until=None,
+                last_error="Email is no longer sendable",
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        ready = (
+            select(EmailOutbox.id)
+            .where(
+                EmailOutbox.email_id.in_(sendable),
+                or_(
+                    and_(
+                        EmailOutbox.status == OutboxStatusEnum.PENDING,
+                        EmailOutbox.available_at <= now,
+                    ),
+                    and_(
+                        EmailOutbox.status == OutboxStatusEnum.IN_FLIGHT,
+                        EmailOutbox.locked_until < now,
+                        EmailOutbox.attempts < EmailOutbox.max_attempts,
+                    ),
+                )
+            )
+            .order_by(EmailOutbox.available_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        claimed = db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(ready.scalar_subquery()))
+            .values(
+                status=OutboxStatusEnum.IN_FLIGHT,
+                locked_by=worker_id,
+                locked_until=now + lease,
+                attempts=EmailOutbox.attempts + 1,
+            )
+            .returning(
+                EmailOutbox.id,
+                EmailOutbox.email_id,
+                EmailOutbox.attempts,
+                EmailOutbox.max_attempts,
+            )
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+        if not claimed:
+            return []
+
+        rows = db.execute(
+            select(
+                Email.id,
+                Email.campaign_id,
+                Email.subject,
+                Email.body,
+                Prospect.email,
+                Prospect.first_name,
+                Prospect.last_name,
+                Campaign.settings,
+            )
+            .join(Prospect, Prospect.id == Email.prospect_id)
+            .outerjoin(Campaign, Campaign.id == Email.campaign_id)
+            .where(Email.id.in_([c.email_id for c in claimed]))
+        ).all()
+        emails = {row.id: row for row in rows}
+
+        batch = []
+        for c in claimed:
+            email = emails.get(c.email_id)
+            campaign_settings = (email.settings if email else None) or {}
+            batch.append(
+                {
+                    "outbox_id": c.id,
+                    "email_id": c.email_id,
+                    "attempts": c.attempts,
+                    "max_attempts": c.max_attempts,
+                    "campaign_id": email.campaign_id if email else None,
+                    "subject": email.subject if email else None,
+                    "body": email.body if email else None,
+                    "to_email": email.email if email else None,
+                    "to_name": f"{email.first_name} {email.last_name}" if email else None,
+                    "track_opens": campaign_settings.get("track_opens", True),
+                    "track_clicks": campaign_settings.get("track_clicks", True),
+                }
+            )
+        return batch
+
+    def complete(self, db: Session, worker_id: str, items: List[Dict[str, Any]]) -> None:
+        """Mark leased rows as sent and record `sent_at` on their emails."""
+        if not items:
+            return
+        now = datetime.now(timezone.utc)
+        outbox = EmailOutbox.__table__
+        db.execute(
+            update(outbox)
+            .where(outbox.c.id == bindparam("_id"), outbox.c.locked_by == worker_id)
+            .values(
+                status=OutboxStatusEnum.SENT,
+                locked_by=None,
+                locked_until=None,
+                last_error=None,
+            ),
+            [{"_id": item["outbox_id"]} for item in items],
+        )
+        email_ids = [item["email_id"] for item in items]
+        db.execute(
+            update(Email)
+            .where(Email.id.in_(email_ids))
+            .values(status=EmailStatusEnum.SENT, sent_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        analytics_service.record(db, email_ids, "sent")
+        db.commit()
+
+    def fail(self, db: Session, worker_id: str, items: List[Dict[str, Any]]) -> None:
+        """
+        Release leased rows after a failed send.
+
+        Rows with attempts left are rescheduled with exponential backoff and
+        jitter; the rest are dead-lettered and their emails marked as failed.
+        """
+        if not items:
+            return
+        now = datetime.now(timezone.utc)
+        outbox = EmailOutbox.__table__
+        params = []
+        dead_email_ids = []
+        for item in items:
+            if item["attempts"] >= item["max_attempts"]:
+                status = OutboxStatusEnum.DEAD
+                dead_email_ids.append(item["email_id"])
+            else:
+                status = OutboxStatusEnum.PENDING
+            params.append(
+                {
+                    "_id": item["outbox_id"],
+                    "_status": status,
+                    "_available_at": now + self.backoff(item["attempts"]),
+                    "_last_error": str(item.get("error") or "")[:1000],
+                }
+            )
+        db.execute(
+            update(outbox)
+            .where(outbox.c.id == bindparam("_id"), outbox.c.locked_by == worker_id)
+            .values(
+                status=bindparam("_status"),
+                available_at=bindparam("_available_at"),
+                last_error=bindparam("_last_error"),
+                locked_by=None,
+                locked_until=None,
+            ),
+            params,
+        )
+        if dead_email_ids:
+            db.execute(
+                update(Email)
+                .where(Email.id.in_(dead_email_ids))
+                .values(status=EmailStatusEnum.FAILED)
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+
+    def defer(
+        self,
+        db: Session,
+        worker_id: str,
+        deferred: List[Tuple[Dict[str, Any], float]],
+    ) -> None:
+        """
+        Release leased rows that were throttled, without counting the attempt.
+
+        Args:
+            deferred: List of (item, seconds until it may be sent)
+        """
+        if not deferred:
+            return
+        now = datetime.now(timezone.utc)
+        outbox = EmailOutbox.__table__
+        db.execute(
+            update(outbox)
+            .where(outbox.c.id == bindparam("_id"), outbox.c.locked_by == worker_id)
+            .values(
+                status=OutboxStatusEnum.PENDING,
+                attempts=outbox.c.attempts - 1,
+                available_at=bindparam("_available_at"),
+                locked_by=None,
+                locked_until=None,
+            ),
+            [
+                {
+                    "_id": item["outbox_id"],
+                    "_available_at": now + timedelta(seconds=retry_after),
+                }
+                for item, retry_after in deferred
+            ],
+        )
+        db.commit()
+
+    def backoff(self, attempts: int) -> timedelta:
+        """Delay before the next attempt: exponential in `attempts`, with full jitter."""
+        delay = min(
+            settings.OUTBOX_BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0),
+            settings.OUTBOX_BACKOFF_MAX_SECONDS,
+        )
+        return timedelta(seconds=random.uniform(delay / 2, delay))
+
+    def get_counts(self, db: Session) -> Dict[str, int]:
+        """Return the number of outbox rows in each status."""
+        rows = db.execute(
+            select(EmailOutbox.status, func.count()).group_by(EmailOutbox.status)
+        ).all()
+        return {status.value: count for status, count in rows}
+
+
+outbox_service = OutboxService()
@@ -0,0 +1,134 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from jinja2 import StrictUndefined, Template, Undefined, select_autoescape
+from jinja2.sandbox import SandboxedEnvironment
+
+# (template id, updated_at) -> compiled (subject, body)
+CacheKey = Tuple[Any, Optional[datetime]]
+
+
+class PersonalizationEngine:
+    """
+    Renders `EmailTemplate` subject/body pairs for many prospects.
+
+    Templates are compiled once and cached by (template id, `updated_at`),
+    so editing a template invalidates its cached version automatically.
+    Rendering uses flat context dictionaries (see `build_context`) and
+    calls the compiled render function directly to skip the per-call
+    argument handling of `Template.render`.
+    """
+
+    def __init__(self, cache_size: Optional[int] = None, strict: bool = False):
+        undefined = StrictUndefined if strict else Undefined
+        # Templates are written by users, so they run sandboxed. Subjects are
+        # plain text; bodies are HTML and escape prospect data
+        self._subject_env = SandboxedEnvironment(
+            autoescape=False, undefined=undefined, cache_size=0
+        )
+        self._body_env = SandboxedEnvironment(
+            autoescape=select_autoescape(default_for_string=True),
+            undefined=undefined,
+            cache_size=0,
+        )
+        self.cache_size = cache_size or settings.PERSONALIZATION_CACHE_SIZE
+        self._cache: "OrderedDict[CacheKey, Tuple[Template, Template]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compile(self, template: Any) -> Tuple[Template, Template]:
+        """
+        Get the compiled (subject, body) pair for an `EmailTemplate`, or any
+        object with `id`, `updated_at`, `subject` and `body` attributes.
+        """
+        key = (template.id, getattr(template, "updated_at", None))
+        with self._lock:
+            compiled = self._cache.get(key)
+            if compiled is not None:
+                self._cache.move_to_end(key)
+                return compiled
+
+        compiled = (
+            self._subject_env.from_string(template.subject),
+            self._body_env.from_string(template.body),
+        )
+        with self._lock:
+            self._cache[key] = compiled
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return compiled
+
+    def render(self, template: Any, context: Dict[str, Any]) -> Tuple[str, str]:
+        """Render the subject and body of a template for one prospect."""
+        return self.render_batch(template, [context])[0]
+
+    def render_batch(
+        self, template: Any, contexts: Iterable[Dict[str, Any]]
+    ) -> List[Tuple[str, str]]:
+        """
+        Render the subject and body of a template for many prospects.
+
+        Args:
+            template: An `EmailTemplate` (or object with the same attributes)
+            contexts: Flat context dictionaries, one per prospect
+
+        Returns:
+            List of (subject, body) tuples in the order of `contexts`
+        """
+        subject_tmpl, body_tmpl = self.compile(template)
+        subject_render = subject_tmpl.root_render_func
+        subject_context = subject_tmpl.new_context
+        body_render = body_tmpl.root_render_func
+        body_context = body_tmpl.new_context
+        # Flatten the template globals once; merging them into every context
+        # through the ChainMap is what dominates `Template.render`
+        subject_globals = dict(subject_tmpl.globals)
+        body_globals = dict(body_tmpl.globals)
+        join = "".join
+
+        rendered = []
+        for context in contexts:
+            rendered.append(
+                (
+                    join(
+                        subject_render(
+                            subject_context({**subject_globals, **context}, shared=True)
+                        )
+                    ),
+                    join(
+                        body_render(body_context({**body_globals, **context}, shared=True))
+                    ),
+                )
+            )
+        return rendered
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    @staticmethod
+    def build_context(prospect: Any, company: Any = None) -> Dict[str, Any]:
+        """Flatten a prospect and its company into a render context."""
+        company = company if company is not None else getattr(prospect, "company", None)
+        first_name = prospect.first_name or ""
+        last_name = prospect.last_name or ""
+        return {
+            "first_name": first_name,
+            "last_name": last_name,
+            "full_name": f"{first_name} {last_name}".strip(),
+            "email": prospect.email,
+            "job_title": prospect.job_title or "",
+            "seniority": prospect.seniority or "",
+            "location": prospect.location or "",
+            "company_name": company.name if company else "",
+            "company_industry": (company.industry or "") if company else "",
+            "company_size": (company.size or "") if company else "",
+            "company_website": (company.website or "") if company else "",
+            "sender_name": settings.EMAILS_FROM_NAME or "",
+        }
+
+
+personalization_engine = PersonalizationEngine()
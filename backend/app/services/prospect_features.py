@@ -0,0 +1,115 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from app.core.config import settings
+from sklearn.feature_extraction.text import HashingVectorizer
+
+# Prospect attributes used as features, in the order they are loaded
+FEATURE_COLUMNS = ["company_size", "industry", "job_title", "seniority", "location"]
+
+ORDINAL_FEATURES = {
+    "company_size": {
+        "unknown": 0,
+        "1-10": 1,
+        "11-50": 2,
+        "51-200": 3,
+        "201-500": 4,
+        "501-1000": 5,
+        "1001-5000": 6,
+        "5001-10000": 7,
+        "10001+": 8,
+    },
+    "seniority": {
+        "unknown": 0,
+        "entry": 1,
+        "junior": 2,
+        "mid": 3,
+        "senior": 4,
+        "executive": 5,
+        "c-level": 6,
+    },
+}
+CATEGORICAL_FEATURES = ["industry", "job_title", "location"]
+
+
+class ProspectFeatureEncoder:
+    """
+    Encode prospect attributes into a fixed sparse feature space.
+
+    Ordinal attributes map through their fixed scale to [0, 1]. The words
+    of each categorical attribute are hashed into a block of its own
+    `n_hash_features` columns, l2-normalized per attribute. Nothing is
+    fitted: any chunk of rows can be encoded on its own, in any process,
+    and vectors from different runs share the same columns. Bump `version`
+    whenever the encoding changes, since stored vectors become
+    incomparable.
+    """
+
+    version = 1
+
+    def __init__(self, n_hash_features: Optional[int] = None):
+        self.n_hash_features = n_hash_features or settings.SEGMENTATION_HASH_FEATURES
+        self.hashers = {
+            feature: HashingVectorizer(
+                n_features=self.n_hash_features, alternate_sign=False, norm="l2"
+            )
+            for feature in CATEGORICAL_FEATURES
+        }
+
+    @property
+    def n_features(self) -> int:
+        return len(ORDINAL_FEATURES) + len(CATEGORICAL_FEATURES) * self.n_hash_features
+
+    def transform(self, df: pd.DataFrame) -> sp.csr_matrix:
+        """
+        Encode rows with any of the `FEATURE_COLUMNS`; missing columns and
+        values encode as unknown.
+
+        Returns:
+            CSR matrix of shape (len(df), n_features)
+        """
+        df = self._fill_missing(df)
+        blocks = []
+        for feature, mapping in ORDINAL_FEATURES.items():
+            scale = max(mapping.values())
+            values = df[feature].map(mapping).fillna(0).to_numpy(dtype=float) / scale
+            blocks.append(sp.csr_matrix(values[:, None]))
+        for feature, hasher in self.hashers.items():
+            # Few distinct values: hash each once, then gather rows
+            codes, uniques = pd.factorize(df[feature])
+            blocks.append(hasher.transform(uniques)[codes])
+        return sp.hstack(blocks, format="csr", dtype=np.float64)
+
+    def feature_names(self, df: pd.DataFrame) -> List[str]:
+        """
+        Readable names of the columns, in order. Hash columns are named
+        after a word of `df` that falls into them, or by bucket number.
+        """
+        df = self._fill_missing(df)
+        names = [f"{feature}_num" for feature in ORDINAL_FEATURES]
+        for feature, hasher in self.hashers.items():
+            words: Dict[int, str] = {}
+            analyzer = hasher.build_analyzer()
+            vocabulary = sorted(
+                {word for value in df[feature].unique() for word in analyzer(value)}
+            )
+            if vocabulary:
+                # One word per document, so one bucket per row
+                buckets = hasher.transform(vocabulary).indices
+                for word, bucket in zip(vocabulary, buckets):
+                    words.setdefault(int(bucket), word)
+            names.extend(
+                f"{feature}_{words.get(bucket, f'#{bucket}')}"
+                for bucket in range(self.n_hash_features)
+            )
+        return names
+
+    @staticmethod
+    def _fill_missing(df: pd.DataFrame) -> pd.DataFrame:
+        df = df.reindex(columns=FEATURE_COLUMNS)
+        return df.astype(object).replace("", None).fillna("unknown").astype(str)
+
+
+prospect_feature_encoder = ProspectFeatureEncoder()
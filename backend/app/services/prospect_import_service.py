@@ -0,0 +1,257 @@
+import time
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+from app.core.config import settings
+from app.models.prospect import Prospect
+from app.services.company_service import CompanyIndex, company_resolver
+from app.services.search_service import prospect_search
+from app.services.segment_model_service import segment_model_registry
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+REQUIRED_COLUMNS = ("first_name", "last_name", "email")
+PROSPECT_COLUMNS = REQUIRED_COLUMNS + (
+    "job_title",
+    "seniority",
+    "phone",
+    "linkedin_url",
+    "twitter_handle",
+    "location",
+    "notes",
+)
+COMPANY_COLUMNS = {
+    "company_name": "name",
+    "company_website": "website",
+    "company_industry": "industry",
+    "company_size": "size",
+}
+
+# Common spreadsheet headers, normalized, mapped to importer columns
+COLUMN_ALIASES = {
+    "email_address": "email",
+    "title": "job_title",
+    "linkedin": "linkedin_url",
+    "twitter": "twitter_handle",
+    "company": "company_name",
+    "website": "company_website",
+    "industry": "company_industry",
+    "size": "company_size",
+}
+
+# Vectorized equivalents of the ProspectBase field rules. EmailStr: a dotted
+# domain with an alphabetic TLD; the domain is lower-cased on import.
+EMAIL_PATTERN = (
+    r"^(?!\.)(?!.*\.\.)[A-Za-z0-9!#$%&'*+/=?^_`{|}~.-]+(?<!\.)"
+    r"@(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,63}$"
+)
+# HttpUrl: http(s) scheme, a host with a TLD or an IPv4 address, <= 2083 chars
+URL_PATTERN = (
+    r"^https?://(?:(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+"
+    r"[A-Za-z]{2,63}|\d{1,3}(?:\.\d{1,3}){3})(?::\d{1,5})?(?:[/?#]\S*)?$"
+)
+URL_MAX_LENGTH = 2083
+# ProspectBase.validate_twitter_handle
+TWITTER_PATTERN = r"^@?[a-zA-Z0-9_]{1,15}$"
+
+
+def _column_name(header: str) -> str:
+    name = "_".join(str(header).strip().lower().replace("-", " ").split())
+    return COLUMN_ALIASES.get(name, name)
+
+
+KNOWN_COLUMNS = set(PROSPECT_COLUMNS) | set(COMPANY_COLUMNS)
+
+
+class ProspectImporter:
+    """
+    Streaming CSV import of prospects and their companies.
+
+    The file is read `chunk_size` rows at a time, so memory does not grow
+    with the size of the upload. Each chunk is validated with vectorized
+    pandas string operations that mirror the rules of `ProspectBase`,
+    its companies are resolved against an index of existing companies
+    loaded once per import, and its valid rows are written with
+    multi-row `INSERT ... ON CONFLICT DO NOTHING` statements, assigned to
+    the active segments and committed. Rows whose email already exists are
+    reported, not overwritten.
+    """
+
+    def __init__(
+        self, chunk_size: Optional[int] = None, max_error_details: Optional[int] = None
+    ):
+        self.chunk_size = chunk_size or settings.PROSPECT_IMPORT_CHUNK_SIZE
+        self.max_error_details = (
+            max_error_details or settings.PROSPECT_IMPORT_MAX_ERROR_DETAILS
+        )
+
+    def import_csv(self, db: Session, file: IO) -> Dict[str, Any]:
+        """
+        Import prospects from a CSV file object.
+
+        Args:
+            db: Database session; committed once per chunk
+            file: Binary or text file object positioned at the header row
+
+        Returns:
+            Dictionary in the `ProspectImportResponse` format
+
+        Raises:
+            ValueError: If the file is empty or lacks a required column
+        """
+        started = time.perf_counter()
+        total_rows = 0
+        imported = 0
+        error_count = 0
+        error_details: List[str] = []
+        # Known companies, loaded once per import and grown as rows create them
+        companies: Optional[CompanyIndex] = None
+
+        def report(errors: List[Tuple[int, str]]) -> None:
+            nonlocal error_count
+            error_count += len(errors)
+            room = self.max_error_details - len(error_details)
+            for row, message in errors[: max(room, 0)]:
+                error_details.append(f"Row {row}: {message}")
+
+        try:
+            reader = pd.read_csv(
+                file,
+                chunksize=self.chunk_size,
+                dtype=str,
+                keep_default_na=False,
+                na_filter=False,
+                encoding="utf-8-sig",
+                usecols=lambda header: _column_name(header) in KNOWN_COLUMNS,
+            )
+        except pd.errors.EmptyDataError:
+            raise ValueError("CSV file is empty")
+
+        chunks = iter(reader)
+        while True:
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                break
+            except (pd.errors.ParserError, UnicodeDecodeError) as e:
+                # Earlier chunks are already committed; report where parsing stopped
+                error_count += 1
+                if len(error_details) < self.max_error_details:
+                    error_details.append(
+                        f"Row {total_rows + 2}: Import stopped, malformed CSV ({e})"
+                    )
+                break
+
+            chunk.columns = [_column_name(column) for column in chunk.columns]
+            missing = [column for column in REQUIRED_COLUMNS if column not in chunk]
+            if missing:
+                raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+            total_rows += len(chunk)
+            valid, errors = self.validate(chunk)
+            if companies is None and "company_name" in chunk:
+                companies = company_resolver.load(db)
+            inserted, duplicates = self._write(db, valid, companies)
+            imported += inserted
+            report(sorted(errors + duplicates))
+
+        elapsed = time.perf_counter() - started
+        return {
+            "total_rows": total_rows,
+            "imported": imported,
+            "errors": error_count,
+            "error_details": error_details,
+            "rows_per_second": round(total_rows / elapsed, 1) if elapsed else None,
+        }
+
+    @staticmethod
+    def validate(frame: pd.DataFrame) -> Tuple[pd.DataFrame, List[Tuple[int, str]]]:
+        """
+        Validate and normalize a chunk of rows with whole-column operations.
+
+        Returns:
+            The valid rows, normalized, and a (row number, message) list for
+            the rest, one message per rejected row
+        """
+        frame = frame.apply(lambda column: column.str.strip())
+        message = pd.Series("", index=frame.index)
+
+        def reject(mask: pd.Series, text: str) -> None:
+            message[mask & (message == "")] = text
+
+        for column in REQUIRED_COLUMNS:
+            reject(frame[column] == "", f"Missing {column.replace('_', ' ')}")
+        reject(~frame["email"].str.match(EMAIL_PATTERN), "Invalid email format")
+        for column, label in (
+            ("linkedin_url", "LinkedIn URL"),
+            ("company_website", "company website"),
+        ):
+            if column in frame:
+                values = frame[column]
+                bad = (values != "") & (
+                    ~values.str.match(URL_PATTERN) | (values.str.len() > URL_MAX_LENGTH)
+                )
+                reject(bad, f"Invalid {label}")
+        if "twitter_handle" in frame:
+            handles = frame["twitter_handle"]
+            reject(
+                (handles != "") & ~handles.str.match(TWITTER_PATTERN),
+                "Invalid Twitter handle",
+            )
+            frame["twitter_handle"] = handles.str.lstrip("@")
+
+        frame["email"] = frame["email"].str.replace(
+            r"@[^@]*$", lambda match: match.group(0).lower(), regex=True
+        )
+        # Keep the first valid row of an email repeated in the file
+        repeated = frame.loc[message == "", "email"].duplicated(keep="first")
+        reject(
+            repeated.reindex(frame.index, fill_value=False), "Duplicate email in file"
+        )
+
+        invalid = message != ""
+        # Spreadsheet row numbers: the header is row 1
+        errors = list(zip((frame.index[invalid] + 2).tolist(), message[invalid]))
+        return frame[~invalid], errors
+
+    def _write(
+        self, db: Session, frame: pd.DataFrame, companies: Optional[CompanyIndex]
+    ) -> Tuple[int, List[Tuple[int, str]]]:
+        """
+        Insert a validated chunk and commit.
+
+        Returns:
+            Number of prospects inserted and (row number, message) for the
+            rows skipped because their email already exists
+        """
+        if frame.empty:
+            return 0, []
+        frame = frame.where(frame != "", None)
+        columns = [column for column in PROSPECT_COLUMNS if column in frame]
+        records = frame[columns]
+        if companies is not None:
+            company_rows = frame[
+                [column for column in COMPANY_COLUMNS if column in frame]
+            ].rename(columns=COMPANY_COLUMNS)
+            records = records.assign(
+                company_id=company_resolver.resolve(db, companies, company_rows)
+            )
+        # executemany with RETURNING is sent as multi-row INSERTs by SQLAlchemy
+        rows = db.execute(
+            insert(Prospect)
+            .on_conflict_do_nothing(index_elements=["email"])
+            .returning(Prospect.id, Prospect.email),
+            records.astype(object).where(records.notna(), None).to_dict("records"),
+        ).all()
+        prospect_ids = [prospect_id for prospect_id, _ in rows]
+        prospect_search.refresh(db, prospect_ids)
+        segment_model_registry.assign(db, prospect_ids)
+        db.commit()
+        inserted = {email for _, email in rows}
+
+        existing = ~frame["email"].isin(inserted)
+        rows = (frame.index[existing] + 2).tolist()
+        return len(inserted), [(row, "Email already exists") for row in rows]
+
+
+prospect_importer = ProspectImporter()
@@ -0,0 +1,210 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.models.campaign import Campaign
+from app.models.rate_limit import RateLimitBucket
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+# (key, capacity, refill rate in tokens per second); a bucket without a
+# refill rate is a quota per UTC calendar day, refilled at midnight
+BucketSpec = Tuple[str, float, Optional[float]]
+
+
+class SendRateLimiter:
+    """
+    Token-bucket throttling for outgoing email.
+
+    Every send has to take one token from each of its buckets: the campaign
+    (`max_emails_per_day` from the campaign settings, counted per UTC
+    calendar day), the sending account and the recipient domain. Bucket
+    state lives in `rate_limit_buckets`, so all workers share it; a batch
+    locks only the buckets it touches, in key order, for the length of one
+    short transaction.
+
+    Items whose buckets are empty are not waited on. They are handed back
+    with the number of seconds until they can go, so the caller can defer
+    them and keep sending to domains that still have capacity.
+    """
+
+    def acquire(
+        self, db: Session, items: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[Tuple[Dict[str, Any], float]]]:
+        """
+        Take tokens for as many items as the buckets allow.
+
+        Args:
+            items: Claimed outbox items with `campaign_id` and `to_email`
+
+        Returns:
+            Tuple of (allowed items, [(deferred item, retry after seconds)])
+        """
+        if not items:
+            return [], []
+
+        campaign_limits = self._campaign_limits(
+            db, {item["campaign_id"] for item in items if item.get("campaign_id")}
+        )
+        item_buckets = [self._buckets_for(item, campaign_limits) for item in items]
+        specs = {spec[0]: spec for buckets in item_buckets for spec in buckets}
+        if not specs:
+            return list(items), []
+
+        buckets = self._lock_buckets(db, specs)
+
+        allowed = []
+        deferred = []
+        for item, item_specs in zip(items, item_buckets):
+            keys = [spec[0] for spec in item_specs]
+            short = [key for key in keys if buckets[key]["tokens"] < 1.0]
+            if short:
+                retry_after = max(self._retry_after(buckets[key]) for key in short)
+                deferred.append((item, retry_after))
+                continue
+            for key in keys:
+                buckets[key]["tokens"] -= 1.0
+            allowed.append(item)
+
+        table = RateLimitBucket.__table__
+        db.execute(
+            update(table)
+            .where(table.c.key == bindparam("_key"))
+            .values(
+                tokens=bindparam("_tokens"),
+                capacity=bindparam("_capacity"),
+                refill_rate=bindparam("_refill_rate"),
+                updated_at=bindparam("_updated_at"),
+            ),
+            [
+                {
+                    "_key": key,
+                    "_tokens": bucket["tokens"],
+                    "_capacity": bucket["capacity"],
+                    "_refill_rate": bucket["refill_rate"] or 0.0,
+                    "_updated_at": bucket["updated_at"],
+                }
+                for key, bucket in buckets.items()
+            ],
+        )
+        db.commit()
+        return allowed, deferred
+
+    def _lock_buckets(
+        self, db: Session, specs: Dict[str, BucketSpec]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Create missing buckets, lock all of them and refill them to now."""
+        db.execute(
+            insert(RateLimitBucket)
+            .values(
+                [
+                    {
+                        "key": key,
+                        "tokens": capacity,
+                        "capacity": capacity,
+                        "refill_rate": refill_rate or 0.0,
+                    }
+                    for key, capacity, refill_rate in specs.values()
+                ]
+            )
+            .on_conflict_do_nothing(index_elements=["key"])
+        )
+        rows = db.execute(
+            select(
+                RateLimitBucket.key,
+                RateLimitBucket.tokens,
+                RateLimitBucket.updated_at,
+            )
+            .where(RateLimitBucket.key.in_(list(specs)))
+            .order_by(RateLimitBucket.key)
+            .with_for_update()
+        ).all()
+
+        now = datetime.now(timezone.utc)
+        buckets = {}
+        for row in rows:
+            _, capacity, refill_rate = specs[row.key]
+            buckets[row.key] = {
+                "tokens": self._refill(
+                    specs[row.key], row.tokens, row.updated_at, now
+                ),
+                "capacity": capacity,
+                "refill_rate": refill_rate,
+                "updated_at": now,
+            }
+        return buckets
+
+    @staticmethod
+    def _refill(
+        spec: BucketSpec, tokens: float, updated_at: datetime, now: datetime
+    ) -> float:
+        """Tokens in a bucket at `now`, given its state at `updated_at`."""
+        _, capacity, refill_rate = spec
+        if updated_at.tzinfo is None:
+            # SQLite returns naive UTC
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        if refill_rate is None:
+            # A daily quota never carries over: a bucket refilled over the
+            # day could send up to twice the quota in a 24 hour window
+            if updated_at.astimezone(timezone.utc).date() < now.date():
+                return capacity
+            return min(capacity, tokens)
+        elapsed = max((now - updated_at).total_seconds(), 0.0)
+        return min(capacity, tokens + elapsed * refill_rate)
+
+    @staticmethod
+    def _retry_after(bucket: Dict[str, Any]) -> float:
+        """Seconds until a bucket without a whole token has one."""
+        if bucket["refill_rate"] is None:
+            now = bucket["updated_at"]
+            midnight = datetime.combine(
+                now.date() + timedelta(days=1), datetime.min.time(), timezone.utc
+            )
+            return (midnight - now).total_seconds()
+        return (1.0 - bucket["tokens"]) / bucket["refill_rate"]
+
+    def _buckets_for(
+        self, item: Dict[str, Any], campaign_limits: Dict[int, float]
+    ) -> List[BucketSpec]:
+        specs = []
+        campaign_id = item.get("campaign_id")
+        if campaign_id in campaign_limits:
+            per_day = campaign_limits[campaign_id]
+            specs.append((f"campaign:{campaign_id}", per_day, None))
+
+        account = item.get("from_email") or settings.EMAILS_FROM_EMAIL
+        if account:
+            specs.append(
+                self._per_minute(f"account:{account}", settings.SEND_RATE_ACCOUNT_PER_MINUTE)
+            )
+
+        to_email = item.get("to_email") or ""
+        if "@" in to_email:
+            domain = to_email.rsplit("@", 1)[1].lower()
+            per_minute = settings.SEND_RATE_DOMAIN_LIMITS.get(
+                domain, settings.SEND_RATE_DOMAIN_PER_MINUTE
+            )
+            specs.append(self._per_minute(f"domain:{domain}", per_minute))
+        return specs
+
+    def _per_minute(self, key: str, per_minute: float) -> BucketSpec:
+        rate = per_minute / 60.0
+        capacity = max(1.0, rate * settings.SEND_RATE_BURST_SECONDS)
+        return key, capacity, rate
+
+    def _campaign_limits(self, db: Session, campaign_ids: set) -> Dict[int, float]:
+        if not campaign_ids:
+            return {}
+        rows = db.execute(
+            select(Campaign.id, Campaign.settings).where(Campaign.id.in_(campaign_ids))
+        ).all()
+        limits = {}
+        for campaign_id, campaign_settings in rows:
+            per_day = (campaign_settings or {}).get("max_emails_per_day")
+            if per_day:
+                limits[campaign_id] = float(per_day)
+        return limits
+
+
+rate_limiter = SendRateLimiter()
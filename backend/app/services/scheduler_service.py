@@ -0,0 +1,282 @@
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.models.campaign import Campaign
+from app.models.email import Email, EmailStatusEnum
+from app.models.outbox import EmailOutbox, OutboxStatusEnum
+from app.services.outbox_service import outbox_service
+from sqlalchemy import and_, exists, insert, select, update
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# A prospect's follow-up sequence in one campaign: (prospect id, campaign id)
+SequenceKey = Tuple[int, Optional[int]]
+
+
+class SendScheduler:
+    """
+    In-memory scheduler for emails with a `scheduled_time`.
+
+    Only emails due within the next `lookahead` are held in memory, in a
+    min-heap keyed by due time. Each tick extends the window with a range
+    query on `scheduled_time`, releases due emails to the outbox in batches
+    and picks up new replies.
+
+    Follow-up entries carry the generation of their (prospect, campaign)
+    sequence at the time they were loaded, so cancelling a prospect's
+    pending follow-ups in one campaign is a single counter bump; stale
+    entries are dropped when they reach the top of the heap. First-touch
+    emails and other campaigns' follow-ups are unaffected. All state can
+    be rebuilt from the `emails` table, which is what happens after a
+    restart.
+    """
+
+    def __init__(
+        self,
+        lookahead: Optional[timedelta] = None,
+        release_batch_size: Optional[int] = None,
+        rescan_interval: Optional[timedelta] = None,
+    ):
+        self.lookahead = lookahead or timedelta(
+            seconds=settings.SCHEDULER_LOOKAHEAD_SECONDS
+        )
+        self.release_batch_size = (
+            release_batch_size or settings.SCHEDULER_RELEASE_BATCH_SIZE
+        )
+        self.rescan_interval = rescan_interval or timedelta(
+            seconds=settings.SCHEDULER_RESCAN_SECONDS
+        )
+
+        # (due timestamp, email id, follow-up sequence, sequence generation);
+        # the sequence is (prospect id, campaign id), None for first touches
+        self._heap: List[Tuple[float, int, Optional[SequenceKey], int]] = []
+        self._queued: Set[int] = set()
+        self._generation: Dict[SequenceKey, int] = {}
+        self._lock = threading.Lock()
+        self._horizon: Optional[datetime] = None
+        self._last_rescan: Optional[datetime] = None
+        self._last_reply_check: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    def schedule(
+        self, email_id: int, due: datetime, sequence: Optional[SequenceKey] = None
+    ) -> None:
+        """
+        Add an email to the wheel if it falls inside the loaded window.
+
+        Args:
+            sequence: (prospect id, campaign id) of a follow-up, which a reply
+                in that campaign cancels
+        """
+        with self._lock:
+            if email_id in self._queued:
+                return
+            if self._horizon is not None and due > self._horizon:
+                # Will be picked up when the window reaches it
+                return
+            self._queued.add(email_id)
+            heapq.heappush(
+                self._heap,
+                (
+                    due.timestamp(),
+                    email_id,
+                    sequence,
+                    self._generation.get(sequence, 0) if sequence else 0,
+                ),
+            )
+
+    def cancel_sequence(self, prospect_id: int, campaign_id: Optional[int]) -> None:
+        """Invalidate a prospect's in-memory follow-ups in one campaign in O(1)."""
+        sequence = (prospect_id, campaign_id)
+        with self._lock:
+            self._generation[sequence] = self._generation.get(sequence, 0) + 1
+
+    def pop_due(self, now: datetime, limit: int) -> List[int]:
+        """Remove and return up to `limit` email ids that are due at `now`."""
+        due = []
+        cutoff = now.timestamp()
+        with self._lock:
+            while self._heap and len(due) < limit and self._heap[0][0] <= cutoff:
+                _, email_id, sequence, generation = heapq.heappop(self._heap)
+                self._queued.discard(email_id)
+                if sequence and generation != self._generation.get(sequence, 0):
+                    continue
+                due.append(email_id)
+        return due
+
+    def tick(self, db: Session, now: Optional[datetime] = None) -> int:
+        """
+        Advance the scheduler: load the next slice of the window, apply new
+        replies and release due emails to the outbox.
+
+        Returns:
+            Number of emails released
+        """
+        now = now or datetime.now(timezone.utc)
+        self._apply_replies(db, now)
+        self._load_window(db, now)
+
+        released = 0
+        while True:
+            email_ids = self.pop_due(now, self.release_batch_size)
+            if not email_ids:
+                break
+            # Drop anything cancelled or sent elsewhere since it was loaded
+            email_ids = db.execute(
+                select(Email.id).where(
+                    Email.id.in_(email_ids), Email.status == EmailStatusEnum.SCHEDULED
+                )
+            ).scalars().all()
+            released += outbox_service.enqueue(db, email_ids)
+        return released
+
+    def _load_window(self, db: Session, now: datetime) -> None:
+        new_horizon = now + self.lookahead
+        rescan = (
+            self._horizon is None
+            or self._last_rescan is None
+            or now - self._last_rescan >= self.rescan_interval
+        )
+        query = select(
+            Email.id,
+            Email.prospect_id,
+            Email.campaign_id,
+            Email.parent_email_id,
+            Email.scheduled_time,
+        ).where(
+            Email.status == EmailStatusEnum.SCHEDULED,
+            Email.scheduled_time <= new_horizon,
+            ~exists().where(EmailOutbox.email_id == Email.id),
+        )
+        if not rescan:
+            # Only the slice that entered the window since the last tick
+            query = query.where(Email.scheduled_time > self._horizon)
+
+        rows = db.execute(query).all()
+        with self._lock:
+            self._horizon = new_horizon
+        for email_id, prospect_id, campaign_id, parent_id, scheduled_time in rows:
+            sequence = (prospect_id, campaign_id) if parent_id is not None else None
+            self.schedule(email_id, scheduled_time, sequence)
+        if rescan:
+            self._last_rescan = now
+            logger.info(f"Scheduler window rescanned, {len(self)} emails pending")
+
+    def _apply_replies(self, db: Session, now: datetime) -> None:
+        since = self._last_reply_check or now - self.rescan_interval
+        sequences = db.execute(
+            select(Email.prospect_id, Email.campaign_id)
+            .where(Email.replied_at >= since, Email.replied_at < now)
+            .distinct()
+        ).all()
+        for prospect_id, campaign_id in sequences:
+            self.cancel_sequence(prospect_id, campaign_id)
+        self._last_reply_check = now
+
+    def create_follow_ups(self, db: Session, email_ids: Iterable[int]) -> int:
+        """
+        Create the follow-up sequence for freshly sent first-touch emails,
+        using the campaign's `follow_up_days` setting.
+
+        Returns:
+            Number of follow-up emails scheduled
+        """
+        email_ids = list(email_ids)
+        if not email_ids:
+            return 0
+        rows = db.execute(
+            select(
+                Email.id,
+                Email.prospect_id,
+                Email.campaign_id,
+                Email.template_id,
+                Email.variation,
+                Email.subject,
+                Email.body,
+                Email.sent_at,
+                Campaign.settings,
+            )
+            .join(Campaign, Campaign.id == Email.campaign_id)
+            .where(
+                Email.id.in_(email_ids),
+                Email.parent_email_id.is_(None),
+                Email.sent_at.isnot(None),
+            )
+        ).all()
+
+        follow_ups = []
+        for row in rows:
+            days = (row.settings or {}).get("follow_up_days") or []
+            subject = row.subject if row.subject.startswith("Re: ") else f"Re: {row.subject}"
+            for step, day in enumerate(days, start=1):
+                follow_ups.append(
+                    {
+                        "prospect_id": row.prospect_id,
+                        "campaign_id": row.campaign_id,
+                        "template_id": row.template_id,
+                        "variation": row.variation,
+                        "parent_email_id": row.id,
+                        "sequence_step": step,
+                        "subject": subject,
+                        "body": row.body,
+                        "status": EmailStatusEnum.SCHEDULED,
+                        "scheduled_time": row.sent_at + timedelta(days=day),
+                    }
+                )
+        if follow_ups:
+            db.execute(insert(Email), follow_ups)
+            db.commit()
+        return len(follow_ups)
+
+    def cancel_follow_ups(
+        self, db: Session, prospect_id: int, campaign_id: Optional[int] = None
+    ) -> int:
+        """
+        Cancel a prospect's pending follow-ups after a reply, both in memory
+        and in the database. Without a campaign, follow-ups of every
+        campaign are cancelled in the database; the heap drops them when
+        their release finds them no longer scheduled.
+
+        Returns:
+            Number of follow-up emails cancelled
+        """
+        self.cancel_sequence(prospect_id, campaign_id)
+
+        criteria = [
+            Email.prospect_id == prospect_id,
+            Email.parent_email_id.isnot(None),
+            Email.status == EmailStatusEnum.SCHEDULED,
+        ]
+        if campaign_id is not None:
+            criteria.append(Email.campaign_id == campaign_id)
+        cancelled = db.execute(
+            update(Email)
+            .where(*criteria)
+            .values(status=EmailStatusEnum.CANCELLED)
+            .returning(Email.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        if cancelled:
+            db.execute(
+                update(EmailOutbox)
+                .where(
+                    and_(
+                        EmailOutbox.email_id.in_(cancelled),
+                        EmailOutbox.status == OutboxStatusEnum.PENDING,
+                    )
+                )
+                .values(status=OutboxStatusEnum.DEAD, last_error="Cancelled after reply")
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+        return len(cancelled)
+
+
+send_scheduler = SendScheduler()
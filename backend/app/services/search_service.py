@@ -0,0 +1,301 @@
+import re
+from typing import Any, Iterable, List, Optional, Tuple
+
+from app.models.prospect import Company, Prospect
+from sqlalchemy import (
+    column,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    select,
+    table,
+    text,
+    update,
+)
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+
+def _terms(query: str) -> List[str]:
+    """Lower-cased word tokens of a search string; operators are dropped."""
+    return re.findall(r"\w+", query.lower())
+
+
+class PostgresSearchBackend:
+    """
+    Search over `Prospect.search_document` (a weighted tsvector) and
+    `Prospect.search_text` (lower-cased text), both GIN-indexed.
+
+    Every query word is matched as a prefix in the tsvector; the trigram
+    word similarity of the whole query against the text catches typos.
+    """
+
+    def refresh(self, db: Session, prospect_ids: Optional[List[int]]) -> None:
+        company_name = (
+            select(Company.name)
+            .where(Company.id == Prospect.company_id)
+            .scalar_subquery()
+        )
+        fields = [
+            (Prospect.first_name, "A"),
+            (Prospect.last_name, "A"),
+            (Prospect.email, "B"),
+            (company_name, "B"),
+            (Prospect.job_title, "C"),
+            (Prospect.location, "D"),
+        ]
+        document = None
+        for field, weight in fields:
+            part = func.setweight(
+                func.to_tsvector("simple", func.coalesce(field, "")),
+                # A bare literal, so PostgreSQL resolves it to "char"
+                literal_column(f"'{weight}'"),
+            )
+            document = part if document is None else document.op("||")(part)
+        stmt = update(Prospect).values(
+            search_document=document,
+            search_text=func.lower(
+                func.concat_ws(" ", *(field for field, _ in fields))
+            ),
+            # Reindexing is not an edit of the prospect
+            updated_at=Prospect.updated_at,
+        )
+        if prospect_ids is not None:
+            stmt = stmt.where(Prospect.id.in_(prospect_ids))
+        db.execute(stmt.execution_options(synchronize_session=False))
+
+    def missing(self, db: Session) -> List[int]:
+        return list(
+            db.scalars(select(Prospect.id).where(Prospect.search_text.is_(None)))
+        )
+
+    @staticmethod
+    def _tsquery(terms: List[str]) -> ColumnElement:
+        return func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+
+    def match(self, query: str) -> ColumnElement:
+        terms = _terms(query)
+        phrase = " ".join(terms)
+        return or_(
+            Prospect.search_document.op("@@")(self._tsquery(terms)),
+            literal(phrase).op("<%")(Prospect.search_text),
+        )
+
+    def rank(self, query: str) -> ColumnElement:
+        terms = _terms(query)
+        return func.ts_rank_cd(
+            Prospect.search_document, self._tsquery(terms)
+        ) + func.word_similarity(" ".join(terms), Prospect.search_text)
+
+    def search(
+        self, db: Session, query: str, limit: int
+    ) -> List[Tuple[Prospect, float]]:
+        rank = self.rank(query).label("rank")
+        return [
+            (prospect, score)
+            for prospect, score in db.execute(
+                select(Prospect, rank)
+                .where(self.match(query))
+                .order_by(rank.desc(), Prospect.id)
+                .limit(limit)
+            )
+        ]
+
+
+class SQLiteSearchBackend:
+    """
+    Local stand-in backed by an SQLite FTS5 table keyed by prospect id.
+
+    Supports the same ranked prefix search (BM25 with per-column weights)
+    but no typo tolerance.
+    """
+
+    fts = table(
+        "prospects_fts",
+        column("rowid"),
+        column("name"),
+        column("email"),
+        column("company"),
+        column("job_title"),
+        column("location"),
+    )
+    # BM25 weights of the columns above, in order
+    weights = (10.0, 5.0, 5.0, 2.0, 1.0)
+
+    def ensure_schema(self, db: Session) -> None:
+        db.execute(
+            text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS prospects_fts USING fts5("
+                "name, email, company, job_title, location, "
+                "prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+            )
+        )
+
+    def refresh(self, db: Session, prospect_ids: Optional[List[int]]) -> None:
+        self.ensure_schema(db)
+        fts = self.fts
+        clear = delete(fts)
+        rows = (
+            select(
+                Prospect.id,
+                func.trim(
+                    func.coalesce(Prospect.first_name, "")
+                    + " "
+                    + func.coalesce(Prospect.last_name, "")
+                ),
+                Prospect.email,
+                Company.name,
+                Prospect.job_title,
+                Prospect.location,
+            )
+            .select_from(Prospect)
+            .outerjoin(Company, Company.id == Prospect.company_id)
+        )
+        if prospect_ids is not None:
+            clear = clear.where(fts.c.rowid.in_(prospect_ids))
+            rows = rows.where(Prospect.id.in_(prospect_ids))
+        db.execute(clear)
+        db.execute(
+            insert(fts).from_select(
+                ["rowid", "name", "email", "company", "job_title", "location"], rows
+            )
+        )
+
+    def missing(self, db: Session) -> List[int]:
+        self.ensure_schema(db)
+        return list(
+            db.scalars(
+                select(Prospect.id).where(
+                    Prospect.id.not_in(select(self.fts.c.rowid))
+                )
+            )
+        )
+
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        # Implicit AND of quoted prefix terms
+        return " ".join(f'"{term}"*' for term in _terms(query))
+
+    def match(self, query: str) -> ColumnElement:
+        return Prospect.id.in_(
+            select(self.fts.c.rowid).where(
+                literal_column("prospects_fts").op("MATCH")(self._fts_query(query))
+            )
+        )
+
+    def search(
+        self, db: Session, query: str, limit: int
+    ) -> List[Tuple[Prospect, float]]:
+        # bm25() is lower for better matches
+        rank = (-func.bm25(literal_column("prospects_fts"), *self.weights)).label(
+            "rank"
+        )
+        return [
+            (prospect, score)
+            for prospect, score in db.execute(
+                select(Prospect, rank)
+                .join(self.fts, self.fts.c.rowid == Prospect.id)
+                .where(
+                    literal_column("prospects_fts").op("MATCH")(
+                        self._fts_query(query)
+                    )
+                )
+                .order_by(rank.desc(), Prospect.id)
+                .limit(limit)
+            )
+        ]
+
+
+class ProspectSearch:
+    """
+    Ranked prefix and fuzzy search over prospects and their companies.
+
+    PostgreSQL keeps a tsvector and a trigram-indexed text per prospect;
+    SQLite, for local development, uses an FTS5 table. The backend follows
+    the dialect of the session. Search data is derived, so writers call
+    `refresh` for the prospects they create or change, in the same
+    transaction.
+    """
+
+    backends = {
+        "postgresql": PostgresSearchBackend(),
+        "sqlite": SQLiteSearchBackend(),
+    }
+    # Prospects rebuilt per statement by `backfill`
+    backfill_batch_size = 10_000
+
+    def backend(self, db: Session) -> Any:
+        dialect = db.get_bind().dialect.name
+        try:
+            return self.backends[dialect]
+        except KeyError:
+            raise ValueError(f"Prospect search is not supported on {dialect}")
+
+    def refresh(
+        self, db: Session, prospect_ids: Optional[Iterable[int]] = None
+    ) -> None:
+        """
+        Rebuild the search data of the given prospects, or of all of them.
+
+        Does not commit.
+        """
+        if prospect_ids is not None:
+            prospect_ids = list(prospect_ids)
+            if not prospect_ids:
+                return
+        self.backend(db).refresh(db, prospect_ids)
+
+    def refresh_companies(self, db: Session, company_ids: Iterable[int]) -> None:
+        """
+        Rebuild the search data of the prospects of the given companies,
+        after a change to their names. Does not commit.
+        """
+        company_ids = list(company_ids)
+        if company_ids:
+            self.refresh(
+                db,
+                db.scalars(
+                    select(Prospect.id).where(Prospect.company_id.in_(company_ids))
+                ),
+            )
+
+    def backfill(self, db: Session) -> int:
+        """
+        Build the search data of prospects that have none, such as rows
+        written before search was indexed. Does not commit.
+
+        Returns:
+            Number of prospects indexed
+        """
+        prospect_ids = self.backend(db).missing(db)
+        for start in range(0, len(prospect_ids), self.backfill_batch_size):
+            self.refresh(db, prospect_ids[start : start + self.backfill_batch_size])
+        return len(prospect_ids)
+
+    def match(self, db: Session, query: str) -> Optional[ColumnElement]:
+        """
+        Filter criterion for prospects matching `query`, for use in other
+        queries; None if the query has no searchable words.
+        """
+        if not _terms(query):
+            return None
+        return self.backend(db).match(query)
+
+    def search(
+        self, db: Session, query: str, limit: int = 20
+    ) -> List[Tuple[Prospect, float]]:
+        """
+        Best matches for `query`, ranked.
+
+        Returns:
+            (prospect, score) pairs, best first
+        """
+        if not _terms(query):
+            return []
+        return self.backend(db).search(db, query, limit)
+
+
+prospect_search = ProspectSearch()
@@ -0,0 +1,203 @@
+import logging
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from app.models.prospect import Prospect, ProspectSegment
+from app.models.segmentation import SegmentationModel
+from app.services.feature_store import feature_query
+from app.services.prospect_features import FEATURE_COLUMNS, prospect_feature_encoder
+from sklearn.metrics import pairwise_distances_argmin
+from sqlalchemy import Integer, any_, bindparam, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Ids per statement where arrays cannot be bound (SQLite's parameter limit)
+ID_BATCH_SIZE = 30000
+
+
+class FittedSegmentation(NamedTuple):
+    """A registered segmentation, ready to assign prospects."""
+
+    version: int
+    encoder_version: int
+    scale: np.ndarray
+    centers: np.ndarray
+    # ProspectSegment id of each row of `centers`
+    segment_ids: np.ndarray
+
+    def predict(self, features: sp.csr_matrix) -> np.ndarray:
+        """ProspectSegment ids for encoded, unscaled prospect features."""
+        scaled = features @ sp.diags(1.0 / self.scale)
+        return self.segment_ids[pairwise_distances_argmin(scaled, self.centers)]
+
+
+class SegmentModelRegistry:
+    """
+    Versioned store of fitted segmentations and of segment membership.
+
+    `register` saves the scaling and segment centers of a segmentation as
+    a new `SegmentationModel` version with its `ProspectSegment` rows,
+    writes every prospect's `segment_id` and makes the version active.
+    `assign` places new prospects into the active segments by nearest
+    center, so creating or importing prospects does not need a re-cluster.
+    Membership is written with one set-based UPDATE per segment, which
+    leaves `updated_at` alone: being segmented is not an edit of the
+    prospect, and the feature store would re-encode it otherwise.
+    """
+
+    def __init__(self):
+        self._cache: Optional[FittedSegmentation] = None
+
+    def register(
+        self,
+        db: Session,
+        *,
+        algorithm: str,
+        params: Optional[Dict[str, Any]],
+        scale: np.ndarray,
+        centers: np.ndarray,
+        segments: List[Dict[str, Any]],
+        members: Iterable[np.ndarray],
+    ) -> Tuple[SegmentationModel, List[int]]:
+        """
+        Save a segmentation as the new active version and write membership.
+
+        Commits. Prospects in none of the segments, such as DBSCAN noise or
+        prospects left out of an in-memory run, end up without a segment.
+
+        Args:
+            scale: Max-abs scale of each feature
+            centers: Scaled center of each segment, in `segments` order
+            segments: Dictionaries with "name", "description" and "size"
+            members: Prospect ids of each segment, in `segments` order
+
+        Returns:
+            The model row and the ProspectSegment ids, in `segments` order
+        """
+        model = SegmentationModel(
+            algorithm=algorithm,
+            n_clusters=len(segments),
+            params=params,
+            encoder_version=prospect_feature_encoder.version,
+            n_features=centers.shape[1],
+            scale=np.ascontiguousarray(scale, dtype=np.float64).tobytes(),
+            centers=np.ascontiguousarray(centers, dtype=np.float64).tobytes(),
+        )
+        db.add(model)
+        db.flush()
+        rows = [
+            ProspectSegment(
+                name=segment["name"],
+                description=segment["description"],
+                size=segment["size"],
+                model_id=model.id,
+                cluster=cluster,
+            )
+            for cluster, segment in enumerate(segments)
+        ]
+        db.add_all(rows)
+        db.flush()
+        segment_ids = [row.id for row in rows]
+
+        db.execute(
+            update(Prospect)
+            .where(Prospect.segment_id.isnot(None))
+            .values(segment_id=None, updated_at=Prospect.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        for segment_id, prospect_ids in zip(segment_ids, members):
+            self._write_members(db, segment_id, prospect_ids)
+        db.execute(
+            update(SegmentationModel).values(
+                is_active=SegmentationModel.id == model.id
+            )
+        )
+        db.commit()
+        return model, segment_ids
+
+    def active(self, db: Session) -> Optional[FittedSegmentation]:
+        """The active segmentation, or None before the first one."""
+        version = db.scalar(
+            select(SegmentationModel.id).where(SegmentationModel.is_active)
+        )
+        if version is None:
+            return None
+        if self._cache is None or self._cache.version != version:
+            model = db.get(SegmentationModel, version)
+            segment_ids = db.scalars(
+                select(ProspectSegment.id)
+                .where(ProspectSegment.model_id == version)
+                .order_by(ProspectSegment.cluster)
+            ).all()
+            self._cache = FittedSegmentation(
+                version=version,
+                encoder_version=model.encoder_version,
+                scale=np.frombuffer(model.scale, dtype=np.float64),
+                centers=np.frombuffer(model.centers, dtype=np.float64).reshape(
+                    model.n_clusters, model.n_features
+                ),
+                segment_ids=np.asarray(segment_ids, dtype=np.int64),
+            )
+        return self._cache
+
+    def assign(self, db: Session, prospect_ids: Iterable[int]) -> int:
+        """
+        Put prospects without a segment into the nearest active segment.
+
+        Does not commit.
+
+        Returns:
+            Number of prospects assigned
+        """
+        prospect_ids = list(prospect_ids)
+        fitted = self.active(db) if prospect_ids else None
+        if fitted is None:
+            return 0
+        if fitted.encoder_version != prospect_feature_encoder.version:
+            logger.warning(
+                "Segmentation %d predates the feature encoding; not assigning",
+                fitted.version,
+            )
+            return 0
+        rows = db.execute(
+            feature_query().where(
+                Prospect.id.in_(prospect_ids), Prospect.segment_id.is_(None)
+            )
+        ).all()
+        if not rows:
+            return 0
+        frame = pd.DataFrame(rows, columns=["id"] + FEATURE_COLUMNS)
+        predicted = fitted.predict(prospect_feature_encoder.transform(frame))
+        ids = frame["id"].to_numpy()
+        for segment_id in np.unique(predicted):
+            members = ids[predicted == segment_id]
+            self._write_members(db, int(segment_id), members)
+            db.execute(
+                update(ProspectSegment)
+                .where(ProspectSegment.id == int(segment_id))
+                .values(size=ProspectSegment.size + len(members))
+            )
+        return len(ids)
+
+    @staticmethod
+    def _write_members(db: Session, segment_id: int, prospect_ids: np.ndarray) -> None:
+        prospect_ids = [int(prospect_id) for prospect_id in prospect_ids]
+        stmt = (
+            update(Prospect)
+            .values(segment_id=segment_id, updated_at=Prospect.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        if db.get_bind().dialect.name == "postgresql":
+            ids = bindparam("prospect_ids", prospect_ids, type_=ARRAY(Integer))
+            db.execute(stmt.where(Prospect.id == any_(ids)))
+            return
+        for start in range(0, len(prospect_ids), ID_BATCH_SIZE):
+            batch = prospect_ids[start : start + ID_BATCH_SIZE]
+            db.execute(stmt.where(Prospect.id.in_(batch)))
+
+
+segment_model_registry = SegmentModelRegistry()
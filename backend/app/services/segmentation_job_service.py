@@ -0,0 +1,407 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.segmentation import SegmentationJob, SegmentationModel
+from app.schemas.prospect import SegmentationResult
+from app.services.feature_store import prospect_feature_store
+from app.services.segmentation_service import segmentation_service
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+STREAMING_ALGORITHMS = ("kmeans", "minibatch_kmeans")
+IN_MEMORY_ALGORITHMS = ("dbscan", "hierarchical")
+ACTIVE_STATUSES = ("queued", "running")
+ABANDONED = "Abandoned: the process running the job stopped"
+
+
+class SegmentationCancelled(Exception):
+    """Raised inside a running job whose cancellation was requested."""
+
+
+def run_job(job_id: int) -> None:
+    """Entry point of the worker processes."""
+    segmentation_jobs.run(job_id)
+
+
+class SegmentationJobService:
+    """
+    Runs segmentations as background jobs in a pool of worker processes.
+
+    Clustering is CPU-bound Python and NumPy work, so it runs outside the
+    API process: request handlers only create a `SegmentationJob` row and
+    return its id, and clients poll the row for progress and the result.
+    Workers are spawned rather than forked, since the API process runs
+    threads. A job whose cache key (data version, algorithm and
+    parameters) matches a finished job is answered with that job while
+    its segmentation is still the active one, and a request matching a
+    job in flight in any process joins it: a partial unique index admits
+    one live job per cache key.
+
+    Each process stamps the heartbeat of the jobs it owns. Jobs whose
+    owner went away, such as by a restart, a killed worker or `shutdown`,
+    are finalized: by the process itself when it sees the job's future end
+    without a result, or by any process once the heartbeat goes stale.
+    """
+
+    def __init__(
+        self, workers: Optional[int] = None, progress_interval: Optional[float] = None
+    ):
+        self.workers = workers or settings.SEGMENTATION_JOB_WORKERS
+        self.progress_interval = (
+            progress_interval or settings.SEGMENTATION_JOB_PROGRESS_INTERVAL
+        )
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._futures: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start the heartbeat thread, which stamps this process's jobs and
+        fails abandoned ones, starting with those left by a previous run.
+        """
+        with self._lock:
+            if self._heartbeat is not None:
+                return
+            self._stop.clear()
+            self._heartbeat = threading.Thread(
+                target=self._beat, name="segmentation-heartbeat", daemon=True
+            )
+            self._heartbeat.start()
+
+    def submit(
+        self,
+        db: Session,
+        algorithm: str,
+        n_clusters: int,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> SegmentationJob:
+        """
+        Queue a segmentation, or return the job that already answers it.
+
+        Raises:
+            ValueError: If the algorithm is not supported
+        """
+        if algorithm not in STREAMING_ALGORITHMS + IN_MEMORY_ALGORITHMS:
+            raise ValueError(f"Unsupported algorithm: {algorithm}")
+        if algorithm in STREAMING_ALGORITHMS:
+            # Both run the streaming MiniBatchKMeans, which takes no params
+            algorithm, params = "minibatch_kmeans", None
+        cache_key = self.cache_key(db, algorithm, n_clusters, params)
+
+        while True:
+            cached = self._find(db, cache_key)
+            if cached is not None:
+                return cached
+            job = SegmentationJob(
+                status="queued",
+                algorithm=algorithm,
+                n_clusters=n_clusters,
+                params=params,
+                cache_key=cache_key,
+                progress=0.0,
+                heartbeat_at=datetime.now(timezone.utc),
+            )
+            db.add(job)
+            try:
+                db.commit()
+                break
+            except IntegrityError:
+                # Another process queued the same segmentation first
+                db.rollback()
+        db.refresh(job)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            future = self._executor.submit(run_job, job.id)
+            self._futures[job.id] = future
+        self.start()
+        future.add_done_callback(
+            lambda future, job_id=job.id: self._done(job_id, future)
+        )
+        return job
+
+    def cache_key(
+        self,
+        db: Session,
+        algorithm: str,
+        n_clusters: int,
+        params: Optional[Dict[str, Any]],
+    ) -> str:
+        key = json.dumps(
+            [prospect_feature_store.data_version(db), algorithm, n_clusters, params],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, db: Session, job_id: int) -> Optional[SegmentationJob]:
+        return db.get(SegmentationJob, job_id)
+
+    def cancel(self, db: Session, job: SegmentationJob) -> SegmentationJob:
+        """
+        Cancel a job. A queued job, or one no live process owns, is
+        cancelled at once; a running one stops at its next progress
+        report, before anything is saved.
+        """
+        if job.status not in ACTIVE_STATUSES:
+            return job
+        job.cancel_requested = True
+        with self._lock:
+            future = self._futures.get(job.id)
+        if future is not None:
+            owned = job.status == "running" or not future.cancel()
+        else:
+            # A worker of another process skips a job that is no longer
+            # queued; a running one is only owned while its heartbeat lasts
+            owned = job.status == "running" and not self._is_stale(job)
+        if not owned:
+            job.status = "cancelled"
+            job.finished_at = datetime.now(timezone.utc)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def shutdown(self) -> None:
+        """
+        Stop the heartbeat and the workers. Queued jobs are cancelled;
+        running ones are killed and failed once their heartbeat is stale.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+            heartbeat, self._heartbeat = self._heartbeat, None
+        if heartbeat is not None:
+            self._stop.set()
+            heartbeat.join()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def fail_abandoned(self, db: Session) -> int:
+        """
+        Fail queued and running jobs whose heartbeat is stale: their
+        process is gone, so nothing would ever finish them.
+
+        Returns:
+            Number of jobs failed
+        """
+        with self._lock:
+            owned = list(self._futures)
+        return self._abandon(
+            db,
+            "failed",
+            ABANDONED,
+            func.coalesce(SegmentationJob.heartbeat_at, SegmentationJob.created_at)
+            < self._stale_before(),
+            SegmentationJob.id.not_in(owned),
+        )
+
+    def run(self, job_id: int) -> None:
+        """Run a queued job to completion, recording its outcome."""
+        db = SessionLocal()
+        # Progress is committed separately from the segmentation's own
+        # transaction, so pollers see it while the job runs
+        status_db = SessionLocal()
+        job = None
+        try:
+            job = status_db.get(SegmentationJob, job_id)
+            if job is None or job.status != "queued":
+                return
+            if job.cancel_requested:
+                self._finish(status_db, job, "cancelled")
+                return
+            # Unless it was cancelled or failed since it was read
+            started = status_db.execute(
+                update(SegmentationJob)
+                .where(
+                    SegmentationJob.id == job_id, SegmentationJob.status == "queued"
+                )
+                .values(status="running", started_at=datetime.now(timezone.utc))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            status_db.commit()
+            if not started:
+                return
+            status_db.refresh(job)
+
+            last_report = 0.0
+
+            def progress(fraction: float, stage: str) -> None:
+                # Throttled within a stage; a new stage, such as "saving",
+                # always checks for cancellation
+                nonlocal last_report
+                now = time.monotonic()
+                if stage == job.stage and now - last_report < self.progress_interval:
+                    return
+                last_report = now
+                status_db.refresh(job)
+                if job.cancel_requested:
+                    raise SegmentationCancelled()
+                job.progress = round(fraction, 3)
+                job.stage = stage
+                status_db.commit()
+
+            result = self._segment(db, job, progress)
+            job.result = json.loads(SegmentationResult(**result).json())
+            job.progress = 1.0
+            job.stage = None
+            self._finish(status_db, job, "succeeded")
+        except SegmentationCancelled:
+            db.rollback()
+            self._finish(status_db, job, "cancelled")
+        except Exception as e:
+            logger.exception(f"Segmentation job {job_id} failed")
+            db.rollback()
+            status_db.rollback()
+            if job is not None:
+                job.error = str(e)
+                self._finish(status_db, job, "failed")
+        finally:
+            db.close()
+            status_db.close()
+
+    @staticmethod
+    def _segment(db: Session, job: SegmentationJob, progress) -> Dict[str, Any]:
+        if job.algorithm in STREAMING_ALGORITHMS:
+            return segmentation_service.segment_stream(
+                db, n_clusters=job.n_clusters, save=True, progress=progress
+            )
+        return segmentation_service.segment_stored(
+            db,
+            algorithm=job.algorithm,
+            n_clusters=job.n_clusters,
+            params=job.params,
+            limit=settings.SEGMENTATION_IN_MEMORY_LIMIT,
+            save=True,
+            progress=progress,
+        )
+
+    def _find(self, db: Session, cache_key: str) -> Optional[SegmentationJob]:
+        """
+        A live job, or a finished one still active, for the key. A live
+        job whose heartbeat is stale is failed, releasing the key.
+        """
+        jobs = db.scalars(
+            select(SegmentationJob)
+            .where(
+                SegmentationJob.cache_key == cache_key,
+                SegmentationJob.status.in_(ACTIVE_STATUSES + ("succeeded",)),
+            )
+            .order_by(SegmentationJob.id.desc())
+        )
+        active_model = db.scalar(
+            select(SegmentationModel.id).where(SegmentationModel.is_active)
+        )
+        with self._lock:
+            in_flight = set(self._futures)
+        for job in jobs:
+            if job.status in ACTIVE_STATUSES:
+                if job.cancel_requested:
+                    continue
+                if job.id in in_flight or not self._is_stale(job):
+                    return job
+                self._abandon(db, "failed", ABANDONED, SegmentationJob.id == job.id)
+            elif job.result.get("model_version") == active_model:
+                return job
+        return None
+
+    def _done(self, job_id: int, future: Future) -> None:
+        with self._lock:
+            self._futures.pop(job_id, None)
+        # `run` records every outcome itself, unless the job never ran (it
+        # was cancelled, such as by `shutdown`) or its worker process died
+        if future.cancelled():
+            status, error = "cancelled", None
+        elif future.exception() is not None:
+            status, error = "failed", f"Worker process failed: {future.exception()}"
+        else:
+            return
+        db = SessionLocal()
+        try:
+            self._abandon(db, status, error, SegmentationJob.id == job_id)
+        except Exception:
+            logger.exception(f"Could not finalize segmentation job {job_id}")
+        finally:
+            db.close()
+
+    def _beat(self) -> None:
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                with self._lock:
+                    owned = list(self._futures)
+                if owned:
+                    db.execute(
+                        update(SegmentationJob)
+                        .where(
+                            SegmentationJob.id.in_(owned),
+                            SegmentationJob.status.in_(ACTIVE_STATUSES),
+                        )
+                        .values(heartbeat_at=datetime.now(timezone.utc))
+                        .execution_options(synchronize_session=False)
+                    )
+                    db.commit()
+                failed = self.fail_abandoned(db)
+                if failed:
+                    logger.warning(f"Failed {failed} abandoned segmentation jobs")
+            except Exception:
+                logger.exception("Segmentation job heartbeat failed")
+                db.rollback()
+            finally:
+                db.close()
+            self._stop.wait(settings.SEGMENTATION_JOB_HEARTBEAT_SECONDS)
+
+    @staticmethod
+    def _stale_before() -> datetime:
+        return datetime.now(timezone.utc) - timedelta(
+            seconds=settings.SEGMENTATION_JOB_STALE_SECONDS
+        )
+
+    def _is_stale(self, job: SegmentationJob) -> bool:
+        seen = job.heartbeat_at or job.created_at
+        if seen is None:
+            return False
+        if seen.tzinfo is None:
+            # SQLite returns naive UTC
+            seen = seen.replace(tzinfo=timezone.utc)
+        return seen < self._stale_before()
+
+    @staticmethod
+    def _abandon(
+        db: Session, status: str, error: Optional[str], *criteria: Any
+    ) -> int:
+        """Finalize the still active jobs matching `criteria`; commits."""
+        finalized = db.execute(
+            update(SegmentationJob)
+            .where(SegmentationJob.status.in_(ACTIVE_STATUSES), *criteria)
+            .values(
+                status=status, error=error, finished_at=datetime.now(timezone.utc)
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        return finalized
+
+    @staticmethod
+    def _finish(db: Session, job: SegmentationJob, status: str) -> None:
+        job.status = status
+        job.finished_at = datetime.now(timezone.utc)
+        db.commit()
+
+
+segmentation_jobs = SegmentationJobService()
@@ -1,12 +1,30 @@
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Callable, Dict, List, Optional
 
 import numpy as np
 import pandas as pd
-from sklearn.cluster import DBSCAN, KMeans
+import scipy.sparse as sp
+from app.core.config import settings
+from app.services.feature_store import prospect_feature_store
+from app.services.prospect_features import prospect_feature_encoder
+from app.services.segment_model_service import segment_model_registry
+from sklearn.cluster import DBSCAN, KMeans, MiniBatchKMeans
 from sklearn.decomposition import PCA
-from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics import silhouette_score
-from sklearn.preprocessing import StandardScaler
+from sklearn.preprocessing import MaxAbsScaler
+from sqlalchemy.orm import Session
+
+
+# Called with the fraction done and the current stage; may raise to abort
+Progress = Callable[[float, str], None]
+
+
+def _no_progress(fraction: float, stage: str) -> None:
+    pass
+
+
+def _column_mean(features: sp.spmatrix) -> np.ndarray:
+    return np.asarray(features.mean(axis=0)).ravel()
 
 
 class SegmentationService:
@@ -41,9 +59,76 @@ class SegmentationService:
 
         # Convert prospect data to features
         features, feature_names = self._extract_features(prospect_data)
+        prospect_ids = [prospect["id"] for prospect in prospect_data]
+        return self.segment_features(
+            prospect_ids, features, feature_names, algorithm, n_clusters, params
+        )
+
+    def segment_stored(
+        self,
+        db: Session,
+        algorithm: str = "kmeans",
+        n_clusters: int = 5,
+        params: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        save: bool = False,
+        progress: Progress = _no_progress,
+    ) -> Dict[str, Any]:
+        """
+        Segment prospects in memory from the feature store, without
+        re-extracting their features.
+
+        Args:
+            limit: Segment only the first `limit` prospects by id
+            save: Register the segmentation as the active model and write
+                segment membership; segment ids are then ProspectSegment ids
+            progress: Reports the fraction done and stage as work proceeds
+
+        Returns:
+            Dictionary containing segmentation results; "stats" reports the
+            rows segmented and whether the prospects were truncated
+        """
+        progress(0.0, "refreshing features")
+        stored = prospect_feature_store.features(db)
+        progress(0.3, "clustering")
+        rows = len(stored.ids) if limit is None else min(limit, len(stored.ids))
+        if not rows:
+            result = self.segment_prospects([], algorithm, n_clusters, params)
+        else:
+            result = self.segment_features(
+                stored.ids[:rows].tolist(),
+                stored.matrix[:rows],
+                stored.feature_names,
+                algorithm,
+                n_clusters,
+                params,
+                db=db if save else None,
+                progress=progress,
+            )
+        result["stats"] = {"rows": rows, "truncated": rows < len(stored.ids)}
+        return result
 
-        # Standardize features
-        scaler = StandardScaler()
+    def segment_features(
+        self,
+        prospect_ids: List[int],
+        features: sp.csr_matrix,
+        feature_names: List[str],
+        algorithm: str = "kmeans",
+        n_clusters: int = 5,
+        params: Optional[Dict[str, Any]] = None,
+        db: Optional[Session] = None,
+        progress: Progress = _no_progress,
+    ) -> Dict[str, Any]:
+        """
+        Segment already encoded prospects; row i belongs to prospect_ids[i].
+        With `db`, the segmentation is registered and membership written.
+
+        Raises:
+            ValueError: If the segmentation is to be saved but has no
+                segments, as when DBSCAN labels every prospect as noise
+        """
+        # Scale features; centering would densify the sparse matrix
+        scaler = MaxAbsScaler()
         scaled_features = scaler.fit_transform(features)
 
         # Perform clustering
@@ -68,95 +153,214 @@ class SegmentationService:
 
         # Create segments
         segments = self._create_segments(
-            prospect_data, clusters, feature_names, scaled_features, cluster_centers
+            prospect_ids, clusters, feature_names, scaled_features, cluster_centers
         )
 
-        return {
+        result = {
             "segments": segments,
             "visualization_data": visualization_data,
             "n_clusters": n_clusters,
             "algorithm": algorithm,
         }
+        if db is not None:
+            if not segments:
+                # Nothing to assign new prospects to; keep the active model
+                raise ValueError(
+                    "No clusters found: every prospect was labelled as noise. "
+                    "Try a larger eps or a smaller min_samples."
+                )
+            progress(0.9, "saving")
+            # DBSCAN and hierarchical centers are means; noise has none
+            labels = np.asarray(clusters)
+            centers = np.vstack(
+                [
+                    _column_mean(scaled_features[labels == segment["segment_id"]])
+                    for segment in segments
+                ]
+            )
+            self._save(
+                db, result, params, scaler, np.asarray(prospect_ids), labels, centers
+            )
+        return result
 
-    def _extract_features(self, prospect_data: List[Dict[str, Any]]) -> tuple:
-        """Extract numerical and categorical features from prospect data."""
-        # Create a DataFrame from prospect data
-        df = pd.DataFrame(prospect_data)
+    def segment_stream(
+        self,
+        db: Session,
+        n_clusters: int = 5,
+        chunk_size: Optional[int] = None,
+        sample_size: Optional[int] = None,
+        save: bool = False,
+        progress: Progress = _no_progress,
+    ) -> Dict[str, Any]:
+        """
+        Segment every prospect with MiniBatchKMeans, a chunk at a time.
 
-        # Handle missing values
-        df = df.fillna(
-            {
-                "company_size": "unknown",
-                "industry": "unknown",
-                "job_title": "unknown",
-                "seniority": "unknown",
-                "location": "unknown",
-            }
-        )
+        Features come from the feature store, which is refreshed first.
+        A random sample of rows seeds the centers; the memory-mapped matrix
+        is then read `chunk_size` rows at a time, twice: the first pass
+        refines the centers with `partial_fit`, the second assigns labels
+        and accumulates per-segment sizes and feature sums. Memory depends
+        on the chunk and sample size, not on the number of prospects.
 
-        # Extract numerical features
-        numerical_features = []
-
-        # Convert company size to numerical value
-        size_mapping = {
-            "unknown": 0,
-            "1-10": 1,
-            "11-50": 2,
-            "51-200": 3,
-            "201-500": 4,
-            "501-1000": 5,
-            "1001-5000": 6,
-            "5001-10000": 7,
-            "10001+": 8,
-        }
+        Args:
+            save: Register the segmentation as the active model and write
+                segment membership; segment ids are then ProspectSegment ids
+            progress: Reports the fraction done and stage after every chunk
 
-        if "company_size" in df.columns:
-            df["company_size_num"] = df["company_size"].map(
-                lambda x: size_mapping.get(x, 0)
+        Returns:
+            Dictionary in the `SegmentationResult` format; segments carry
+            sizes but not member lists, and "stats" reports rows processed,
+            seconds per million rows and the feature store refresh
+        """
+        chunk_size = chunk_size or settings.SEGMENTATION_CHUNK_SIZE
+        sample_size = sample_size or settings.SEGMENTATION_SAMPLE_SIZE
+        started = time.perf_counter()
+
+        progress(0.0, "refreshing features")
+        refresh = prospect_feature_store.refresh(db)
+        stored = prospect_feature_store.load()
+        rows = len(stored.ids)
+        if not rows:
+            return {
+                "segments": [],
+                "visualization_data": {},
+                "n_clusters": 0,
+                "algorithm": "minibatch_kmeans",
+                "stats": {
+                    "rows": 0,
+                    "seconds": 0.0,
+                    "seconds_per_million": None,
+                    "refresh": refresh,
+                },
+            }
+        clustering_started = time.perf_counter()
+        matrix = stored.matrix
+        # Max-abs scaling only reads the stored values, never densifies
+        scaler = MaxAbsScaler().fit(matrix)
+        rng = np.random.default_rng(42)
+        sample_rows = np.sort(rng.choice(rows, min(sample_size, rows), replace=False))
+        scaled_sample = scaler.transform(matrix[sample_rows])
+        n_clusters = min(n_clusters, len(sample_rows))
+        model = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, n_init=3)
+        model.partial_fit(scaled_sample)
+
+        # Pass 1: refine the centers
+        for start in range(0, rows, chunk_size):
+            progress(0.2 + 0.4 * start / rows, "fitting")
+            model.partial_fit(scaler.transform(matrix[start : start + chunk_size]))
+
+        # Pass 2: assign labels and accumulate segment statistics
+        sizes = np.zeros(n_clusters, dtype=np.int64)
+        sums = np.zeros((n_clusters, matrix.shape[1]))
+        all_labels = np.empty(rows, dtype=np.int32) if save else None
+        for start in range(0, rows, chunk_size):
+            progress(0.6 + 0.3 * start / rows, "assigning")
+            features = scaler.transform(matrix[start : start + chunk_size])
+            labels = model.predict(features)
+            if save:
+                all_labels[start : start + len(labels)] = labels
+            sizes += np.bincount(labels, minlength=n_clusters)
+            membership = sp.csr_matrix(
+                (np.ones(len(labels)), (labels, np.arange(len(labels)))),
+                shape=(n_clusters, len(labels)),
             )
-            numerical_features.append("company_size_num")
-
-        # Convert seniority to numerical value
-        seniority_mapping = {
-            "unknown": 0,
-            "entry": 1,
-            "junior": 2,
-            "mid": 3,
-            "senior": 4,
-            "executive": 5,
-            "c-level": 6,
-        }
+            sums += (membership @ features).toarray()
 
-        if "seniority" in df.columns:
-            df["seniority_num"] = df["seniority"].map(
-                lambda x: seniority_mapping.get(x, 0)
+        overall_mean = sums.sum(axis=0) / rows
+        segments = []
+        # A center that attracted no prospects is not a segment
+        for cluster_id in np.flatnonzero(sizes).tolist():
+            center = model.cluster_centers_[cluster_id]
+            top_features_idx = np.argsort(np.abs(center - overall_mean))[-3:]
+            top_features = [stored.feature_names[i] for i in top_features_idx]
+            segments.append(
+                {
+                    "segment_id": cluster_id,
+                    "name": f"Segment {cluster_id + 1}",
+                    "description": f"Characterized by {', '.join(top_features)}",
+                    "size": int(sizes[cluster_id]),
+                    "prospects": None,
+                }
             )
-            numerical_features.append("seniority_num")
-
-        # Process categorical features using TF-IDF
-        categorical_features = ["industry", "job_title", "location"]
-        categorical_features = [f for f in categorical_features if f in df.columns]
-
-        tfidf_features = []
-        feature_names = numerical_features.copy()
-
-        for feature in categorical_features:
-            vectorizer = TfidfVectorizer(max_features=10)
-            tfidf = vectorizer.fit_transform(df[feature].astype(str))
-            tfidf_df = pd.DataFrame(
-                tfidf.toarray(),
-                columns=[
-                    f"{feature}_{term}" for term in vectorizer.get_feature_names_out()
-                ],
+
+        visualization_data = self._create_visualization_data(
+            scaled_sample, model.predict(scaled_sample), model.cluster_centers_
+        )
+        result = {
+            "segments": segments,
+            "visualization_data": visualization_data,
+            "n_clusters": len(segments),
+            "algorithm": "minibatch_kmeans",
+        }
+        clustering_finished = time.perf_counter()
+        if save:
+            progress(0.9, "saving")
+            self._save(
+                db,
+                result,
+                None,
+                scaler,
+                np.asarray(stored.ids),
+                all_labels,
+                model.cluster_centers_[np.flatnonzero(sizes)],
             )
-            df = pd.concat([df, tfidf_df], axis=1)
-            tfidf_features.extend(tfidf_df.columns)
-            feature_names.extend(tfidf_df.columns)
+        finished = time.perf_counter()
+        result["stats"] = {
+            "rows": rows,
+            "seconds": round(finished - started, 3),
+            "seconds_per_million": round(
+                (clustering_finished - clustering_started) / rows * 1e6, 2
+            ),
+            "refresh": refresh,
+        }
+        if save:
+            result["stats"]["save_seconds"] = round(finished - clustering_finished, 3)
+        return result
 
-        # Combine numerical and TF-IDF features
-        features = df[numerical_features + tfidf_features].values
+    def _save(
+        self,
+        db: Session,
+        result: Dict[str, Any],
+        params: Optional[Dict[str, Any]],
+        scaler: MaxAbsScaler,
+        prospect_ids: np.ndarray,
+        labels: np.ndarray,
+        centers: np.ndarray,
+    ) -> None:
+        """
+        Register a segmentation and point its segments at the stored rows.
+
+        `centers` holds one row per entry of result["segments"], whose
+        cluster ids index `labels`.
+        """
+        segments = result["segments"]
+        # Group prospect ids by label with one sort
+        order = np.argsort(labels, kind="stable")
+        sorted_labels = labels[order]
+        clusters = [segment["segment_id"] for segment in segments]
+        starts = np.searchsorted(sorted_labels, clusters, side="left")
+        ends = np.searchsorted(sorted_labels, clusters, side="right")
+        members = [
+            prospect_ids[order[start:end]] for start, end in zip(starts, ends)
+        ]
+        model, segment_ids = segment_model_registry.register(
+            db,
+            algorithm=result["algorithm"],
+            params=params,
+            scale=scaler.scale_,
+            centers=centers,
+            segments=segments,
+            members=members,
+        )
+        for segment, segment_id in zip(segments, segment_ids):
+            segment["segment_id"] = segment_id
+        result["model_version"] = model.id
 
-        return features, feature_names
+    def _extract_features(self, prospect_data: List[Dict[str, Any]]) -> tuple:
+        """Extract numerical and categorical features from prospect data."""
+        df = pd.DataFrame(prospect_data)
+        encoder = prospect_feature_encoder
+        return encoder.transform(df), encoder.feature_names(df)
 
     def _kmeans_clustering(self, features, n_clusters):
         """Perform K-means clustering."""
@@ -179,11 +383,11 @@ class SegmentationService:
         for cluster_id in unique_clusters:
             if cluster_id == -1:  # Noise points
                 # Use the mean of all points as the center for noise
-                cluster_centers.append(np.mean(features, axis=0))
+                cluster_centers.append(_column_mean(features))
             else:
                 # Use the mean of points in this cluster
                 cluster_mask = clusters == cluster_id
-                cluster_centers.append(np.mean(features[cluster_mask], axis=0))
+                cluster_centers.append(_column_mean(features[cluster_mask]))
 
         return clusters, np.array(cluster_centers)
 
@@ -192,13 +396,14 @@ class SegmentationService:
         from sklearn.cluster import AgglomerativeClustering
 
         hierarchical = AgglomerativeClustering(n_clusters=n_clusters)
-        clusters = hierarchical.fit_predict(features)
+        # Ward linkage needs dense input
+        clusters = hierarchical.fit_predict(features.toarray())
 
         # Compute cluster centers
         cluster_centers = []
         for i in range(n_clusters):
             cluster_mask = clusters == i
-            cluster_centers.append(np.mean(features[cluster_mask], axis=0))
+            cluster_centers.append(_column_mean(features[cluster_mask]))
 
         return clusters, np.array(cluster_centers)
 
@@ -243,7 +448,7 @@ class SegmentationService:
         }
 
     def _create_segments(
-        self, prospect_data, clusters, feature_names, scaled_features, cluster_centers
+        self, prospect_ids, clusters, feature_names, scaled_features, cluster_centers
     ):
         """Create segment descriptions based on clustering results."""
         unique_clusters = sorted(set(clusters))
@@ -264,7 +469,7 @@ class SegmentationService:
                 center = cluster_centers[cluster_id if cluster_id != -1 else 0]
 
                 # Find the most important features for this cluster
-                feature_importance = np.abs(center - np.mean(scaled_features, axis=0))
+                feature_importance = np.abs(center - _column_mean(scaled_features))
                 top_features_idx = np.argsort(feature_importance)[-3:]  # Top 3 features
 
                 # Create segment name and description
@@ -275,7 +480,7 @@ class SegmentationService:
                 description = f"Characterized by {', '.join(top_features)}"
 
                 # Get prospect IDs in this segment
-                prospect_ids = [prospect_data[i]["id"] for i in cluster_indices]
+                segment_prospect_ids = [prospect_ids[i] for i in cluster_indices]
 
                 segments.append(
                     {
@@ -283,7 +488,7 @@ class SegmentationService:
                         "name": name,
                         "description": description,
                         "size": size,
-                        "prospects": prospect_ids,
+                        "prospects": segment_prospect_ids,
                     }
                 )
 
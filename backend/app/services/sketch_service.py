@@ -0,0 +1,272 @@
+import math
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from app.core.config import settings
+from app.models.analytics import EngagementSketch
+from app.models.campaign import Campaign
+from app.models.email import Email
+from sqlalchemy import Date, bindparam, cast, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+# (day, scope, scope id, metric)
+SketchKey = Tuple[date, str, int, str]
+
+SKETCH_METRICS = ("sent", "opened", "clicked")
+
+
+def splitmix64(values: np.ndarray) -> np.ndarray:
+    """Vectorized SplitMix64 finalizer: a fast, well-mixed 64-bit hash of integers."""
+    z = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def bit_length(values: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `int.bit_length` of uint64 values. frexp of a float64 is only
+    exact below 2**53, so each 32-bit half is converted on its own.
+    """
+    high = values >> np.uint64(32)
+    _, high_bits = np.frexp(high.astype(np.float64))
+    _, low_bits = np.frexp((values & np.uint64(0xFFFFFFFF)).astype(np.float64))
+    return np.where(high > 0, high_bits + 32, low_bits)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter over integer ids.
+
+    Uses 2**precision one-byte registers regardless of how many ids are
+    added; two sketches merge by taking the register-wise maximum, so
+    per-day and per-worker sketches can be combined losslessly.
+    """
+
+    def __init__(
+        self, precision: Optional[int] = None, registers: Optional[bytes] = None
+    ):
+        self.precision = precision or settings.HLL_PRECISION
+        self.m = 1 << self.precision
+        if registers is not None:
+            self.registers = np.frombuffer(registers, dtype=np.uint8).copy()
+            if len(self.registers) != self.m:
+                raise ValueError("Register count does not match precision")
+        else:
+            self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add_many(self, values: Sequence[int]) -> None:
+        """Add integer ids; adding an id more than once has no effect."""
+        values = np.asarray(values, dtype=np.uint64)
+        if len(values) == 0:
+            return
+        hashed = splitmix64(values)
+        index = (hashed >> np.uint64(64 - self.precision)).astype(np.intp)
+        # The rank is the position of the first set bit of the remaining bits
+        rest = hashed & np.uint64((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision + 1 - bit_length(rest)).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.m != self.m:
+            raise ValueError("Cannot merge sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        """Estimated number of distinct ids added."""
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        harmonic = np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        estimate = alpha * self.m * self.m / harmonic
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    @property
+    def standard_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def to_bytes(self) -> bytes:
+        return self.registers.tobytes()
+
+
+class SketchService:
+    """
+    Unique-prospect counts per campaign and per template, per day, kept as
+    HyperLogLog sketches in `engagement_sketches`.
+
+    Ingestion builds sketches in memory for a batch (a tracking flush or a
+    batch of sends) and merges them into the stored rows under row locks,
+    so concurrent workers never lose each other's updates. Reads merge the
+    daily sketches of a date range, so memory and error are constant no
+    matter how many events were ingested.
+    """
+
+    def __init__(self, precision: Optional[int] = None):
+        self.precision = precision or settings.HLL_PRECISION
+
+    @property
+    def standard_error(self) -> float:
+        """Relative standard error of the unique counts."""
+        return 1.04 / math.sqrt(1 << self.precision)
+
+    def add(
+        self,
+        db: Session,
+        rows: Iterable[Tuple[date, Optional[int], Optional[int], str, int]],
+    ) -> int:
+        """
+        Add prospects to the sketches of their campaign and template.
+
+        Does not commit; call it inside the ingesting transaction.
+
+        Args:
+            rows: (day, campaign id, template id, metric, prospect id) tuples
+
+        Returns:
+            Number of sketch rows updated
+        """
+        grouped: Dict[SketchKey, List[int]] = {}
+        for day, campaign_id, template_id, metric, prospect_id in rows:
+            if campaign_id:
+                key = (day, "campaign", campaign_id, metric)
+                grouped.setdefault(key, []).append(prospect_id)
+            if template_id:
+                key = (day, "template", template_id, metric)
+                grouped.setdefault(key, []).append(prospect_id)
+        if not grouped:
+            return 0
+
+        # Sorted keys give every worker the same lock order
+        keys = sorted(grouped)
+        empty = bytes(1 << self.precision)
+        db.execute(
+            insert(EngagementSketch)
+            .values(
+                [
+                    {
+                        "day": day,
+                        "scope": scope,
+                        "scope_id": scope_id,
+                        "metric": metric,
+                        "registers": empty,
+                    }
+                    for day, scope, scope_id, metric in keys
+                ]
+            )
+            .on_conflict_do_nothing()
+        )
+        key_columns = tuple_(
+            EngagementSketch.day,
+            EngagementSketch.scope,
+            EngagementSketch.scope_id,
+            EngagementSketch.metric,
+        )
+        stored = db.execute(
+            select(
+                EngagementSketch.day,
+                EngagementSketch.scope,
+                EngagementSketch.scope_id,
+                EngagementSketch.metric,
+                EngagementSketch.registers,
+            )
+            .where(key_columns.in_(keys))
+            .order_by(
+                EngagementSketch.day,
+                EngagementSketch.scope,
+                EngagementSketch.scope_id,
+                EngagementSketch.metric,
+            )
+            .with_for_update()
+        ).all()
+
+        table = EngagementSketch.__table__
+        updates = []
+        for day, scope, scope_id, metric, registers in stored:
+            sketch = HyperLogLog(self.precision, registers)
+            before = sketch.registers.copy()
+            sketch.add_many(grouped[(day, scope, scope_id, metric)])
+            if not np.array_equal(before, sketch.registers):
+                updates.append(
+                    {
+                        "_day": day,
+                        "_scope": scope,
+                        "_scope_id": scope_id,
+                        "_metric": metric,
+                        "_registers": sketch.to_bytes(),
+                    }
+                )
+        if updates:
+            db.execute(
+                update(table)
+                .where(
+                    table.c.day == bindparam("_day"),
+                    table.c.scope == bindparam("_scope"),
+                    table.c.scope_id == bindparam("_scope_id"),
+                    table.c.metric == bindparam("_metric"),
+                )
+                .values(registers=bindparam("_registers"), updated_at=func.now()),
+                updates,
+            )
+        return len(updates)
+
+    def record_sends(self, db: Session, email_ids: Iterable[int]) -> int:
+        """Add the prospects of freshly sent emails to the "sent" sketches."""
+        email_ids = list(email_ids)
+        if not email_ids:
+            return 0
+        rows = db.execute(
+            select(
+                cast(func.timezone("UTC", Email.sent_at), Date),
+                Email.campaign_id,
+                func.coalesce(Email.template_id, Campaign.template_id),
+                Email.prospect_id,
+            )
+            .outerjoin(Campaign, Campaign.id == Email.campaign_id)
+            .where(Email.id.in_(email_ids), Email.sent_at.isnot(None))
+        ).all()
+        return self.add(
+            db,
+            (
+                (day, campaign_id, template_id, "sent", prospect_id)
+                for day, campaign_id, template_id, prospect_id in rows
+            ),
+        )
+
+    def unique_counts(
+        self,
+        db: Session,
+        scope: str,
+        scope_id: int,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> Dict[str, int]:
+        """
+        Estimated distinct prospects per metric for a campaign or template
+        over a date range.
+        """
+        criteria = [
+            EngagementSketch.scope == scope,
+            EngagementSketch.scope_id == scope_id,
+        ]
+        if start is not None:
+            criteria.append(EngagementSketch.day >= start)
+        if end is not None:
+            criteria.append(EngagementSketch.day <= end)
+        merged = {metric: HyperLogLog(self.precision) for metric in SKETCH_METRICS}
+        rows = db.execute(
+            select(EngagementSketch.metric, EngagementSketch.registers).where(
+                *criteria
+            )
+        )
+        for metric, registers in rows:
+            if metric in merged:
+                merged[metric].merge(HyperLogLog(self.precision, registers))
+        return {metric: sketch.count() for metric, sketch in merged.items()}
+
+
+sketch_service = SketchService()
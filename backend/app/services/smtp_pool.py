@@ -0,0 +1,253 @@
+import smtplib
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from app.core.config import settings
+
+
+class PooledConnection:
+    """An authenticated SMTP session owned by a SMTPConnectionPool."""
+
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        self.messages_sent = 0
+
+    def close(self) -> None:
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+
+class SMTPConnectionPool:
+    """
+    Bounded, thread-safe pool of authenticated SMTP sessions.
+
+    Connections are handed out LIFO so that a small working set stays warm.
+    A connection that has been idle longer than `noop_interval` is
+    health-checked with NOOP before reuse, and connections are recycled once
+    they have sent `max_messages` messages or are older than `max_age` seconds.
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        use_tls: Optional[bool] = None,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        max_size: Optional[int] = None,
+        max_messages: Optional[int] = None,
+        max_age: Optional[float] = None,
+        noop_interval: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.host = host if host is not None else settings.SMTP_HOST
+        self.port = port if port is not None else settings.SMTP_PORT
+        self.use_tls = use_tls if use_tls is not None else settings.SMTP_TLS
+        self.user = user if user is not None else settings.SMTP_USER
+        self.password = password if password is not None else settings.SMTP_PASSWORD
+        self.max_size = max_size or settings.SMTP_POOL_SIZE
+        self.max_messages = max_messages or settings.SMTP_POOL_MAX_MESSAGES
+        self.max_age = max_age or settings.SMTP_POOL_MAX_AGE
+        self.noop_interval = (
+            noop_interval
+            if noop_interval is not None
+            else settings.SMTP_POOL_NOOP_INTERVAL
+        )
+        self.timeout = timeout or settings.SMTP_POOL_TIMEOUT
+
+        self._idle: Deque[PooledConnection] = deque()
+        self._open = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # Metrics
+        self._checkouts = 0
+        self._reuses = 0
+        self._created = 0
+        self._recycled = 0
+        self._failed_health_checks = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _connect(self) -> PooledConnection:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        return PooledConnection(server)
+
+    def _is_expired(self, conn: PooledConnection, now: float) -> bool:
+        return (
+            conn.messages_sent >= self.max_messages
+            or now - conn.created_at >= self.max_age
+        )
+
+    def _is_healthy(self, conn: PooledConnection, now: float) -> bool:
+        if now - conn.last_used_at < self.noop_interval:
+            return True
+        try:
+            code, _ = conn.server.noop()
+        except smtplib.SMTPException:
+            return False
+        except OSError:
+            return False
+        return code == 250
+
+    def acquire(self) -> PooledConnection:
+        """
+        Check a connection out of the pool, opening a new one if the pool
+        is below `max_size`, otherwise blocking for up to `timeout` seconds.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("SMTP connection pool is closed")
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(
+                            "Timed out waiting for an SMTP connection from the pool"
+                        )
+                    self._cond.wait(remaining)
+                conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    # Reserve a slot before connecting outside the lock
+                    self._open += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+                self._record_checkout(started, reused=False)
+                return conn
+
+            now = time.monotonic()
+            if self._is_expired(conn, now):
+                self._discard(conn, recycled=True)
+                continue
+            if not self._is_healthy(conn, now):
+                with self._cond:
+                    self._failed_health_checks += 1
+                self._discard(conn)
+                continue
+            self._record_checkout(started, reused=True)
+            return conn
+
+    def release(self, conn: PooledConnection, broken: bool = False) -> None:
+        """Return a connection to the pool, or close it if it is broken or expired."""
+        conn.last_used_at = time.monotonic()
+        if broken:
+            self._discard(conn)
+            return
+        if self._is_expired(conn, conn.last_used_at):
+            self._discard(conn, recycled=True)
+            return
+        with self._cond:
+            if self._closed:
+                self._open -= 1
+                close_now = True
+            else:
+                self._idle.append(conn)
+                close_now = False
+            self._cond.notify()
+        if close_now:
+            conn.close()
+
+    def sendmail(self, from_addr: str, to_addrs: list, msg: Any) -> Dict[str, Any]:
+        """
+        Send a message over a pooled connection.
+
+        A connection that the server dropped since its last health check is
+        discarded and the send is retried once on a fresh connection.
+        """
+        for attempt in range(2):
+            conn = self.acquire()
+            try:
+                refused = conn.server.sendmail(from_addr, to_addrs, msg)
+            except smtplib.SMTPServerDisconnected:
+                self.release(conn, broken=True)
+                if attempt:
+                    raise
+                continue
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused):
+                # The session itself is still usable
+                self.release(conn)
+                raise
+            except Exception:
+                self.release(conn, broken=True)
+                raise
+            conn.messages_sent += 1
+            self.release(conn)
+            return refused
+        raise smtplib.SMTPServerDisconnected("SMTP connection lost")
+
+    def close(self) -> None:
+        """Close all idle connections and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool size, wait time and reuse metrics."""
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "max_size": self.max_size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+                "checkouts": checkouts,
+                "connections_created": self._created,
+                "connections_recycled": self._recycled,
+                "failed_health_checks": self._failed_health_checks,
+                "reuse_ratio": self._reuses / checkouts if checkouts else 0.0,
+                "avg_wait_ms": self._total_wait / checkouts * 1000 if checkouts else 0.0,
+                "max_wait_ms": self._max_wait * 1000,
+            }
+
+    def _record_checkout(self, started: float, reused: bool) -> None:
+        waited = time.monotonic() - started
+        with self._cond:
+            self._checkouts += 1
+            if reused:
+                self._reuses += 1
+            else:
+                self._created += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+    def _release_slot(self) -> None:
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def _discard(self, conn: PooledConnection, recycled: bool = False) -> None:
+        conn.close()
+        with self._cond:
+            self._open -= 1
+            if recycled:
+                self._recycled += 1
+            self._cond.notify()
@@ -0,0 +1,303 @@
+import html
+import logging
+import re
+import threading
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.security import create_tracking_token
+from app.db.session import SessionLocal
+from app.models.campaign import Campaign
+from app.models.email import Email, EmailEvent, EmailEventTypeEnum, EmailStatusEnum
+from app.services.analytics_service import analytics_service
+from app.services.sketch_service import sketch_service
+from sqlalchemy import (
+    DateTime,
+    Integer,
+    case,
+    column,
+    func,
+    insert,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# href attributes of anchors pointing at http(s) URLs
+_LINK_RE = re.compile(
+    r"""(<a\b[^>]*?\bhref\s*=\s*)(["'])(https?://[^"']+)\2""", re.IGNORECASE
+)
+_BODY_CLOSE_RE = re.compile(r"</body\s*>", re.IGNORECASE)
+
+
+class TrackingService:
+    """
+    In-memory buffer for open/click events.
+
+    Tracking requests only append to the buffer. A background thread
+    flushes it every `flush_interval` seconds, or as soon as `flush_size`
+    events are waiting, with one multi-row INSERT into `email_events`, one
+    set-based UPDATE of `opened_at`/`clicked_at` per event type, the
+    matching rollup increments and a merge into the unique-engagement
+    sketches.
+
+    Loss is bounded: a crash loses at most one flush interval of events,
+    and once `max_buffer` events are waiting (e.g. while the database is
+    down) new events are dropped and counted instead of exhausting memory.
+    """
+
+    def __init__(
+        self,
+        flush_interval: Optional[float] = None,
+        flush_size: Optional[int] = None,
+        max_buffer: Optional[int] = None,
+    ):
+        self.flush_interval = flush_interval or settings.TRACKING_FLUSH_INTERVAL
+        self.flush_size = flush_size or settings.TRACKING_FLUSH_SIZE
+        self.max_buffer = max_buffer or settings.TRACKING_MAX_BUFFER
+
+        self._events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Metrics
+        self.recorded = 0
+        self.flushed = 0
+        self.dropped = 0
+
+    def record(
+        self,
+        email_id: int,
+        event_type: EmailEventTypeEnum,
+        url: Optional[str] = None,
+        user_agent: Optional[str] = None,
+        ip_address: Optional[str] = None,
+    ) -> bool:
+        """
+        Buffer a tracking event.
+
+        Returns:
+            False if the event was dropped because the buffer is full
+        """
+        event = {
+            "email_id": email_id,
+            "event_type": event_type,
+            "url": url,
+            "user_agent": user_agent[:512] if user_agent else None,
+            "ip_address": ip_address,
+            "occurred_at": datetime.now(timezone.utc),
+        }
+        with self._lock:
+            if len(self._events) >= self.max_buffer:
+                self.dropped += 1
+                return False
+            self._events.append(event)
+            self.recorded += 1
+            pending = len(self._events)
+        if pending >= self.flush_size:
+            self._wakeup.set()
+        return True
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="tracking-flusher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flusher thread and flush whatever is still buffered."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = len(self._events)
+        return {
+            "pending": pending,
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush tracking events")
+
+    def flush(self) -> int:
+        """Write all buffered events to the database. Returns the number written."""
+        with self._lock:
+            events, self._events = self._events, []
+        if not events:
+            return 0
+
+        db = SessionLocal()
+        try:
+            written = self._write(db, events)
+        except Exception:
+            db.rollback()
+            # Put the batch back, within the buffer bound, to retry next flush
+            with self._lock:
+                room = max(self.max_buffer - len(self._events), 0)
+                self.dropped += max(len(events) - room, 0)
+                self._events[:0] = events[:room]
+            raise
+        finally:
+            db.close()
+        self.flushed += written
+        return written
+
+    def _write(self, db: Session, events: List[Dict[str, Any]]) -> int:
+        # Events for emails that don't exist would fail the whole INSERT
+        known = {
+            row.id: row
+            for row in db.execute(
+                select(
+                    Email.id,
+                    Email.prospect_id,
+                    Email.campaign_id,
+                    func.coalesce(Email.template_id, Campaign.template_id).label(
+                        "template_id"
+                    ),
+                )
+                .outerjoin(Campaign, Campaign.id == Email.campaign_id)
+                .where(Email.id.in_({event["email_id"] for event in events}))
+            )
+        }
+        events = [event for event in events if event["email_id"] in known]
+        if not events:
+            return 0
+
+        db.execute(insert(EmailEvent).values(events))
+        sketch_service.add(db, self._sketch_rows(events, known))
+
+        first_open: Dict[int, datetime] = {}
+        first_click: Dict[int, datetime] = {}
+        for event in events:
+            if event["event_type"] == EmailEventTypeEnum.CLICK:
+                first = first_click
+            else:
+                first = first_open
+            email_id = event["email_id"]
+            if email_id not in first or event["occurred_at"] < first[email_id]:
+                first[email_id] = event["occurred_at"]
+
+        # A click implies the message was opened
+        for email_id, occurred_at in first_click.items():
+            if email_id not in first_open or occurred_at < first_open[email_id]:
+                first_open[email_id] = occurred_at
+
+        if first_open:
+            v = self._first_seen(first_open)
+            opened = db.execute(
+                update(Email)
+                .where(Email.id == v.c.email_id, Email.opened_at.is_(None))
+                .values(
+                    opened_at=v.c.occurred_at,
+                    status=case(
+                        (Email.status == EmailStatusEnum.SENT, EmailStatusEnum.OPENED),
+                        else_=Email.status,
+                    ),
+                )
+                .returning(Email.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            analytics_service.record(db, opened, "opened")
+        if first_click:
+            v = self._first_seen(first_click)
+            clicked = db.execute(
+                update(Email)
+                .where(Email.id == v.c.email_id, Email.clicked_at.is_(None))
+                .values(
+                    clicked_at=v.c.occurred_at,
+                    status=case(
+                        (
+                            Email.status.in_(
+                                [EmailStatusEnum.SENT, EmailStatusEnum.OPENED]
+                            ),
+                            EmailStatusEnum.CLICKED,
+                        ),
+                        else_=Email.status,
+                    ),
+                )
+                .returning(Email.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            analytics_service.record(db, clicked, "clicked")
+        db.commit()
+        return len(events)
+
+    def instrument_html(
+        self,
+        body: str,
+        email_id: int,
+        track_opens: bool = True,
+        track_clicks: bool = True,
+    ) -> str:
+        """
+        Rewrite an HTML body for tracking: links go through the signed click
+        redirect and an open pixel is appended.
+        """
+        base_url = settings.TRACKING_BASE_URL.rstrip("/")
+        if track_clicks:
+
+            def rewrite(match: "re.Match") -> str:
+                url = html.unescape(match.group(3))
+                token = create_tracking_token(email_id, url)
+                quote = match.group(2)
+                return f"{match.group(1)}{quote}{base_url}/t/c/{token}{quote}"
+
+            body = _LINK_RE.sub(rewrite, body)
+        if track_opens:
+            pixel = (
+                f'<img src="{base_url}/t/o/{create_tracking_token(email_id)}.gif" '
+                'width="1" height="1" alt="" style="display:none">'
+            )
+            body, replaced = _BODY_CLOSE_RE.subn(pixel + "</body>", body, count=1)
+            if not replaced:
+                body += pixel
+        return body
+
+    @staticmethod
+    def _sketch_rows(
+        events: List[Dict[str, Any]], emails: Dict[int, Any]
+    ) -> Iterator[Tuple[date, Optional[int], Optional[int], str, int]]:
+        """Every event, repeats included; the sketches count each prospect once."""
+        for event in events:
+            email = emails[event["email_id"]]
+            day = event["occurred_at"].astimezone(timezone.utc).date()
+            row = (day, email.campaign_id, email.template_id)
+            # A click implies the message was opened
+            yield (*row, "opened", email.prospect_id)
+            if event["event_type"] == EmailEventTypeEnum.CLICK:
+                yield (*row, "clicked", email.prospect_id)
+
+    @staticmethod
+    def _first_seen(first: Dict[int, datetime]):
+        """VALUES list of (email_id, occurred_at) to join the UPDATE against."""
+        return values(
+            column("email_id", Integer),
+            column("occurred_at", DateTime(timezone=True)),
+            name="first_seen",
+        ).data(list(first.items()))
+
+
+tracking_service = TrackingService()
@@ -0,0 +1,131 @@
+import logging
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.security import tracking_key
+from app.db.session import SessionLocal
+from app.services.email_service import email_service
+from app.services.message_builder import MessageSkeleton
+from app.services.outbox_service import outbox_service
+from app.services.rate_limiter import rate_limiter
+from app.services.scheduler_service import send_scheduler
+from app.services.tracking_service import tracking_service
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxWorker:
+    """
+    Claims batches from the email outbox and sends them through the pooled
+    `EmailService`. Run as many of these as needed, on as many nodes as
+    needed: `python -m app.workers.outbox_worker`.
+    """
+
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        concurrency: Optional[int] = None,
+    ):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.poll_interval = poll_interval or settings.OUTBOX_POLL_INTERVAL
+        self.concurrency = concurrency or settings.SMTP_POOL_SIZE
+        self._skeleton = MessageSkeleton(
+            settings.EMAILS_FROM_EMAIL, from_name=settings.EMAILS_FROM_NAME
+        )
+        self._stop = threading.Event()
+
+    def stop(self, *args: Any) -> None:
+        self._stop.set()
+
+    def run_forever(self) -> None:
+        # Sent links must verify in the API, so refuse to start without the key
+        tracking_key()
+        logger.info(f"Outbox worker {self.worker_id} started")
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while not self._stop.is_set():
+                try:
+                    processed = self.run_once(executor)
+                except Exception:
+                    logger.exception("Outbox batch failed")
+                    processed = 0
+                if not processed:
+                    self._stop.wait(self.poll_interval)
+        email_service.close()
+        logger.info(f"Outbox worker {self.worker_id} stopped")
+
+    def run_once(self, executor: ThreadPoolExecutor) -> int:
+        """Claim, send and settle one batch. Returns the number of rows claimed."""
+        db = SessionLocal()
+        try:
+            batch = outbox_service.claim_batch(
+                db, self.worker_id, batch_size=self.batch_size
+            )
+            if not batch:
+                return 0
+
+            # Throttled rows go straight back to the queue with a later
+            # available_at, so the next claim picks up other domains instead
+            allowed, deferred = rate_limiter.acquire(db, batch)
+            outbox_service.defer(db, self.worker_id, deferred)
+
+            results = list(executor.map(self._send, allowed))
+            sent = [item for item, error in zip(allowed, results) if error is None]
+            failed = []
+            for item, error in zip(allowed, results):
+                if error is not None:
+                    item["error"] = error
+                    failed.append(item)
+
+            outbox_service.complete(db, self.worker_id, sent)
+            outbox_service.fail(db, self.worker_id, failed)
+            send_scheduler.create_follow_ups(db, [item["email_id"] for item in sent])
+            logger.info(
+                f"Sent {len(sent)} emails, {len(failed)} failed, "
+                f"{len(deferred)} deferred by rate limits"
+            )
+            return len(batch)
+        finally:
+            db.close()
+
+    def _send(self, item: Dict[str, Any]) -> Optional[str]:
+        """Send one claimed email. Returns an error message on failure."""
+        if not item["to_email"]:
+            return "Email or prospect no longer exists"
+        msg = self._skeleton.build(
+            to_email=item["to_email"],
+            to_name=item["to_name"],
+            subject=item["subject"],
+            body=tracking_service.instrument_html(
+                item["body"],
+                item["email_id"],
+                track_opens=item["track_opens"],
+                track_clicks=item["track_clicks"],
+            ),
+        )
+        try:
+            email_service.pool.sendmail(
+                self._skeleton.from_email, [item["to_email"]], msg
+            )
+        except Exception as e:
+            return str(e) or e.__class__.__name__
+        return None
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    worker = OutboxWorker()
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run_forever()
+
+
+if __name__ == "__main__":
+    main()
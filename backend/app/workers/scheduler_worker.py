@@ -0,0 +1,67 @@
+import logging
+import signal
+import threading
+import time
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.ab_testing_service import ab_test_engine
+from app.services.scheduler_service import send_scheduler
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerWorker:
+    """
+    Drives `send_scheduler`: releases emails whose `scheduled_time` has come
+    into the outbox. Also refreshes template A/B statistics every
+    `AB_TEST_REFRESH_SECONDS`. Run one per deployment:
+    `python -m app.workers.scheduler_worker`.
+    """
+
+    def __init__(self, tick_interval: Optional[float] = None):
+        self.tick_interval = tick_interval or settings.SCHEDULER_TICK_SECONDS
+        self._stop = threading.Event()
+        self._last_ab_refresh = 0.0
+
+    def stop(self, *args: Any) -> None:
+        self._stop.set()
+
+    def run_forever(self) -> None:
+        logger.info("Scheduler worker started")
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                released = send_scheduler.tick(db)
+                if released:
+                    logger.info(f"Released {released} scheduled emails")
+                self._refresh_ab_tests(db)
+            except Exception:
+                logger.exception("Scheduler tick failed")
+            finally:
+                db.close()
+            self._stop.wait(self.tick_interval)
+        logger.info("Scheduler worker stopped")
+
+    def _refresh_ab_tests(self, db: Session) -> None:
+        now = time.monotonic()
+        if now - self._last_ab_refresh < settings.AB_TEST_REFRESH_SECONDS:
+            return
+        self._last_ab_refresh = now
+        updated = ab_test_engine.refresh(db)
+        if updated:
+            logger.info(f"Refreshed A/B statistics for {updated} templates")
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    worker = SchedulerWorker()
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark bulk campaign sending.
+
+    python -m benchmarks.bench_campaign_dispatch [--emails 5000] [--sessions 10]
+
+Dispatches a campaign of pending emails to a local aiosmtpd sink that
+accepts every message, with the emails in a scratch SQLite database, and
+reports messages per minute. Rate limits are lifted, and the analytics
+rollup (PostgreSQL-only) is skipped, so the number is the dispatcher's
+own: claiming, rendering, SMTP round trips and batched result writes.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import tempfile
+
+from aiosmtpd.controller import Controller
+from app.core.config import settings
+from app.db.base import Base
+from app.db.session import SessionLocal
+from app.models.campaign import Campaign, CampaignStatusEnum
+from app.models.email import Email, EmailStatusEnum
+from app.models.prospect import Prospect
+from app.services.analytics_service import analytics_service
+from app.services.campaign_dispatcher import CampaignDispatcher
+from sqlalchemy import create_engine, insert
+
+
+class Sink:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        return unused.getsockname()[1]
+
+
+def load(emails: int) -> int:
+    db = SessionLocal()
+    try:
+        campaign = Campaign(name="Benchmark", status=CampaignStatusEnum.ACTIVE)
+        db.add(campaign)
+        db.flush()
+        db.execute(
+            insert(Prospect),
+            [
+                {
+                    "id": i,
+                    "first_name": "First",
+                    "last_name": f"Last{i}",
+                    "email": f"user{i}@example.com",
+                }
+                for i in range(1, emails + 1)
+            ],
+        )
+        db.execute(
+            insert(Email),
+            [
+                {
+                    "prospect_id": i,
+                    "campaign_id": campaign.id,
+                    "subject": f"Hello {i}",
+                    "body": f"<p>Hi user {i}</p>",
+                    "status": EmailStatusEnum.DRAFT,
+                }
+                for i in range(1, emails + 1)
+            ],
+        )
+        db.commit()
+        return campaign.id
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--emails", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=10)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    SessionLocal.configure(bind=engine)
+
+    sink = Sink()
+    controller = Controller(sink, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    settings.SMTP_HOST, settings.SMTP_PORT = "127.0.0.1", controller.port
+    settings.SMTP_TLS, settings.SMTP_USER = False, ""
+    settings.EMAILS_FROM_EMAIL = "sales@example.com"
+    settings.SEND_RATE_ACCOUNT_PER_MINUTE = 1e9
+    settings.SEND_RATE_DOMAIN_PER_MINUTE = 1e9
+    analytics_service.record = lambda db, email_ids, metric: None
+    try:
+        campaign_id = load(args.emails)
+        dispatcher = CampaignDispatcher(max_in_flight=args.sessions)
+        result = asyncio.run(dispatcher.dispatch(campaign_id))
+    finally:
+        controller.stop()
+        engine.dispose()
+        os.remove(path)
+
+    print(
+        f"{result['sent']:,} sent ({sink.received:,} received) over "
+        f"{args.sessions} sessions in {result['elapsed_seconds']:.1f}s: "
+        f"{result['messages_per_minute']:,.0f} messages per minute"
+    )
+
+
+if __name__ == "__main__":
+    main()
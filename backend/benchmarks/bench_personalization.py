@@ -0,0 +1,86 @@
+"""
+Benchmark bulk template rendering.
+
+    python -m benchmarks.bench_personalization [--count 200000]
+
+Compares `PersonalizationEngine.render_batch` with compiling the template
+and calling `Template.render` per prospect.
+"""
+import argparse
+import time
+from types import SimpleNamespace
+
+from app.services.personalization_service import PersonalizationEngine
+from jinja2 import Environment
+
+SUBJECT = "{{ first_name }}, quick question about {{ company_name }}"
+BODY = """<p>Hi {{ first_name }},</p>
+<p>I noticed {{ company_name }} is growing its {{ company_industry }} team in
+{{ location }}. As {{ job_title }}, you are probably looking at how to scale
+outreach without adding headcount.</p>
+{% if company_size %}<p>Teams of {{ company_size }} usually see results in weeks.</p>{% endif %}
+<p>Would a 15 minute call next week make sense?</p>
+<p>Best,<br>{{ sender_name }}</p>"""
+
+
+def make_contexts(count: int):
+    return [
+        {
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "full_name": f"First{i} Last{i}",
+            "email": f"user{i}@example{i % 500}.com",
+            "job_title": "VP Engineering",
+            "seniority": "executive",
+            "location": "Berlin",
+            "company_name": f"Company {i % 500} & Co",
+            "company_industry": "software",
+            "company_size": "51-200",
+            "company_website": f"https://example{i % 500}.com",
+            "sender_name": "Alex",
+        }
+        for i in range(count)
+    ]
+
+
+def bench(label: str, fn, count: int) -> None:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {count / elapsed:>12,.0f} renders/sec  ({elapsed:.2f}s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=200_000)
+    args = parser.parse_args()
+
+    contexts = make_contexts(args.count)
+    template = SimpleNamespace(id=1, updated_at=None, subject=SUBJECT, body=BODY)
+
+    def per_call_render():
+        env = Environment(autoescape=True)
+        subject, body = env.from_string(SUBJECT), env.from_string(BODY)
+        for context in contexts:
+            subject.render(context)
+            body.render(context)
+
+    engine = PersonalizationEngine()
+    engine.compile(template)
+
+    # Compiling per message is slow enough that a sample is plenty
+    sample = contexts[: max(args.count // 50, 1)]
+
+    def compile_per_message():
+        env = Environment(autoescape=True)
+        for context in sample:
+            env.from_string(SUBJECT).render(context)
+            env.from_string(BODY).render(context)
+
+    bench("compile per message", compile_per_message, len(sample))
+    bench("Template.render", per_call_render, args.count)
+    bench("render_batch", lambda: engine.render_batch(template, contexts), args.count)
+
+
+if __name__ == "__main__":
+    main()
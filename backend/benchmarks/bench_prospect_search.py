@@ -0,0 +1,181 @@
+"""
+Benchmark prospect search latency.
+
+    python -m benchmarks.bench_prospect_search [--prospects 1000000] [--url URL]
+
+Loads synthetic prospects and companies into a scratch database (an SQLite
+file by default, which exercises the FTS5 stand-in; pass a PostgreSQL URL
+to an empty database to exercise the tsvector and trigram indexes), builds
+the search data and reports latency percentiles of ranked search, of an
+index-filtered list page, and of the unindexed substring scan it replaces.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+from app.crud.prospect import prospect as crud_prospect
+from app.db.base_class import Base
+from app.models.prospect import Company, Prospect, ProspectSegment
+from app.models.segmentation import SegmentationModel
+from app.services.search_service import prospect_search
+from sqlalchemy import create_engine, insert, or_
+from sqlalchemy.orm import Session
+
+FIRST_NAMES = (
+    "anna ben carla david elena felix grace henry iris jonas kate liam maria "
+    "noah olivia paul quinn rosa samuel tara umar vera william xenia yusuf zoe"
+).split()
+LAST_NAMES = (
+    "anderson becker chen dubois evans fischer garcia hansen ivanova jensen "
+    "kim lopez meyer nguyen olsen patel rossi schmidt tanaka weber"
+).split()
+TITLES = [
+    "CEO",
+    "CTO",
+    "VP Engineering",
+    "Head of Sales",
+    "Marketing Manager",
+    "Data Scientist",
+    "Product Manager",
+    "Software Engineer",
+    "Recruiter",
+]
+WORDS = (
+    "acme globex initech umbrella stark wayne hooli vandelay cyberdyne soylent "
+    "aperture tyrell wonka"
+).split()
+CITIES = ["Berlin", "London", "Paris", "Austin", "Toronto", "Madrid", "Oslo"]
+
+
+def load(db: Session, prospects: int, companies: int, batch: int = 50_000) -> None:
+    rng = random.Random(0)
+    db.execute(
+        insert(Company),
+        [
+            {
+                "id": i,
+                "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}",
+            }
+            for i in range(1, companies + 1)
+        ],
+    )
+    for start in range(1, prospects + 1, batch):
+        rows = []
+        for i in range(start, min(start + batch, prospects + 1)):
+            first = rng.choice(FIRST_NAMES)
+            last = rng.choice(LAST_NAMES)
+            rows.append(
+                {
+                    "id": i,
+                    "first_name": first.title(),
+                    "last_name": last.title(),
+                    "email": f"{first}.{last}{i}@example.com",
+                    "job_title": rng.choice(TITLES),
+                    "location": rng.choice(CITIES),
+                    "company_id": rng.randint(1, companies),
+                }
+            )
+        db.execute(insert(Prospect), rows)
+    db.commit()
+
+
+def make_queries(count: int) -> list:
+    rng = random.Random(1)
+    queries = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.4:
+            queries.append(rng.choice(FIRST_NAMES)[: rng.randint(2, 5)])
+        elif kind < 0.7:
+            queries.append(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)[:3]}")
+        else:
+            queries.append(f"{rng.choice(WORDS)} {rng.choice(TITLES).split()[0]}")
+    return queries
+
+
+def measure(label: str, fn, queries: list) -> None:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    print(
+        f"{label:<26} p50 {p50:>8.2f} ms  p95 {p95:>8.2f} ms  p99 {p99:>8.2f} ms"
+        f"  ({len(queries)} queries)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prospects", type=int, default=1_000_000)
+    parser.add_argument("--companies", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--scan-queries", type=int, default=20)
+    parser.add_argument("--url", help="empty database to use instead of SQLite")
+    args = parser.parse_args()
+
+    path = None
+    url = args.url
+    if url is None:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    tables = [
+        Company.__table__,
+        SegmentationModel.__table__,
+        ProspectSegment.__table__,
+        Prospect.__table__,
+    ]
+    Base.metadata.create_all(engine, tables=tables)
+    try:
+        with Session(engine) as db:
+            started = time.perf_counter()
+            load(db, args.prospects, args.companies)
+            elapsed = time.perf_counter() - started
+            print(f"loaded {args.prospects:,} prospects in {elapsed:.1f}s")
+            started = time.perf_counter()
+            prospect_search.refresh(db)
+            db.commit()
+            print(f"built search data in {time.perf_counter() - started:.1f}s")
+            if engine.dialect.name == "postgresql":
+                db.connection().exec_driver_sql("ANALYZE prospects")
+
+            queries = make_queries(args.queries)
+            measure(
+                "ranked search (top 20)",
+                lambda q: prospect_search.search(db, q, limit=20),
+                queries,
+            )
+            measure(
+                "filtered list page (100)",
+                lambda q: crud_prospect.get_page(db, limit=100, search=q),
+                queries,
+            )
+
+            def substring_scan(query: str) -> None:
+                pattern = f"%{query}%"
+                db.query(Prospect).filter(
+                    or_(
+                        Prospect.first_name.ilike(pattern),
+                        Prospect.last_name.ilike(pattern),
+                        Prospect.email.ilike(pattern),
+                        Prospect.job_title.ilike(pattern),
+                    )
+                ).order_by(Prospect.id.desc()).limit(20).all()
+
+            measure(
+                "substring scan (ILIKE)", substring_scan, queries[: args.scan_queries]
+            )
+    finally:
+        engine.dispose()
+        if path is not None:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
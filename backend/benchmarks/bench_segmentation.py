@@ -0,0 +1,169 @@
+"""
+Benchmark streaming prospect segmentation.
+
+    python -m benchmarks.bench_segmentation [--prospects 1000000] [--url URL]
+
+Loads synthetic prospects and companies into a scratch database (an SQLite
+file by default; pass a PostgreSQL URL to an empty database to stream
+through a server-side cursor) and times `SegmentationService.segment_stream`
+over all of them twice: once building the feature store, and again after
+editing 1% of the prospects, which only re-encodes those; both runs save
+the segmentation. Then times assigning newly inserted prospects to the
+saved segments. Reports seconds per million rows and peak memory.
+"""
+import argparse
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from app.core.config import settings
+from app.db.base import Base
+from app.models.prospect import Company, Prospect, ProspectSegment
+from app.models.segmentation import SegmentationModel
+from app.services.feature_store import prospect_feature_store
+from app.services.prospect_features import ORDINAL_FEATURES
+from app.services.segment_model_service import segment_model_registry
+from app.services.segmentation_service import segmentation_service
+from sqlalchemy import create_engine, func, insert, update
+from sqlalchemy.orm import Session
+
+INDUSTRIES = ["Software", "Finance", "Healthcare", "Retail", "Logistics", "Media"]
+TITLES = [
+    "CEO",
+    "CTO",
+    "VP Engineering",
+    "Head of Sales",
+    "Marketing Manager",
+    "Data Scientist",
+    "Software Engineer",
+]
+CITIES = ["Berlin", "London", "Paris", "Austin", "Toronto", "Madrid", "Oslo"]
+
+
+def prospect_rows(rng: random.Random, ids: range, companies: int) -> list:
+    seniorities = list(ORDINAL_FEATURES["seniority"])[1:]
+    return [
+        {
+            "id": i,
+            "first_name": "First",
+            "last_name": f"Last{i}",
+            "email": f"user{i}@example.com",
+            "job_title": rng.choice(TITLES),
+            "seniority": rng.choice(seniorities),
+            "location": rng.choice(CITIES),
+            "company_id": rng.randint(1, companies),
+        }
+        for i in ids
+    ]
+
+
+def load(db: Session, prospects: int, companies: int, batch: int = 50_000) -> None:
+    rng = random.Random(0)
+    sizes = list(ORDINAL_FEATURES["company_size"])[1:]
+    db.execute(
+        insert(Company),
+        [
+            {
+                "id": i,
+                "name": f"Company {i}",
+                "size": rng.choice(sizes),
+                "industry": rng.choice(INDUSTRIES),
+            }
+            for i in range(1, companies + 1)
+        ],
+    )
+    for start in range(1, prospects + 1, batch):
+        ids = range(start, min(start + batch, prospects + 1))
+        db.execute(insert(Prospect), prospect_rows(rng, ids, companies))
+    db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prospects", type=int, default=1_000_000)
+    parser.add_argument("--companies", type=int, default=50_000)
+    parser.add_argument("--clusters", type=int, default=8)
+    parser.add_argument("--chunk-size", type=int, default=20_000)
+    parser.add_argument("--new-prospects", type=int, default=5_000)
+    parser.add_argument("--url", help="empty database to use instead of SQLite")
+    args = parser.parse_args()
+
+    path = None
+    url = args.url
+    if url is None:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        url = f"sqlite:///{path}"
+    store = tempfile.mkdtemp()
+    # The data is loaded just before the runs; without this the overlap
+    # window would re-encode all of it
+    settings.FEATURE_STORE_OVERLAP_SECONDS = 0
+    prospect_feature_store.path = Path(store)
+    engine = create_engine(url)
+    tables = [
+        Company.__table__,
+        SegmentationModel.__table__,
+        ProspectSegment.__table__,
+        Prospect.__table__,
+    ]
+    Base.metadata.create_all(engine, tables=tables)
+    try:
+        with Session(engine) as db:
+            started = time.perf_counter()
+            load(db, args.prospects, args.companies)
+            elapsed = time.perf_counter() - started
+            print(f"loaded {args.prospects:,} prospects in {elapsed:.1f}s")
+
+            for run in ("first run", "re-segment"):
+                if run == "re-segment":
+                    # Edit 1% of prospects; SQLite timestamps have 1s resolution
+                    time.sleep(1)
+                    db.execute(
+                        update(Prospect)
+                        .where(Prospect.id % 100 == 0)
+                        .values(
+                            job_title="Chief Revenue Officer", updated_at=func.now()
+                        )
+                    )
+                    db.commit()
+                result = segmentation_service.segment_stream(
+                    db, n_clusters=args.clusters, chunk_size=args.chunk_size, save=True
+                )
+                stats = result["stats"]
+                refresh = stats["refresh"]
+                peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+                print(
+                    f"{run}: {stats['rows']:,} prospects in {stats['seconds']:.1f}s, "
+                    f"feature store encoded {refresh['encoded']:,} rows in "
+                    f"{refresh['seconds']:.1f}s; clustering "
+                    f"{stats['seconds_per_million']:.1f} s per million rows, "
+                    f"saving {stats['save_seconds']:.1f}s (peak RSS {peak_mb:,.0f} MB)"
+                )
+            for segment in result["segments"]:
+                print(f"  {segment['name']:<12} {segment['size']:>9,}")
+
+            ids = range(args.prospects + 1, args.prospects + args.new_prospects + 1)
+            db.execute(
+                insert(Prospect), prospect_rows(random.Random(1), ids, args.companies)
+            )
+            started = time.perf_counter()
+            assigned = segment_model_registry.assign(db, ids)
+            db.commit()
+            elapsed = time.perf_counter() - started
+            print(
+                f"assigned {assigned:,} new prospects to segments in "
+                f"{elapsed * 1000:.0f} ms"
+            )
+    finally:
+        engine.dispose()
+        if path is not None:
+            os.remove(path)
+        shutil.rmtree(store)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+import asyncio
+import socket
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiosmtpd.controller import Controller
+from app.core.config import settings
+from app.models.campaign import Campaign, CampaignStatusEnum
+from app.models.email import Email, EmailStatusEnum
+from app.models.prospect import Prospect
+from app.services.analytics_service import analytics_service
+from app.services.campaign_dispatcher import CampaignDispatcher
+from app.services.rate_limiter import rate_limiter
+from sqlalchemy import insert, select, update
+
+N_EMAILS = 500
+WRITE_BATCH_SIZE = 50
+
+
+def free_port():
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        return unused.getsockname()[1]
+
+
+class Sink:
+    """
+    aiosmtpd handler that keeps every message. It defers the first message
+    to each of `defer_first` with a 451 and rejects `reject` with a 550.
+    """
+
+    def __init__(self, defer_first=(), reject=()):
+        self.messages = []
+        self.deferred = set(defer_first)
+        self.rejected = set(reject)
+
+    async def handle_DATA(self, server, session, envelope):
+        recipient = envelope.rcpt_tos[0]
+        if recipient in self.rejected:
+            return "550 No such user"
+        if recipient in self.deferred:
+            self.deferred.discard(recipient)
+            return "451 Try again later"
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp_sink(monkeypatch):
+    sinks = []
+
+    def start(**kwargs):
+        sink = Sink(**kwargs)
+        controller = Controller(sink, hostname="127.0.0.1", port=free_port())
+        controller.start()
+        sinks.append(controller)
+        monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+        monkeypatch.setattr(settings, "SMTP_PORT", controller.port)
+        return sink
+
+    monkeypatch.setattr(settings, "SMTP_TLS", False)
+    monkeypatch.setattr(settings, "SMTP_USER", "")
+    monkeypatch.setattr(settings, "EMAILS_FROM_EMAIL", "sales@example.com")
+    yield start
+    for controller in sinks:
+        controller.stop()
+
+
+@pytest.fixture(autouse=True)
+def unthrottled(monkeypatch):
+    # Every test email goes to example.com; tests that throttle lower these
+    monkeypatch.setattr(settings, "SEND_RATE_ACCOUNT_PER_MINUTE", 1e9)
+    monkeypatch.setattr(settings, "SEND_RATE_DOMAIN_PER_MINUTE", 1e9)
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    # The rollup upsert is PostgreSQL-only; keep the ids it would count
+    ids = []
+    monkeypatch.setattr(
+        analytics_service, "record", lambda db, email_ids, metric: ids.extend(email_ids)
+    )
+    return ids
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    sizes = []
+    write_results = CampaignDispatcher._write_results
+
+    def counting(self, results):
+        sizes.append(len(results))
+        write_results(self, results)
+
+    monkeypatch.setattr(CampaignDispatcher, "_write_results", counting)
+    return sizes
+
+
+@pytest.fixture
+def campaign(db):
+    campaign = Campaign(name="Launch", status=CampaignStatusEnum.ACTIVE)
+    db.add(campaign)
+    db.flush()
+    db.execute(
+        insert(Prospect),
+        [
+            {
+                "id": i,
+                "first_name": "First",
+                "last_name": f"Last{i}",
+                "email": f"user{i}@example.com",
+            }
+            for i in range(1, N_EMAILS + 1)
+        ],
+    )
+    db.execute(
+        insert(Email),
+        [
+            {
+                "prospect_id": i,
+                "campaign_id": campaign.id,
+                "subject": f"Hello {i}",
+                "body": f"<p>Hi user {i}</p>",
+                "status": EmailStatusEnum.DRAFT,
+            }
+            for i in range(1, N_EMAILS + 1)
+        ],
+    )
+    db.commit()
+    return campaign.id
+
+
+def statuses(db):
+    """Each email status found, mapped to whether those emails have a sent_at."""
+    db.expire_all()
+    return dict(db.execute(select(Email.status, Email.sent_at.isnot(None))).all())
+
+
+def dispatcher(**kwargs):
+    kwargs.setdefault("write_batch_size", WRITE_BATCH_SIZE)
+    return CampaignDispatcher(max_in_flight=10, chunk_size=100, retry_delay=0, **kwargs)
+
+
+def test_dispatch_sends_every_pending_email(db, campaign, smtp_sink, recorded, writes):
+    sink = smtp_sink()
+
+    result = asyncio.run(dispatcher().dispatch(campaign))
+
+    assert result["sent"] == N_EMAILS
+    assert result["failed"] == result["requeued"] == 0
+    assert sorted(m.rcpt_tos[0] for m in sink.messages) == sorted(
+        f"user{i}@example.com" for i in range(1, N_EMAILS + 1)
+    )
+    # status and sent_at went back together, in batches rather than per email
+    assert statuses(db) == {EmailStatusEnum.SENT: True}
+    assert sum(writes) == N_EMAILS
+    assert 1 < len(writes) <= N_EMAILS // WRITE_BATCH_SIZE + 1
+    assert sorted(recorded) == list(range(1, N_EMAILS + 1))
+
+
+def test_concurrent_dispatches_send_each_email_once(
+    db, campaign, smtp_sink, recorded, writes
+):
+    sink = smtp_sink()
+
+    async def both():
+        return await asyncio.gather(
+            dispatcher().dispatch(campaign), dispatcher().dispatch(campaign)
+        )
+
+    results = asyncio.run(both())
+
+    assert sum(result["sent"] for result in results) == N_EMAILS
+    assert len(sink.messages) == N_EMAILS
+    assert len({m.rcpt_tos[0] for m in sink.messages}) == N_EMAILS
+    assert statuses(db) == {EmailStatusEnum.SENT: True}
+
+
+def test_transient_replies_are_retried(db, campaign, smtp_sink, recorded, writes):
+    deferred = {f"user{i}@example.com" for i in range(1, 21)}
+    sink = smtp_sink(defer_first=deferred)
+
+    result = asyncio.run(dispatcher().dispatch(campaign))
+
+    assert result["sent"] == N_EMAILS
+    assert len(sink.messages) == N_EMAILS
+    assert statuses(db) == {EmailStatusEnum.SENT: True}
+
+
+def test_unreachable_server_requeues_claimed_emails(
+    db, campaign, smtp_sink, recorded, writes, monkeypatch
+):
+    smtp_sink()
+    # A port nothing listens on
+    monkeypatch.setattr(settings, "SMTP_PORT", free_port())
+    monkeypatch.setattr(settings, "SMTP_POOL_TIMEOUT", 1.0)
+
+    result = asyncio.run(dispatcher().dispatch(campaign))
+
+    assert result["sent"] == result["failed"] == 0
+    # The dispatch stopped claiming once no session could connect
+    assert 0 < result["requeued"] < N_EMAILS
+    assert statuses(db) == {EmailStatusEnum.DRAFT: False}
+    assert recorded == []
+
+
+def test_permanent_rejections_fail(db, campaign, smtp_sink, recorded, writes):
+    rejected = {f"user{i}@example.com" for i in range(1, 11)}
+    sink = smtp_sink(reject=rejected)
+
+    result = asyncio.run(dispatcher().dispatch(campaign))
+
+    assert result["sent"] == N_EMAILS - 10
+    assert result["failed"] == 10
+    assert len(sink.messages) == N_EMAILS - 10
+    assert statuses(db) == {EmailStatusEnum.SENT: True, EmailStatusEnum.FAILED: False}
+    assert sorted(recorded) == list(range(11, N_EMAILS + 1))
+
+
+def test_scheduled_emails_are_left_to_the_scheduler(
+    db, campaign, smtp_sink, recorded, writes
+):
+    sink = smtp_sink()
+    db.execute(
+        update(Email)
+        .where(Email.id <= 10)
+        .values(
+            status=EmailStatusEnum.SCHEDULED,
+            scheduled_time=datetime.now(timezone.utc) - timedelta(hours=1),
+        )
+    )
+    db.commit()
+
+    result = asyncio.run(dispatcher().dispatch(campaign))
+
+    assert result["sent"] == len(sink.messages) == N_EMAILS - 10
+    assert statuses(db) == {
+        EmailStatusEnum.SENT: True,
+        EmailStatusEnum.SCHEDULED: False,
+    }
+
+
+def test_campaign_daily_cap_leaves_the_rest_pending(
+    db, campaign, smtp_sink, recorded, writes
+):
+    sink = smtp_sink()
+    db.execute(
+        update(Campaign)
+        .where(Campaign.id == campaign)
+        .values(settings={"max_emails_per_day": 200})
+    )
+    db.commit()
+
+    result = asyncio.run(dispatcher().dispatch(campaign))
+
+    assert result["sent"] == len(sink.messages) == 200
+    # The quota is back at midnight, too late for another pass
+    assert result["throttled"] == N_EMAILS - 200
+    assert statuses(db) == {EmailStatusEnum.SENT: True, EmailStatusEnum.DRAFT: False}
+
+
+def test_domain_limits_are_waited_out(
+    db, campaign, smtp_sink, recorded, writes, monkeypatch
+):
+    sink = smtp_sink()
+    # 2000 per second, in bursts of 100
+    monkeypatch.setattr(settings, "SEND_RATE_DOMAIN_PER_MINUTE", 120_000.0)
+    monkeypatch.setattr(settings, "SEND_RATE_BURST_SECONDS", 0.05)
+    held_back = []
+    acquire = rate_limiter.acquire
+
+    def counting(db, items):
+        allowed, deferred = acquire(db, items)
+        held_back.append(len(deferred))
+        return allowed, deferred
+
+    monkeypatch.setattr(rate_limiter, "acquire", counting)
+
+    result = asyncio.run(dispatcher().dispatch(campaign))
+
+    assert result["sent"] == len(sink.messages) == N_EMAILS
+    # Held back at first, then sent by later passes
+    assert sum(held_back) > 0
+    assert result["throttled"] == 0
+    assert statuses(db) == {EmailStatusEnum.SENT: True}
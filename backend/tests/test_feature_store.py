@@ -0,0 +1,173 @@
+import fcntl
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+from app.models.prospect import Company, Prospect
+from app.services.feature_store import (
+    GENERATIONS_LOCK,
+    ProspectFeatureStore,
+    feature_query,
+)
+from app.services.prospect_features import FEATURE_COLUMNS, ProspectFeatureEncoder
+from sqlalchemy import delete, insert, update
+
+
+def write(store, generation, n_rows):
+    matrix = sp.random(n_rows, 4, density=0.5, format="csr")
+    store._write_generation(
+        generation,
+        datetime.now(timezone.utc),
+        np.arange(1, n_rows + 1),
+        matrix,
+        ["a", "b", "c", "d"],
+    )
+    return store._read_meta()
+
+
+def prospect_frame(db, prospect_id):
+    rows = db.execute(feature_query().where(Prospect.id == prospect_id)).all()
+    return pd.DataFrame(rows, columns=["id"] + FEATURE_COLUMNS)
+
+
+def test_superseded_generation_outlives_a_reader_opening_it(tmp_path):
+    store = ProspectFeatureStore(path=str(tmp_path))
+    write(store, 1, 3)
+
+    # A reader that has read CURRENT but not yet opened the files
+    with store._lock(GENERATIONS_LOCK, fcntl.LOCK_SH):
+        writer = threading.Thread(target=write, args=(store, 2, 5))
+        writer.start()
+        writer.join(timeout=0.5)
+        assert writer.is_alive()
+        assert (tmp_path / "generation-000001" / "ids.npy").exists()
+        assert list(np.load(tmp_path / "generation-000001" / "ids.npy")) == [1, 2, 3]
+    writer.join()
+
+    assert not (tmp_path / "generation-000001").exists()
+    assert len(store.load().ids) == 5
+
+
+def test_rebuild_after_an_encoder_change_starts_a_new_generation(tmp_path, db):
+    db.execute(
+        insert(Prospect),
+        [
+            {"first_name": "First", "last_name": "Last", "email": f"user{i}@x.com"}
+            for i in range(3)
+        ],
+    )
+    db.commit()
+    store = ProspectFeatureStore(
+        path=str(tmp_path), encoder=ProspectFeatureEncoder(n_hash_features=8)
+    )
+    first = store.features(db)
+
+    store.encoder = ProspectFeatureEncoder(n_hash_features=16)
+    rebuilt = store.features(db)
+
+    assert store._read_meta()["generation"] == 2
+    assert [p.name for p in tmp_path.glob("generation-*")] == ["generation-000002"]
+    assert first.matrix.shape[1] == 3 * 8 + 2
+    assert rebuilt.matrix.shape[1] == 3 * 16 + 2
+
+
+@pytest.fixture
+def prospects(db):
+    # Created well before the refresh overlap window
+    day_ago = datetime.now(timezone.utc) - timedelta(days=1)
+    db.execute(
+        insert(Company),
+        [
+            {"id": 1, "name": "Acme", "industry": "Software", "created_at": day_ago},
+            {"id": 2, "name": "Shop", "industry": "Retail", "created_at": day_ago},
+        ],
+    )
+    db.execute(
+        insert(Prospect),
+        [
+            {
+                "id": i,
+                "first_name": "First",
+                "last_name": f"Last{i}",
+                "email": f"user{i}@example.com",
+                "job_title": "Engineer",
+                "company_id": 1 if i <= 3 else 2,
+                "created_at": day_ago,
+            }
+            for i in range(1, 7)
+        ],
+    )
+    db.commit()
+
+
+def refreshed_store(tmp_path, db):
+    store = ProspectFeatureStore(path=str(tmp_path), chunk_size=2)
+    assert store.refresh(db)["encoded"] == 6
+    return store
+
+
+def test_refresh_reencodes_only_changed_prospects(tmp_path, db, prospects):
+    store = refreshed_store(tmp_path, db)
+    before = store.load().matrix.toarray()
+
+    db.execute(
+        update(Prospect)
+        .where(Prospect.id == 5)
+        .values(job_title="Buyer", updated_at=datetime.now(timezone.utc))
+    )
+    db.commit()
+    stats = store.refresh(db)
+
+    assert (stats["encoded"], stats["removed"]) == (1, 0)
+    features = store.load()
+    assert list(features.ids) == [1, 2, 3, 4, 5, 6]
+    changed = (features.matrix.toarray() != before).any(axis=1)
+    assert list(changed) == [False, False, False, False, True, False]
+    _, row = features.rows([5])
+    assert (row != store.encoder.transform(prospect_frame(db, 5))).nnz == 0
+
+
+def test_refresh_reencodes_prospects_of_a_changed_company(tmp_path, db, prospects):
+    store = refreshed_store(tmp_path, db)
+
+    db.execute(
+        update(Company)
+        .where(Company.id == 1)
+        .values(industry="Finance", updated_at=datetime.now(timezone.utc))
+    )
+    db.commit()
+    stats = store.refresh(db)
+
+    assert (stats["encoded"], stats["removed"]) == (3, 0)
+    ids, rows = store.load().rows([1, 2, 3])
+    assert list(ids) == [1, 2, 3]
+    for i, prospect_id in enumerate(ids):
+        expected = store.encoder.transform(prospect_frame(db, int(prospect_id)))
+        assert (rows[i] != expected).nnz == 0
+
+
+def test_refresh_drops_deleted_prospects(tmp_path, db, prospects):
+    store = refreshed_store(tmp_path, db)
+
+    db.execute(delete(Prospect).where(Prospect.id.in_([2, 6])))
+    db.commit()
+    stats = store.refresh(db)
+
+    assert (stats["encoded"], stats["removed"]) == (0, 2)
+    features = store.load()
+    assert list(features.ids) == [1, 3, 4, 5]
+    assert features.matrix.shape[0] == 4
+    ids, _ = features.rows([2, 3, 6])
+    assert list(ids) == [3]
+
+
+def test_unchanged_refresh_keeps_the_generation(tmp_path, db, prospects):
+    store = refreshed_store(tmp_path, db)
+
+    stats = store.refresh(db)
+
+    assert (stats["encoded"], stats["removed"]) == (0, 0)
+    assert store._read_meta()["generation"] == 1
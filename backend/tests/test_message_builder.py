@@ -0,0 +1,34 @@
+import email
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services import message_builder
+from app.services.message_builder import MessageSkeleton
+
+
+def test_date_header_is_never_empty_across_threads(monkeypatch):
+    # Every call starts a new second, so every build refreshes the date
+    clock = iter(range(1_700_000_000, 1_800_000_000))
+    monkeypatch.setattr(message_builder.time, "time", lambda: next(clock))
+    skeleton = MessageSkeleton("sales@example.com", from_name="Sales")
+
+    def build(i):
+        raw = skeleton.build(f"user{i}@example.com", "User", "Hello", "<p>Hi</p>")
+        return email.message_from_bytes(raw)["Date"]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        dates = list(pool.map(build, range(2000)))
+
+    assert all(dates)
+
+
+def test_display_names_cannot_add_headers():
+    skeleton = MessageSkeleton("sales@example.com", from_name="Sales")
+
+    raw = skeleton.build(
+        "bob@example.com", "Bob\r\nBcc: evil@x.com", "Hello", "<p>Hi</p>"
+    )
+
+    message = email.message_from_bytes(raw)
+    assert message["Bcc"] is None
+    assert b"\r\nBcc:" not in raw
+    assert message["To"].endswith("<bob@example.com>")
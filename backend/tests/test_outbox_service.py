@@ -0,0 +1,76 @@
+import pytest
+from app.models.email import Email, EmailStatusEnum
+from app.models.outbox import EmailOutbox, OutboxStatusEnum
+from app.models.prospect import Prospect
+from app.services.outbox_service import outbox_service
+from sqlalchemy import insert, select, update
+
+
+@pytest.fixture
+def emails(db):
+    db.execute(
+        insert(Prospect),
+        [
+            {
+                "id": i,
+                "first_name": "First",
+                "last_name": f"Last{i}",
+                "email": f"user{i}@example.com",
+            }
+            for i in range(1, 5)
+        ],
+    )
+    db.execute(
+        insert(Email),
+        [
+            {
+                "id": i,
+                "prospect_id": i,
+                "subject": f"Hello {i}",
+                "body": f"<p>Hi user {i}</p>",
+                "status": status,
+            }
+            for i, status in enumerate(
+                [
+                    EmailStatusEnum.DRAFT,
+                    EmailStatusEnum.SCHEDULED,
+                    EmailStatusEnum.SENT,
+                    EmailStatusEnum.CANCELLED,
+                ],
+                start=1,
+            )
+        ],
+    )
+    db.commit()
+
+
+def outbox_statuses(db):
+    db.expire_all()
+    return dict(db.execute(select(EmailOutbox.email_id, EmailOutbox.status)).all())
+
+
+def test_enqueue_skips_emails_that_cannot_be_sent(db, emails):
+    assert outbox_service.enqueue(db, [1, 2, 3, 4]) == 2
+
+    assert outbox_statuses(db) == {
+        1: OutboxStatusEnum.PENDING,
+        2: OutboxStatusEnum.PENDING,
+    }
+    assert db.get(Email, 1).status == EmailStatusEnum.SCHEDULED
+
+
+def test_claim_dead_letters_emails_no_longer_sendable(db, emails):
+    outbox_service.enqueue(db, [1, 2])
+    # Sent by a campaign dispatch after it was queued
+    db.execute(
+        update(Email).where(Email.id == 2).values(status=EmailStatusEnum.SENDING)
+    )
+    db.commit()
+
+    batch = outbox_service.claim_batch(db, "worker-1")
+
+    assert [item["email_id"] for item in batch] == [1]
+    assert outbox_statuses(db) == {
+        1: OutboxStatusEnum.IN_FLIGHT,
+        2: OutboxStatusEnum.DEAD,
+    }
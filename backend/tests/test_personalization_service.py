@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+
+import pytest
+from app.services.personalization_service import PersonalizationEngine
+from jinja2.exceptions import SecurityError
+
+
+def template(subject, body, id=1):
+    return SimpleNamespace(id=id, updated_at=None, subject=subject, body=body)
+
+
+def test_renders_subject_as_text_and_escapes_the_body():
+    engine = PersonalizationEngine()
+
+    subject, body = engine.render(
+        template("Hi {{ first_name }}", "<p>{{ company_name }}</p>"),
+        {"first_name": "Ann & Co", "company_name": "<Acme>"},
+    )
+
+    assert subject == "Hi Ann & Co"
+    assert body == "<p>&lt;Acme&gt;</p>"
+
+
+@pytest.mark.parametrize(
+    "subject, body",
+    [
+        ("{{ ''.__class__.__mro__[1].__subclasses__() }}", "<p>Hi</p>"),
+        ("Hi", "{{ ''.__class__.__mro__[1].__subclasses__() }}"),
+    ],
+)
+def test_templates_cannot_reach_python_internals(subject, body):
+    engine = PersonalizationEngine()
+
+    with pytest.raises(SecurityError):
+        engine.render(template(subject, body), {})
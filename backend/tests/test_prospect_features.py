@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from app.services.prospect_features import (
+    CATEGORICAL_FEATURES,
+    ORDINAL_FEATURES,
+    ProspectFeatureEncoder,
+)
+
+N_HASH_FEATURES = 8
+
+PROSPECTS = pd.DataFrame(
+    {
+        "company_size": ["10001+", "51-200", None, "bogus"],
+        "industry": ["Software", "Retail", "", "Software"],
+        "job_title": ["VP Sales", "Buyer", None, "Engineer"],
+        "seniority": ["c-level", "mid", "entry", None],
+        "location": ["Berlin", "Paris", "Berlin", None],
+    }
+)
+
+
+def test_ordinal_features_scale_to_unit_range():
+    encoder = ProspectFeatureEncoder(n_hash_features=N_HASH_FEATURES)
+
+    ordinal = encoder.transform(PROSPECTS)[:, : len(ORDINAL_FEATURES)].toarray()
+
+    # Missing and unrecognised values encode as unknown, i.e. zero
+    np.testing.assert_allclose(ordinal, [[1, 1], [3 / 8, 3 / 6], [0, 1 / 6], [0, 0]])
+
+
+def test_each_categorical_block_is_normalized_on_its_own():
+    encoder = ProspectFeatureEncoder(n_hash_features=N_HASH_FEATURES)
+
+    matrix = encoder.transform(PROSPECTS)
+
+    assert matrix.shape == (len(PROSPECTS), encoder.n_features)
+    start = len(ORDINAL_FEATURES)
+    for _ in CATEGORICAL_FEATURES:
+        block = matrix[:, start : start + N_HASH_FEATURES].toarray()
+        np.testing.assert_allclose(np.linalg.norm(block, axis=1), 1)
+        start += N_HASH_FEATURES
+
+
+def test_chunks_encode_the_same_as_the_whole():
+    encoder = ProspectFeatureEncoder(n_hash_features=N_HASH_FEATURES)
+    whole = encoder.transform(PROSPECTS)
+
+    # A fresh encoder, as in another process, with rows split across chunks
+    other = ProspectFeatureEncoder(n_hash_features=N_HASH_FEATURES)
+    chunks = sp.vstack(
+        [other.transform(PROSPECTS.iloc[:1]), other.transform(PROSPECTS.iloc[1:])]
+    )
+
+    assert (whole != chunks).nnz == 0
+
+
+def test_feature_names_name_hash_buckets_after_their_words():
+    encoder = ProspectFeatureEncoder(n_hash_features=N_HASH_FEATURES)
+
+    names = encoder.feature_names(PROSPECTS.iloc[:1])
+
+    assert len(names) == encoder.n_features
+    assert names[: len(ORDINAL_FEATURES)] == ["company_size_num", "seniority_num"]
+    assert {"industry_software", "location_berlin"} <= set(names)
+    # Without words to go by, buckets are numbered
+    empty = encoder.feature_names(pd.DataFrame())
+    assert empty[len(ORDINAL_FEATURES)] == "industry_#0"
+    numbered = [name for name in empty if "_#" in name]
+    assert len(numbered) == len(CATEGORICAL_FEATURES) * N_HASH_FEATURES
@@ -0,0 +1,91 @@
+import pytest
+from app.api.api_v1.endpoints import prospects
+from app.core.config import settings
+from app.db.query_counter import assert_max_queries
+from app.models.prospect import Company, Prospect
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+N_PROSPECTS = 50
+
+
+@pytest.fixture
+def client(engine):
+    app = FastAPI()
+    app.include_router(prospects.router, prefix=f"{settings.API_V1_STR}/prospects")
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def prospect_ids(db):
+    db.execute(
+        insert(Company),
+        [{"id": i, "name": f"Company {i}"} for i in range(1, 11)],
+    )
+    db.execute(
+        insert(Prospect),
+        [
+            {
+                "id": i,
+                "first_name": "First",
+                "last_name": f"Last{i}",
+                "email": f"user{i}@example.com",
+                "company_id": i % 10 + 1,
+            }
+            for i in range(1, N_PROSPECTS + 1)
+        ],
+    )
+    db.commit()
+    return list(range(1, N_PROSPECTS + 1))
+
+
+def test_list_loads_companies_in_the_page_query(client, engine, prospect_ids):
+    with assert_max_queries(1, engine) as queries:
+        response = client.get("/api/v1/prospects/")
+
+    assert queries.count == 1
+    assert response.status_code == 200
+    assert len(response.json()) == N_PROSPECTS
+    assert all(p["company"]["name"] for p in response.json())
+
+
+def test_list_with_total_adds_only_the_count_query(client, engine, prospect_ids):
+    with assert_max_queries(2, engine) as queries:
+        response = client.get("/api/v1/prospects/", params={"total": "exact"})
+
+    assert queries.count == 2
+    assert response.status_code == 200
+    assert response.headers["X-Total-Count"] == str(N_PROSPECTS)
+
+
+def test_get_prospect_is_one_query(client, engine, prospect_ids):
+    with assert_max_queries(1, engine) as queries:
+        response = client.get("/api/v1/prospects/7")
+
+    assert queries.count == 1
+    assert response.status_code == 200
+    assert response.json()["company"]["name"] == "Company 8"
+
+
+def test_segment_submit_queues_a_job_in_six_queries(
+    client, engine, prospect_ids, queued_executor
+):
+    params = {"algorithm": "kmeans", "n_clusters": 3}
+
+    # Data version (2), matching jobs, active model, insert, reload
+    with assert_max_queries(6, engine) as queries:
+        response = client.post("/api/v1/prospects/segment", json=params)
+
+    assert queries.count == 6
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+    assert queued_executor.submitted == [(job["id"],)]
+    # The same request joins the job in flight: data version, jobs, model
+    with assert_max_queries(4, engine) as queries:
+        again = client.post("/api/v1/prospects/segment", json=params)
+    assert queries.count == 4
+    assert again.json()["id"] == job["id"]
+    assert len(queued_executor.submitted) == 1
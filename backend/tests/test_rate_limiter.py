@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from app.models.campaign import Campaign, CampaignStatusEnum
+from app.models.rate_limit import RateLimitBucket
+from app.services.rate_limiter import rate_limiter
+from sqlalchemy import update
+
+NOW = datetime(2026, 10, 18, 20, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def campaign(db):
+    campaign = Campaign(
+        name="Capped",
+        status=CampaignStatusEnum.ACTIVE,
+        settings={"max_emails_per_day": 3},
+    )
+    db.add(campaign)
+    db.commit()
+    return campaign.id
+
+
+def items(campaign, count):
+    # One domain each, so only the campaign quota applies
+    return [
+        {"campaign_id": campaign, "to_email": f"user@example{i}.com"}
+        for i in range(count)
+    ]
+
+
+def test_campaign_quota_is_per_calendar_day(db, campaign):
+    allowed, deferred = rate_limiter.acquire(db, items(campaign, 5))
+
+    assert len(allowed) == 3
+    assert len(deferred) == 2
+    # Nothing more until midnight
+    assert all(0 < retry_after <= 86400 for _, retry_after in deferred)
+    assert rate_limiter.acquire(db, items(campaign, 1))[0] == []
+
+    db.execute(
+        update(RateLimitBucket)
+        .where(RateLimitBucket.key == f"campaign:{campaign}")
+        .values(updated_at=datetime.now(timezone.utc) - timedelta(days=1))
+    )
+    db.commit()
+    assert len(rate_limiter.acquire(db, items(campaign, 5))[0]) == 3
+
+
+@pytest.mark.parametrize(
+    "updated_at, tokens",
+    [
+        # Drained this morning: nothing comes back during the day
+        (NOW - timedelta(hours=10), 0.0),
+        # Drained late yesterday: the full quota from midnight
+        (NOW - timedelta(hours=21), 100.0),
+    ],
+)
+def test_daily_quota_refills_only_at_midnight(updated_at, tokens):
+    spec = ("campaign:1", 100.0, None)
+
+    assert rate_limiter._refill(spec, 0.0, updated_at, NOW) == tokens
+
+
+def test_rate_buckets_refill_continuously():
+    spec = ("domain:example.com", 20.0, 2.0)
+
+    assert rate_limiter._refill(spec, 0.0, NOW - timedelta(seconds=3), NOW) == 6.0
+    assert rate_limiter._refill(spec, 0.0, NOW - timedelta(hours=1), NOW) == 20.0
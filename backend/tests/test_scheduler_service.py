@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta, timezone
+
+from app.services.scheduler_service import SendScheduler
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def test_reply_cancels_only_that_campaigns_follow_ups():
+    scheduler = SendScheduler()
+    due = NOW - timedelta(minutes=1)
+    scheduler.schedule(1, due)  # first touch
+    scheduler.schedule(2, due, sequence=(7, 100))  # follow-up, replied campaign
+    scheduler.schedule(3, due, sequence=(7, 200))  # follow-up, other campaign
+    scheduler.schedule(4, due, sequence=(8, 100))  # other prospect
+
+    scheduler.cancel_sequence(7, 100)
+
+    assert sorted(scheduler.pop_due(NOW, 10)) == [1, 3, 4]
+    assert len(scheduler) == 0
+
+
+def test_follow_ups_loaded_after_a_reply_are_kept():
+    scheduler = SendScheduler()
+    scheduler.cancel_sequence(7, 100)
+    scheduler.schedule(2, NOW, sequence=(7, 100))
+
+    assert scheduler.pop_due(NOW, 10) == [2]
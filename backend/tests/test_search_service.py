@@ -0,0 +1,60 @@
+from app import crud
+from app.models.prospect import Company, Prospect
+from app.schemas.prospect import CompanyUpdate
+from app.services.search_service import prospect_search
+from sqlalchemy import insert
+
+
+def search(db, query):
+    return sorted(prospect.id for prospect, _ in prospect_search.search(db, query))
+
+
+def test_backfill_indexes_prospects_without_search_data(db):
+    # Written directly, as rows from before search was indexed
+    db.execute(
+        insert(Prospect),
+        [
+            {
+                "id": i,
+                "first_name": "Ada",
+                "last_name": f"Byron{i}",
+                "email": f"a{i}@x.io",
+            }
+            for i in range(1, 6)
+        ],
+    )
+    prospect_search.refresh(db, [1])
+    db.commit()
+    assert search(db, "ada") == [1]
+
+    assert prospect_search.backfill(db) == 4
+    assert search(db, "ada") == [1, 2, 3, 4, 5]
+    assert prospect_search.backfill(db) == 0
+
+
+def test_company_rename_refreshes_its_prospects(db):
+    company = Company(name="Initech", normalized_name="initech")
+    db.add(company)
+    db.flush()
+    db.execute(
+        insert(Prospect),
+        [
+            {
+                "id": i,
+                "first_name": "Peter",
+                "last_name": f"Gibbons{i}",
+                "email": f"p{i}@x.io",
+                "company_id": company.id if i <= 2 else None,
+            }
+            for i in range(1, 4)
+        ],
+    )
+    prospect_search.refresh(db)
+    db.commit()
+    assert search(db, "initech") == [1, 2]
+
+    crud.company.update(db, db_obj=company, obj_in=CompanyUpdate(name="Initrode Inc."))
+
+    assert search(db, "initech") == []
+    assert search(db, "initrode") == [1, 2]
+    assert company.normalized_name == "initrode"
@@ -0,0 +1,24 @@
+import pytest
+from app.core import security
+from app.core.config import settings
+
+
+def test_tracking_tokens_verify_with_the_shared_secret():
+    token = security.create_tracking_token(42, "https://example.com/?a=1")
+
+    assert security.verify_tracking_token(token) == (42, "https://example.com/?a=1")
+
+
+def test_tracking_tokens_do_not_depend_on_secret_key(monkeypatch):
+    token = security.create_tracking_token(42)
+    # Another process, or a restart, with a different SECRET_KEY
+    monkeypatch.setattr(settings, "SECRET_KEY", "another-process")
+
+    assert security.verify_tracking_token(token) == (42, None)
+
+
+def test_tracking_tokens_need_a_configured_secret(monkeypatch):
+    monkeypatch.setattr(settings, "TRACKING_SECRET", None)
+
+    with pytest.raises(RuntimeError, match="TRACKING_SECRET"):
+        security.create_tracking_token(42)
@@ -0,0 +1,112 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+from app.models.prospect import Company, Prospect, ProspectSegment
+from app.models.segmentation import SegmentationModel
+from app.services.prospect_features import prospect_feature_encoder
+from app.services.segment_model_service import SegmentModelRegistry
+from sqlalchemy import insert, select
+
+INDUSTRIES = ["Software", "Retail"]
+
+
+@pytest.fixture
+def prospects(db):
+    db.execute(
+        insert(Company),
+        [
+            {"id": i, "name": industry, "industry": industry}
+            for i, industry in enumerate(INDUSTRIES, start=1)
+        ],
+    )
+    db.execute(
+        insert(Prospect),
+        [
+            {
+                "id": i,
+                "first_name": "First",
+                "last_name": f"Last{i}",
+                "email": f"user{i}@example.com",
+                "company_id": 1 if i <= 3 else 2,
+                "updated_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+            }
+            for i in range(1, 7)
+        ],
+    )
+    db.commit()
+
+
+def fit(registry, db, members):
+    """Register one segment per industry, centered on its encoding."""
+    centers = prospect_feature_encoder.transform(
+        pd.DataFrame({"industry": INDUSTRIES})
+    ).toarray()
+    return registry.register(
+        db,
+        algorithm="kmeans",
+        params={"n_clusters": 2},
+        scale=np.ones(prospect_feature_encoder.n_features),
+        centers=centers,
+        segments=[
+            {"name": industry, "description": "", "size": len(ids)}
+            for industry, ids in zip(INDUSTRIES, members)
+        ],
+        members=[np.asarray(ids) for ids in members],
+    )
+
+
+def memberships(db):
+    db.expire_all()
+    return dict(db.execute(select(Prospect.id, Prospect.segment_id)).all())
+
+
+def test_register_writes_membership_and_activates_the_version(db, prospects):
+    registry = SegmentModelRegistry()
+    first, _ = fit(registry, db, [[1, 2, 3], [4, 5, 6]])
+
+    # Prospect 6 was left out of the second run
+    model, segment_ids = fit(registry, db, [[1, 2, 3], [4, 5]])
+
+    software, retail = segment_ids
+    assert memberships(db) == {
+        1: software,
+        2: software,
+        3: software,
+        4: retail,
+        5: retail,
+        6: None,
+    }
+    active = db.scalars(select(SegmentationModel.id).where(SegmentationModel.is_active))
+    assert active.all() == [model.id]
+    assert registry.active(db).version == model.id != first.id
+    # Being segmented is not an edit of the prospect
+    updated = db.scalars(select(Prospect.updated_at)).all()
+    assert {value.replace(tzinfo=None) for value in updated} == {datetime(2024, 1, 1)}
+
+
+def test_assign_puts_new_prospects_in_the_nearest_segment(db, prospects):
+    registry = SegmentModelRegistry()
+    _, (software, retail) = fit(registry, db, [[1, 2], [4, 5]])
+
+    # 3 and 6 are new; 1 keeps the segment it has
+    assigned = registry.assign(db, [1, 3, 6])
+
+    assert assigned == 2
+    segments = memberships(db)
+    assert (segments[1], segments[3], segments[6]) == (software, software, retail)
+    sizes = dict(db.execute(select(ProspectSegment.id, ProspectSegment.size)).all())
+    assert sizes == {software: 3, retail: 3}
+
+
+def test_assign_without_a_usable_segmentation_does_nothing(db, prospects, monkeypatch):
+    registry = SegmentModelRegistry()
+    assert registry.assign(db, [1]) == 0
+
+    fit(registry, db, [[1], [4]])
+    monkeypatch.setattr(
+        prospect_feature_encoder, "version", prospect_feature_encoder.version + 1
+    )
+    assert registry.assign(db, [2, 5]) == 0
+    assert memberships(db)[2] is None
@@ -0,0 +1,159 @@
+import itertools
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from app.models.segmentation import SegmentationJob
+from app.services.segmentation_job_service import (
+    SegmentationJobService,
+    segmentation_jobs,
+)
+from sqlalchemy.exc import IntegrityError
+
+
+@pytest.fixture
+def service():
+    return SegmentationJobService(workers=1)
+
+
+@pytest.fixture
+def make_job(db):
+    keys = itertools.count()
+
+    def make(status, seen_ago=0, cache_key=None):
+        job = SegmentationJob(
+            status=status,
+            algorithm="minibatch_kmeans",
+            n_clusters=3,
+            cache_key=cache_key or f"key-{next(keys)}",
+            heartbeat_at=datetime.now(timezone.utc) - timedelta(seconds=seen_ago),
+        )
+        db.add(job)
+        db.commit()
+        return job
+
+    return make
+
+
+def status(db, job):
+    db.refresh(job)
+    return job.status
+
+
+def test_jobs_without_a_heartbeat_are_failed(db, service, make_job):
+    stale_queued = make_job("queued", seen_ago=3600)
+    stale_running = make_job("running", seen_ago=3600)
+    live = make_job("running")
+    owned = make_job("running", seen_ago=3600)
+    finished = make_job("succeeded", seen_ago=3600)
+    service._futures[owned.id] = Future()
+
+    assert service.fail_abandoned(db) == 2
+
+    assert status(db, stale_queued) == status(db, stale_running) == "failed"
+    assert stale_running.error.startswith("Abandoned")
+    assert status(db, live) == status(db, owned) == "running"
+    assert status(db, finished) == "succeeded"
+
+
+def test_cancel_without_a_live_owner_is_immediate(db, service, make_job):
+    queued = make_job("queued")
+    stale = make_job("running", seen_ago=3600)
+    live = make_job("running")
+
+    for job in (queued, stale, live):
+        service.cancel(db, job)
+
+    assert queued.status == stale.status == "cancelled"
+    assert queued.finished_at is not None
+    # Its owner stops it at the next progress report
+    assert live.status == "running"
+    assert live.cancel_requested
+
+
+def test_cancel_drops_a_job_queued_here(db, service, make_job):
+    job = make_job("queued")
+    future = Future()
+    service._futures[job.id] = future
+
+    service.cancel(db, job)
+
+    assert future.cancelled()
+    assert status(db, job) == "cancelled"
+
+
+def test_jobs_whose_future_ends_without_a_result_are_finalized(db, service, make_job):
+    cancelled, broken = make_job("queued"), make_job("running")
+    futures = {cancelled.id: Future(), broken.id: Future()}
+    for job_id, future in futures.items():
+        service._futures[job_id] = future
+        future.add_done_callback(
+            lambda future, job_id=job_id: service._done(job_id, future)
+        )
+
+    # As `shutdown` does to queued jobs, and a dead worker to running ones
+    futures[cancelled.id].cancel()
+    futures[broken.id].set_exception(BrokenProcessPool("terminated abruptly"))
+
+    assert status(db, cancelled) == "cancelled"
+    assert status(db, broken) == "failed"
+    assert "terminated abruptly" in broken.error
+    assert service._futures == {}
+
+
+@pytest.fixture
+def kmeans_key(db):
+    return segmentation_jobs.cache_key(db, "minibatch_kmeans", 3, None)
+
+
+def test_live_jobs_are_unique_per_cache_key(db, make_job):
+    cancelling = make_job("running", cache_key="same")
+    cancelling.cancel_requested = True
+    db.commit()
+    make_job("queued", cache_key="same")
+    make_job("succeeded", cache_key="same")
+
+    with pytest.raises(IntegrityError):
+        make_job("running", cache_key="same")
+
+
+def test_submit_joins_a_live_job_of_another_process(
+    db, make_job, kmeans_key, queued_executor
+):
+    other = make_job("running", cache_key=kmeans_key)
+
+    assert segmentation_jobs.submit(db, "kmeans", 3).id == other.id
+    assert queued_executor.submitted == []
+
+
+def test_submit_replaces_an_abandoned_job(db, make_job, kmeans_key, queued_executor):
+    abandoned = make_job("running", seen_ago=3600, cache_key=kmeans_key)
+
+    job = segmentation_jobs.submit(db, "kmeans", 3)
+
+    assert job.id != abandoned.id
+    assert queued_executor.submitted == [(job.id,)]
+    assert status(db, abandoned) == "failed"
+
+
+def test_submit_joins_a_job_queued_concurrently(
+    db, make_job, kmeans_key, queued_executor, monkeypatch
+):
+    find = segmentation_jobs._find
+    lookups = []
+
+    def find_after_a_concurrent_submit(db, cache_key):
+        # The other process commits its job after this one looked
+        if not lookups:
+            make_job("queued", cache_key=cache_key)
+        lookups.append(cache_key)
+        return None if len(lookups) == 1 else find(db, cache_key)
+
+    monkeypatch.setattr(segmentation_jobs, "_find", find_after_a_concurrent_submit)
+
+    job = segmentation_jobs.submit(db, "kmeans", 3)
+
+    assert job.status == "queued"
+    assert len(lookups) == 2
+    assert queued_executor.submitted == []
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from app.models.segmentation import SegmentationModel
+from app.services.segmentation_service import segmentation_service
+from sqlalchemy import func, select
+
+# Ten prospects, each with a feature of its own: no two are neighbours
+FEATURES = sp.csr_matrix(np.eye(10))
+NAMES = [f"feature_{i}" for i in range(10)]
+
+
+def test_all_noise_is_not_saved(db):
+    with pytest.raises(ValueError, match="No clusters found"):
+        segmentation_service.segment_features(
+            list(range(1, 11)),
+            FEATURES,
+            NAMES,
+            algorithm="dbscan",
+            params={"eps": 0.1, "min_samples": 2},
+            db=db,
+        )
+
+    assert db.scalar(select(func.count(SegmentationModel.id))) == 0
+
+
+def test_all_noise_has_no_segments_without_saving():
+    result = segmentation_service.segment_features(
+        list(range(1, 11)),
+        FEATURES,
+        NAMES,
+        algorithm="dbscan",
+        params={"eps": 0.1, "min_samples": 2},
+    )
+
+    assert result["segments"] == []
+    assert result["n_clusters"] == 0
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+from app.services.sketch_service import HyperLogLog, bit_length
+
+
+def test_bit_length_is_exact_across_the_uint64_range():
+    values = [0, 1, 2**32 - 1, 2**32, 2**53 - 1, 2**53 + 1, 2**60 - 1, 2**64 - 1]
+
+    lengths = bit_length(np.array(values, dtype=np.uint64))
+
+    assert lengths.tolist() == [value.bit_length() for value in values]
+
+
+@pytest.mark.parametrize("precision", [4, 12])
+def test_count_is_within_a_few_standard_errors(precision):
+    sketch = HyperLogLog(precision=precision)
+    sketch.add_many(np.arange(100_000))
+    sketch.add_many(np.arange(50_000))
+
+    error = abs(sketch.count() - 100_000) / 100_000
+    assert error < 4 * sketch.standard_error
+    assert sketch.registers.min() >= 1
@@ -562,6 +562,7 @@ echo "🚀 Starting the Cold Email Optimization System in simplified mode..."
 echo "Creating minimal .env file..."
 cat > .env << EOF
 SECRET_KEY=simplifiedsecretkey123456789
+TRACKING_SECRET=simplifiedtrackingsecret123456789
 POSTGRES_SERVER=localhost
 POSTGRES_USER=postgres
 POSTGRES_PASSWORD=postgres
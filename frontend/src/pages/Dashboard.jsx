@@ -34,8 +34,8 @@ const initialDashboardData = {
   emailsSentChange: 12.05,
   openRate: 42.3,
   openRateChange: 9.05,
-  meetingsBooked: 28,
-  meetingsBookedChange: 18.87
+  repliesReceived: 28,
+  repliesReceivedChange: 18.87
 };
 
 const Dashboard = () => {
@@ -63,16 +63,39 @@ const Dashboard = () => {
     }
   };
 
-  // Poll the backend every 30 seconds for updated data
+  // Subscribe to pushed updates, falling back to polling if the stream fails
   useEffect(() => {
+    const apiUrl = process.env.REACT_APP_API_URL || 'http://localhost:8000/api/v1';
+    let intervalId;
+
     // Initial fetch
     fetchDashboardData();
-    
-    // Set up polling interval
-    const intervalId = setInterval(fetchDashboardData, 30000); // 30000 ms = 30 sec
-    
-    // Clean up interval on component unmount
-    return () => clearInterval(intervalId);
+
+    const source = new EventSource(`${apiUrl}/dashboard-stats/stream`);
+    source.addEventListener('stats', (event) => {
+      setDashboardData(JSON.parse(event.data));
+    });
+    source.onerror = () => {
+      // The browser retries on its own; poll meanwhile so the data stays fresh.
+      // Unchanged stats come back as 304 Not Modified via the ETag.
+      if (!intervalId) {
+        intervalId = setInterval(fetchDashboardData, 30000); // 30000 ms = 30 sec
+      }
+    };
+    source.onopen = () => {
+      if (intervalId) {
+        clearInterval(intervalId);
+        intervalId = undefined;
+      }
+    };
+
+    // Close the stream and any fallback polling on component unmount
+    return () => {
+      source.close();
+      if (intervalId) {
+        clearInterval(intervalId);
+      }
+    };
   }, []);
 
   return (
@@ -181,13 +204,13 @@ const Dashboard = () => {
                   <Icon as={FiCalendar} boxSize={5} />
                 </Box>
                 <Box>
-                  <StatLabel>Meetings Booked</StatLabel>
+                  <StatLabel>Replies Received</StatLabel>
                   <StatNumber>
-                    {loading ? 'Loading...' : dashboardData.meetingsBooked}
+                    {loading ? 'Loading...' : dashboardData.repliesReceived}
                   </StatNumber>
                   <StatHelpText>
                     <StatArrow type="increase" />
-                    {dashboardData.meetingsBookedChange}%
+                    {dashboardData.repliesReceivedChange}%
                   </StatHelpText>
                 </Box>
               </Flex>
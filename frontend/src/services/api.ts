@@ -3,6 +3,9 @@ import axios, { AxiosInstance, AxiosRequestConfig } from 'axios';
 // API base URL
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000/api/v1';
 
+// Longest a segmentation job is polled before giving up on it
+const SEGMENTATION_POLL_TIMEOUT_MS = 30 * 60 * 1000;
+
 // Create axios instance
 const apiClient: AxiosInstance = axios.create({
   baseURL: API_URL,
@@ -91,8 +94,21 @@ class ApiService {
   }
 
   async segmentProspects(params: any) {
-    const response = await apiClient.get('/prospects/segment', { params });
-    return response.data;
+    // Segmentation runs as a background job: start it, then poll it
+    let { data: job } = await apiClient.post('/prospects/segment', params);
+    const deadline = Date.now() + SEGMENTATION_POLL_TIMEOUT_MS;
+    while (job.status === 'queued' || job.status === 'running') {
+      if (Date.now() > deadline) {
+        // The job may still finish; submitting the same request joins it
+        throw new Error(`Segmentation job ${job.id} is still ${job.status}`);
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      ({ data: job } = await apiClient.get(`/prospects/segment/jobs/${job.id}`));
+    }
+    if (job.status !== 'succeeded') {
+      throw new Error(job.error || `Segmentation ${job.status}`);
+    }
+    return job.result;
   }
 
   // Campaign endpoints
@@ -14,6 +14,7 @@ echo "Creating minimal .env file..."
 cat > .env << EOL
 # Backend settings
 SECRET_KEY=$(openssl rand -hex 32)
+TRACKING_SECRET=$(openssl rand -hex 32)
 POSTGRES_SERVER=db
 POSTGRES_USER=postgres
 POSTGRES_PASSWORD=postgres
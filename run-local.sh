@@ -7,6 +7,7 @@ echo "🚀 Starting the Cold Email Optimization System locally..."
 echo "Creating minimal .env file..."
 cat > .env << EOL
 SECRET_KEY=$(openssl rand -hex 32)
+TRACKING_SECRET=$(openssl rand -hex 32)
 POSTGRES_SERVER=localhost
 POSTGRES_USER=postgres
 POSTGRES_PASSWORD=postgres